@@ -0,0 +1,149 @@
+"""Admission control for requests that wait on Notion.
+
+Every Notion-bound request holds a worker thread for as long as Notion takes.
+During a burst (or while a few bulk reorders make their calls) threads pile up
+until ordinary page loads can't get one. ``AdmissionController`` caps how many
+such requests run at once and queues the rest briefly:
+
+- ``ADMISSION_MAX_CONCURRENT``: requests running at once per process (default ``16``)
+- ``ADMISSION_RESERVED_FOR_READS``: slots only reads may use (default ``4``), so
+  writes and bulk operations can never take every slot
+- ``ADMISSION_BULK_CONCURRENT``: bulk operations (reorder, bulk actions, import,
+  export) running at once (default ``2``)
+- ``ADMISSION_ROUTE_LIMITS``: extra per-endpoint caps, e.g. ``reorder=1,export_tasks=1``
+- ``ADMISSION_QUEUE_SIZE``: requests of one class allowed to wait (default ``32``);
+  past that, requests are refused at once with ``429``
+- ``ADMISSION_QUEUE_TIMEOUT_SECONDS``: how long a request waits for a slot
+  (default ``5``) before it is refused with ``503``
+
+When a slot frees up, waiting reads go first, then writes, then bulk
+operations; within a class, requests go in arrival order. Refusals carry a
+``Retry-After`` header. ``ADMISSION_ENABLED=0`` turns admission control off.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', '1').lower() in ('1', 'true', 'yes')
+MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', '16'))
+RESERVED_FOR_READS = int(os.getenv('ADMISSION_RESERVED_FOR_READS', '4'))
+BULK_CONCURRENT = int(os.getenv('ADMISSION_BULK_CONCURRENT', '2'))
+QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', '32'))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_SECONDS', '5'))
+RETRY_AFTER_SECONDS = 2
+
+# Request classes, highest priority first
+READ, WRITE, BULK = 'read', 'write', 'bulk'
+PRIORITY = {READ: 0, WRITE: 1, BULK: 2}
+
+
+def _parse_limits(value):
+    limits = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            endpoint, _, limit = item.partition('=')
+            limits[endpoint.strip()] = int(limit)
+    return limits
+
+
+ROUTE_LIMITS = _parse_limits(os.getenv('ADMISSION_ROUTE_LIMITS'))
+
+
+class Rejected(Exception):
+    """A request that wasn't admitted; ``status`` is 429 (queue full) or 503 (waited too long)."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Slot:
+    __slots__ = ('kind', 'route', 'waited')
+
+    def __init__(self, kind, route, waited):
+        self.kind = kind
+        self.route = route
+        self.waited = waited
+
+
+class AdmissionController:
+    def __init__(self, capacity=MAX_CONCURRENT, reserved_for_reads=RESERVED_FOR_READS, bulk=BULK_CONCURRENT,
+                 route_limits=None, queue_size=QUEUE_SIZE, queue_timeout=QUEUE_TIMEOUT_SECONDS):
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.route_limits = ROUTE_LIMITS if route_limits is None else route_limits
+        reserved = min(reserved_for_reads, capacity - 1)
+        self.class_limits = {READ: capacity, WRITE: capacity - reserved, BULK: min(bulk, capacity - reserved)}
+        self.active = Counter()  # class -> running requests
+        self.active_routes = Counter()
+        self.waiting = {kind: [] for kind in PRIORITY}  # class -> (ticket, route) of waiters, oldest first
+        self.rejected = Counter()  # (class, reason) -> refusals
+        self._tickets = itertools.count()
+        self._condition = threading.Condition()
+
+    def _can_run(self, kind, route):
+        limit = self.route_limits.get(route)
+        return (sum(self.active.values()) < self.capacity and self.active[kind] < self.class_limits[kind]
+                and (limit is None or self.active_routes[route] < limit))
+
+    def _higher_ready(self, kind):
+        """True if a waiter of a higher-priority class could take a slot now; it goes first."""
+        return any(self.waiting[other] and self._can_run(other, self.waiting[other][0][1])
+                   for other in PRIORITY if PRIORITY[other] < PRIORITY[kind])
+
+    def _is_next(self, kind, entry):
+        return self.waiting[kind][0] is entry and self._can_run(kind, entry[1]) and not self._higher_ready(kind)
+
+    def acquire(self, kind, route):
+        """Wait for a slot; returns a ``Slot`` for ``release`` or raises ``Rejected``."""
+        started = time.monotonic()
+        with self._condition:
+            queue = self.waiting[kind]
+            if not queue and self._can_run(kind, route) and not self._higher_ready(kind):
+                return self._take(kind, route, 0.0)
+            if len(queue) >= self.queue_size:
+                self.rejected[kind, 'queue_full'] += 1
+                raise Rejected(429, f'Too many {kind} requests waiting; try again shortly')
+
+            entry = (next(self._tickets), route)
+            queue.append(entry)
+            deadline = started + self.queue_timeout
+            try:
+                while not self._is_next(kind, entry):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected[kind, 'timeout'] += 1
+                        raise Rejected(503, f'The server is busy; {kind} request waited {self.queue_timeout:g}s')
+                    self._condition.wait(remaining)
+            finally:
+                queue.remove(entry)
+                # Whoever is behind us may be able to go now
+                self._condition.notify_all()
+            return self._take(kind, route, time.monotonic() - started)
+
+    def _take(self, kind, route, waited):
+        self.active[kind] += 1
+        self.active_routes[route] += 1
+        return Slot(kind, route, waited)
+
+    def release(self, slot):
+        with self._condition:
+            self.active[slot.kind] -= 1
+            self.active_routes[slot.route] -= 1
+            self._condition.notify_all()
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                'capacity': self.capacity,
+                'class_limits': dict(self.class_limits),
+                'active': {kind: self.active[kind] for kind in PRIORITY},
+                'waiting': {kind: len(queue) for kind, queue in self.waiting.items()},
+                'rejected': {f'{kind}:{reason}': count for (kind, reason), count in self.rejected.items()},
+            }
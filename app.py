@@ -1,13 +1,43 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify
-from notion_client import Client
+from flask import Flask, render_template, request, redirect, url_for, jsonify, g, abort, has_request_context, Response, stream_with_context
+from werkzeug.local import LocalProxy
+from jinja2 import FileSystemBytecodeCache
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
 import pytz
 from flask_cors import CORS
-from apscheduler.schedulers.background import BackgroundScheduler
+from logging_config import configure_logging
+from scheduler import start_embedded_scheduler, RECURRING_CHECK_MINUTES
+import metrics
+import call_budget
+import resilience
+from admission import ADMISSION_ENABLED, BULK, READ, RETRY_AFTER_SECONDS, WRITE, AdmissionController, Rejected
+from request_memo import memoize_reads
+from assets import Assets
+from compression import StripIndentation, compress_response
+from notion_http import HTTPConfig, call_middleware, call_observers, create_notion_client, http_stats
+from previews import PreviewFetcher
+from pipeline import Progress, run_pipeline
+from task_io import InvalidImport, iter_import_rows, to_ndjson
+from task_store import SECTIONS, SORT_FIELDS, TIMESTAMP_FIELDS, parse_timestamp, property_value, section_of, summarize_page, summarize_with_timestamps
+import tracing
+from tracing import span
+from write_queue import WRITE_QUEUE_ENABLED, WRITE_QUEUE_PATH, WriteQueue
+from offline import RECONCILE_AFTER_SECONDS, Connectivity, is_unavailable_error, merge_properties
+from local_time import DEFAULT_TIMEZONE, TIMEZONE_COOKIE, day_buckets, get_timezone, localize
+from shared_snapshot import SHARED_SNAPSHOT_PATH, SharedSnapshot
+from webhooks import (NOTION_WEBHOOK_SECRET, PAGE_CHANGED_EVENTS, PAGE_REMOVED_EVENTS, SIGNATURE_HEADER,
+                      WEBHOOK_TASK_STORE_MAX_AGE, Debouncer, parse_event, verify_signature)
+from notion_client.errors import APIResponseError
+from tenants import TENANTS_FILE, TenantPool, UnknownTenant, load_tenants, resolve_tenant_name, scoped_context, tenant_scope
 import time
 import logging
+import threading
+import uuid
+import copy
+import hashlib
+from collections import OrderedDict
+from urllib.parse import unquote
 
 load_dotenv()
 
@@ -21,27 +51,494 @@ app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-here')
 NOTION_TOKEN = os.getenv('NOTION_TOKEN')
 DATABASE_ID = os.getenv('NOTION_DATABASE_ID')
 
-notion = Client(auth=NOTION_TOKEN)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+# One process can serve many boards; see tenants.py. Clients share the pooled
+# HTTP transport configured in notion_http.py.
+http_config = HTTPConfig.from_env()
+tenant_pool = TenantPool(
+    load_tenants(NOTION_TOKEN, DATABASE_ID),
+    client_factory=lambda token: create_notion_client(token, http_config)
 )
+
+CATEGORY_CACHE_SECONDS = int(os.getenv('CATEGORY_CACHE_SECONDS', '60'))
+TASK_STORE_MAX_AGE = int(os.getenv('TASK_STORE_MAX_AGE', '300'))  # seconds between full syncs
+if NOTION_WEBHOOK_SECRET:
+    # Webhooks keep the task store current; full syncs only catch missed events
+    TASK_STORE_MAX_AGE = WEBHOOK_TASK_STORE_MAX_AGE
+
+# Logging is configured (levels, async handler and sampling come from the
+# environment) when the app starts serving; see start_background_services
 logger = logging.getLogger(__name__)
+# Tag for the per-call lexorank debug lines, sampled via LOG_SAMPLE_RATES=lexorank=N
+LEXORANK_SAMPLE = {'sample': 'lexorank'}
+
+def current_context():
+    if has_request_context() and 'tenant_context' in g:
+        return g.tenant_context
+    return scoped_context() or tenant_pool.get()
+
+def current_database_id():
+    return current_context().database_id
+
+def current_timezone_name():
+    """IANA name of the timezone to show dates in; see local_time.py"""
+    if has_request_context():
+        name = unquote(request.cookies.get(TIMEZONE_COOKIE, ''))
+        if get_timezone(name) is not None:
+            return name
+    tenant_timezone = current_context().tenant.timezone
+    return tenant_timezone if get_timezone(tenant_timezone) is not None else DEFAULT_TIMEZONE
+
+def current_timezone():
+    return get_timezone(current_timezone_name())
+
+# Notion client of the tenant serving the current request (or job)
+notion = LocalProxy(lambda: current_context().client)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.trace, g.trace_tokens = tracing.start_trace(f'{request.method} {request.path}', method=request.method)
+    g.notion_account, g.notion_account_token = call_budget.start_account(request.endpoint or 'unmatched')
+    g.notion_deadline_token = resilience.start_deadline()
+    if tracing.should_profile(request.headers):
+        g.profiler = tracing.start_profile()
+
+@app.teardown_request
+def finish_request_trace(error):
+    started = g.get('request_started')
+    if started is None:
+        return
+    name = f'{request.method} {request.endpoint or request.path}'
+    account = g.get('notion_account')
+    if account is not None:
+        call_budget.finish_account(g.notion_account_token)
+    if 'notion_deadline_token' in g:
+        resilience.finish_deadline(g.notion_deadline_token)
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        tracing.finish_profile(
+            profiler, name, (time.perf_counter() - started) * 1000,
+            forced=request.headers.get('X-Profile') == '1'
+        )
+    tracing.finish_trace(
+        g.get('trace'), g.get('trace_tokens'), endpoint=request.endpoint, error=error,
+        notion_calls=account.total if account else None
+    )
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        metrics.http_request_duration.observe(
+            time.perf_counter() - started,
+            route=request.endpoint or 'unmatched',
+            method=request.method,
+            status=response.status_code
+        )
+    account = g.get('notion_account')
+    if account is not None:
+        metrics.notion_calls_per_request.observe(account.total, route=account.route)
+        metrics.notion_bytes.inc(account.bytes_sent, route=account.route, direction='sent')
+        metrics.notion_bytes.inc(account.bytes_received, route=account.route, direction='received')
+        response.headers['X-Notion-Calls'] = str(account.total)
+        response.headers['X-Notion-Bytes'] = f'{account.bytes_sent}/{account.bytes_received}'
+        logger.debug("Notion calls for %s: %s", request.path, account.to_dict())
+        if account.refused:
+            response.headers['X-Notion-Call-Budget'] = 'exceeded'
+    memo = g.get('notion_memo')
+    if memo is not None and memo.hits:
+        metrics.notion_memo_hits.inc(memo.hits, route=request.endpoint or 'unmatched')
+        response.headers['X-Notion-Memo-Hits'] = str(memo.hits)
+    return response
+
+# Gzip/brotli for HTML and JSON responses, sized to the body; see compression.py
+app.after_request(compress_response)
+
+def record_notion_call(call, duration, error):
+    metrics.notion_request_duration.observe(duration, operation=call.operation, outcome='error' if error else 'ok')
+
+call_observers.append(record_notion_call)
+
+def trace_notion_call(call, duration, error):
+    tracing.record_span(f'notion.{call.operation}', duration, error, method=call.method, path=call.path)
+
+call_observers.append(trace_notion_call)
+call_observers.append(call_budget.record_call)
+
+# Tracks whether Notion is reachable; while it isn't, reads come from the task store
+connectivity = Connectivity()
+call_observers.append(connectivity.observe)
+
+# Stylesheets and scripts are served fingerprinted and precompressed; see assets.py
+assets = Assets()
+app.jinja_env.globals['asset_url'] = assets.url
+# Render templates without their indentation and the blank lines template tags leave behind
+app.jinja_env.trim_blocks = True
+app.jinja_env.lstrip_blocks = True
+app.jinja_env.add_extension(StripIndentation)
+
+# Compiled templates are kept on disk, so a new worker loads them instead of
+# compiling them again. `flask --app app build` fills the cache ahead of time.
+TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR') or None  # None: a directory under the system temp dir
+
+def template_cache_pattern(env):
+    """Cache file names for ``env``: Jinja checks the source, but not the options it was compiled with"""
+    options = (env.trim_blocks, env.lstrip_blocks, sorted(env.extensions))
+    return f'__todo_app_{hashlib.sha256(repr(options).encode()).hexdigest()[:8]}_%s.cache'
+
+if TEMPLATE_CACHE_DIR:
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR, template_cache_pattern(app.jinja_env))
+
+def compile_templates():
+    """Compile every template into the template cache; returns their names"""
+    names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
+
+@app.cli.command('build')
+def build_command():
+    """Build static assets and compile templates, e.g. while building an image."""
+    assets.build()
+    for name in compile_templates():
+        print(f'Compiled {name}')
+
+@app.route('/assets/<path:filename>')
+def static_asset(filename):
+    return assets.send(filename)
+
+@app.context_processor
+def inject_connectivity():
+    return {'notion_offline': connectivity.is_offline()}
+
+# Repeated reads within a request are answered from memory and never reach the budget
+call_middleware.append(memoize_reads)
+call_middleware.append(resilience.enforce_deadline)
+call_middleware.append(call_budget.enforce_budget)
+# Innermost, so each copy of a hedged read is sent, observed and counted like any call
+call_middleware.append(resilience.hedge_reads)
+call_observers.append(resilience.latency.observe)
+
+def collect_cache_metrics():
+    contexts = tenant_pool.contexts()
+    caches = [
+        ({'tenant': context.tenant.name, 'cache': name}, cache)
+        for context in contexts for name, cache in (('data', context.cache), ('previews', context.previews))
+    ]
+    yield ('tenant_cache_hits_total', 'counter', 'Tenant cache hits (warm tenants only).',
+           [(labels, cache.hits) for labels, cache in caches])
+    yield ('tenant_cache_misses_total', 'counter', 'Tenant cache misses (warm tenants only).',
+           [(labels, cache.misses) for labels, cache in caches])
+    yield ('tenant_cache_bytes', 'gauge', 'Approximate size of each tenant cache.',
+           [(labels, cache.size_bytes) for labels, cache in caches])
+    yield ('task_store_pages', 'gauge', 'Pages held in each tenant task store.',
+           [({'tenant': context.tenant.name}, len(context.store)) for context in contexts])
+
+def collect_http_metrics():
+    stats = http_stats.snapshot()
+    yield ('notion_http_requests_total', 'counter', 'HTTP requests sent to Notion.', [({}, stats['requests'])])
+    yield ('notion_http_connections_opened_total', 'counter', 'New TCP connections to Notion.', [({}, stats['connections_opened'])])
+    yield ('notion_http_connections_reused_total', 'counter', 'Requests served on a kept-alive connection.', [({}, stats['connections_reused'])])
+
+metrics.register_collector(collect_cache_metrics)
+metrics.register_collector(collect_http_metrics)
+
+@app.route('/metrics')
+def metrics_route():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
+# Notion-bound endpoints by admission class; see admission.py. Endpoints not
+# listed (assets, metrics, status pages, webhooks) are never held back.
+ADMISSION_CLASSES = {
+    'index': READ, 'later_tasks': READ, 'recurring_tasks_page': READ, 'get_recurring_tasks_route': READ,
+    'search': READ, 'query_tasks': READ, 'page_info': READ,
+    'add': WRITE, 'complete': WRITE, 'delete': WRITE, 'move_todo': WRITE, 'edit': WRITE, 'add_category': WRITE,
+    'add_recurring': WRITE, 'delete_recurring': WRITE, 'toggle_later_route': WRITE,
+    'reorder': BULK, 'bulk_action': BULK, 'import_tasks': BULK, 'export_tasks': BULK,
+}
+admission = AdmissionController() if ADMISSION_ENABLED else None
+
+@app.before_request
+def admit_request():
+    kind = ADMISSION_CLASSES.get(request.endpoint)
+    if admission is None or kind is None:
+        return None
+    try:
+        g.admission_slot = admission.acquire(kind, request.endpoint)
+    except Rejected as e:
+        metrics.admission_rejections.inc(route=request.endpoint, reason='queue_full' if e.status == 429 else 'timeout')
+        logger.warning("Refused %s with %s: %s", request.endpoint, e.status, e)
+        response = jsonify({"success": False, "error": str(e)})
+        response.status_code = e.status
+        response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+        return response
+    metrics.admission_wait.observe(g.admission_slot.waited, kind=kind)
+    return None
+
+@app.teardown_request
+def release_admission(error):
+    slot = g.pop('admission_slot', None)
+    if slot is not None:
+        admission.release(slot)
+
+def collect_admission_metrics():
+    if admission is None:
+        return
+    state = admission.snapshot()
+    yield ('admission_active_requests', 'gauge', 'Notion-bound requests running, by admission class.',
+           [({'kind': kind}, count) for kind, count in state['active'].items()])
+    yield ('admission_queue_depth', 'gauge', 'Requests waiting for an admission slot, by class.',
+           [({'kind': kind}, count) for kind, count in state['waiting'].items()])
+
+metrics.register_collector(collect_admission_metrics)
+
+@app.route('/admission')
+def admission_route():
+    return jsonify(admission.snapshot() if admission is not None else {"enabled": False})
+
+@app.before_request
+def resolve_tenant():
+    try:
+        g.tenant_context = tenant_pool.get(resolve_tenant_name(request, tenant_pool.tenants))
+    except UnknownTenant:
+        abort(404)
+
+def track_page(page):
+    """Record a page returned by Notion in the current tenant's task store."""
+    current_context().store.upsert(page)
+    return page
+
+def untrack_page(page_id):
+    current_context().store.remove(page_id)
+
+# Mutating routes hand their page writes to this queue and respond right away; see write_queue.py.
+# Opened by start_background_services(), so importing the app creates no files.
+write_queue = None
+
+def open_write_queue():
+    path = WRITE_QUEUE_PATH or os.path.join(app.instance_path, 'write-queue.sqlite3')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return WriteQueue(path)
+
+def resolve_page_id(page_id):
+    """Map a temporary id of a queued create to the Notion id, once it exists"""
+    if write_queue is None:
+        return page_id
+    return write_queue.resolve(current_context().tenant.name, page_id)
+
+def page_for(page_id):
+    """The current copy of a page, from the task store if it's there"""
+    page = current_context().store.get(page_id)
+    if page is None:
+        page = track_page(notion.pages.retrieve(page_id=page_id))
+    return page
+
+def local_timestamp(epoch=None):
+    moment = datetime.fromtimestamp(epoch, pytz.UTC) if epoch else get_utc_now()
+    return moment.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+def with_properties(page, properties):
+    """A copy of page with properties written over it, as Notion would return it.
+
+    last_edited_time is left as Notion last reported it; Notion sets the real one.
+    """
+    updated = copy.copy(page)
+    updated['properties'] = {**page.get('properties', {}), **copy.deepcopy(properties)}
+    return updated
+
+def new_local_page(page_id, properties, created_at=None):
+    created = local_timestamp(created_at)
+    return {
+        'object': 'page',
+        'id': page_id,
+        'created_time': created,
+        'last_edited_time': None,
+        'archived': False,
+        'properties': copy.deepcopy(properties),
+    }
+
+def apply_write_locally(store, op, page_id, properties, created_at=None):
+    if op == 'archive':
+        store.remove(page_id)
+    elif op == 'create':
+        store.upsert(new_local_page(page_id, properties, created_at))
+    else:
+        page = store.get(page_id)
+        if page is not None:
+            store.upsert(with_properties(page, properties))
+
+def submit_write(op, page_id=None, properties=None):
+    """Apply a page write ('create', 'update' or 'archive') to the task store and send it to Notion.
+
+    With the write queue on, Notion is updated in the background and this returns at
+    once. Updates only send the properties that differ from the stored page, and are
+    skipped when nothing does. Returns the page id, a temporary one for queued creates.
+    """
+    context = current_context()
+    page = None
+    if op == 'update':
+        page_id = resolve_page_id(page_id)
+        page = context.store.get(page_id)
+        if page is not None:
+            properties = changed_properties(page, properties)
+            if not properties:
+                logger.debug("Skipping update of %s, nothing changed", page_id)
+                return page_id
+
+    if write_queue is None:
+        if op == 'create':
+            return track_page(notion.pages.create(
+                parent={"database_id": current_database_id()},
+                properties=properties
+            ))['id']
+        if op == 'archive':
+            delete_page(page_id)
+        else:
+            update_notion_with_retry(page_id, properties)
+        return page_id
+
+    base = None
+    if page is not None:
+        base = {name: page.get('properties', {}).get(name) for name in properties}
+    page_id = write_queue.enqueue(context.tenant.name, op, page_id, properties, base)
+    apply_write_locally(context.store, op, page_id, properties)
+    return page_id
+
+def changed_properties(page, properties):
+    """The properties whose values differ from what page already has"""
+    current = page.get('properties', {})
+    return {
+        name: value for name, value in properties.items()
+        if property_value(current.get(name)) != property_value(value)
+    }
+
+def overlay_pending_writes(pages, keep):
+    """Apply queued writes Notion hasn't seen yet to pages just read from it"""
+    if write_queue is None:
+        return pages
+    context = current_context()
+    pending = write_queue.pending(context.tenant.name)
+    if not pending:
+        return pages
+
+    by_id = OrderedDict((page['id'], page) for page in pages)
+    for write in pending:
+        if write.op == 'archive':
+            by_id.pop(write.page_id, None)
+        elif write.op == 'create':
+            by_id[write.page_id] = new_local_page(write.page_id, write.properties, write.created_at)
+        else:
+            page = by_id.get(write.page_id) or context.store.get(write.page_id)
+            if page is not None:
+                by_id[write.page_id] = with_properties(page, write.properties)
+    return [page for page in by_id.values() if keep(page)]
+
+def stored_summary(store, page):
+    """The task store's summary of page, with dates already parsed; computed if the store has another copy"""
+    if store.get(page['id']) is page:
+        task = store.summary(page['id'])
+        if task is not None:
+            return task
+    return summarize_with_timestamps(page)
+
+def is_listed(page, is_later):
+    properties = page.get('properties', {})
+    title = (properties.get('Title') or {}).get('title') or []
+    return bool(title) and (properties.get('IsLater') or {}).get('checkbox', False) == is_later
+
+def local_tasks(is_later):
+    """The tasks get_todos/get_later_todos would return, from the task store alone"""
+    pages = [page for page in current_context().store.iter_pages() if is_listed(page, is_later)]
+    pages.sort(key=lambda page: (
+        (page['properties'].get('Status') or {}).get('checkbox', False),
+        summarize_page(page)['order']
+    ))
+    return pages
+
+def rerank_if_taken(store, page_id, properties):
+    """Give the write a fresh rank if another task of the same list already has its Order"""
+    order = ((properties.get('Order') or {}).get('rich_text') or [{}])[0].get('text', {}).get('content')
+    if not order:
+        return properties
+    page = store.get(page_id)
+    task = summarize_page(with_properties(page, properties) if page else new_local_page(page_id, properties))
+    taken, next_order = store.order_after(section_of(task), task['completed'], order, exclude=page_id)
+    if not taken:
+        return properties
+    new_rank = get_lexorank_sequence(order, next_order, 1, task['completed'])[0]
+    logger.info("Rank %s of %s is taken, re-ranked to %s", order, page_id, new_rank)
+    return {**properties, "Order": {"rich_text": [{"text": {"content": new_rank}}]}}
+
+def reconcile_write(write):
+    """Merge a write that waited in the queue with what changed in Notion meanwhile; returns the properties to send"""
+    store = ensure_task_store()
+    properties = write.properties
+    if write.op == 'update' and write.base is not None:
+        remote = track_page(notion.pages.retrieve(page_id=write.page_id))
+        properties = merge_properties(properties, write.base, remote, write.created_at)
+    return rerank_if_taken(store, write.page_id, properties)
+
+def apply_queued_write(write):
+    """Write queue worker: send one queued write to Notion; returns the Notion page id"""
+    with tenant_scope(tenant_pool.get(write.tenant)):
+        store = current_context().store
+        properties = write.properties
+        if write.op != 'archive' and time.time() - write.created_at > RECONCILE_AFTER_SECONDS:
+            properties = reconcile_write(write)
+
+        if write.op == 'create':
+            page = notion.pages.create(
+                parent={"database_id": current_database_id()},
+                properties=properties
+            )
+            store.remove(write.page_id)
+        elif write.op == 'archive':
+            notion.pages.update(page_id=write.page_id, archived=True)
+            store.remove(write.page_id)
+            return write.page_id
+        elif not properties:
+            return write.page_id  # nothing left to write after reconciling
+        else:
+            page = notion.pages.update(page_id=write.page_id, properties=properties)
+        track_page(page)
+        # Notion's copy doesn't have the writes queued after this one yet
+        for later in write_queue.pending(write.tenant, write.page_id):
+            if later.id != write.id:
+                apply_write_locally(store, later.op, page['id'], later.properties)
+        return page['id']
+
+def collect_write_queue_metrics():
+    if write_queue is None:
+        return
+    counts = write_queue.counts()
+    yield ('write_queue_writes', 'gauge', 'Page writes waiting in the write queue, by status.',
+           [({'status': status}, counts.get(status, 0)) for status in ('pending', 'in_progress', 'dead')])
+
+metrics.register_collector(collect_write_queue_metrics)
 
 def get_utc_now():
     return datetime.now(pytz.UTC)
 
+def serve_boards_from_store():
+    """True when the task store is kept current without querying Notion on every page load:
+    by webhooks, or by the sync the workers share through the snapshot"""
+    return bool(NOTION_WEBHOOK_SECRET) or shared_snapshot is not None
+
 def get_todos():
+    if connectivity.is_offline():
+        return local_tasks(False)
     try:
+        if serve_boards_from_store():
+            ensure_task_store()
+            return local_tasks(False)
         all_results = []
         has_more = True
         next_cursor = None
         
         while has_more:
             query_params = {
-                "database_id": DATABASE_ID,
+                "database_id": current_database_id(),
                 "sorts": [
                     {
                         "property": "Status",
@@ -80,20 +577,26 @@ def get_todos():
             has_more = response.get('has_more', False)
             next_cursor = response.get('next_cursor')
         
-        return all_results
+        current_context().store.upsert_many(all_results)
+        return overlay_pending_writes(all_results, lambda page: is_listed(page, False))
     except Exception as e:
-        print(f"Error fetching todos: {e}")
-        return []
+        logger.error("Error fetching todos: %s", e)
+        return local_tasks(False)
 
 def get_later_todos():
+    if connectivity.is_offline():
+        return local_tasks(True)
     try:
+        if serve_boards_from_store():
+            ensure_task_store()
+            return local_tasks(True)
         all_results = []
         has_more = True
         next_cursor = None
         
         while has_more:
             query_params = {
-                "database_id": DATABASE_ID,
+                "database_id": current_database_id(),
                 "sorts": [
                     {
                         "property": "Status",
@@ -132,104 +635,201 @@ def get_later_todos():
             has_more = response.get('has_more', False)
             next_cursor = response.get('next_cursor')
         
-        return all_results
+        current_context().store.upsert_many(all_results)
+        return overlay_pending_writes(all_results, lambda page: is_listed(page, True))
     except Exception as e:
-        print(f"Error fetching later todos: {e}")
-        return []
+        logger.error("Error fetching later todos: %s", e)
+        return local_tasks(True)
+
+def sync_tasks():
+    """Fetch every task page and make the tenant's task store an exact copy."""
+    all_results = []
+    has_more = True
+    next_cursor = None
+
+    while has_more:
+        query_params = {
+            "database_id": current_database_id(),
+            "filter": {
+                "property": "Title",
+                "title": {
+                    "is_not_empty": True
+                }
+            },
+            "page_size": 100
+        }
+
+        if next_cursor:
+            query_params["start_cursor"] = next_cursor
+
+        response = notion.databases.query(**query_params)
+        all_results.extend(response.get('results', []))
+        has_more = response.get('has_more', False)
+        next_cursor = response.get('next_cursor')
+
+    context = current_context()
+    store = context.store
+    store.replace_all(all_results)
+    if write_queue is not None:
+        for write in write_queue.pending(context.tenant.name):
+            apply_write_locally(store, write.op, write.page_id, write.properties, write.created_at)
+    return store
+
+# Lets gunicorn workers share one task snapshot and one full sync; see shared_snapshot.py
+shared_snapshot = SharedSnapshot(SHARED_SNAPSHOT_PATH) if SHARED_SNAPSHOT_PATH else None
+
+def sync_shared_snapshot():
+    """Full sync through the shared snapshot: one worker syncs and publishes, the others pull its result"""
+    context = current_context()
+    # With nothing to serve yet, wait for the worker that's syncing instead of skipping
+    with shared_snapshot.sync_lock(wait=context.store.synced_at is None) as owner:
+        if not owner:
+            return
+        shared_snapshot.pull(context.tenant.name, context.store)
+        if context.store.is_fresh(TASK_STORE_MAX_AGE):
+            return  # synced by another worker while we waited
+        with shared_snapshot.muted():
+            store = sync_tasks()
+        shared_snapshot.publish_all(context.tenant.name, store.iter_pages())
+
+def ensure_task_store():
+    context = current_context()
+    store = context.store
+    if shared_snapshot is not None:
+        shared_snapshot.pull(context.tenant.name, store)
+    if not store.is_fresh(TASK_STORE_MAX_AGE) and not connectivity.is_offline():
+        try:
+            if shared_snapshot is not None:
+                sync_shared_snapshot()
+            else:
+                sync_tasks()
+        except Exception as e:
+            if not is_unavailable_error(e) or store.synced_at is None:
+                raise
+            logger.warning("Task sync failed, using the local copy: %s", e)
+    return store
+
+def forget_categories():
+    context = current_context()
+    context.cache.pop('categories')
+    if shared_snapshot is not None:
+        shared_snapshot.discard(context.tenant.name, 'categories')
 
 def get_categories():
+    context = current_context()
+    cache = context.cache
+    categories = cache.get('categories')
+    if categories is None and shared_snapshot is not None:
+        categories = shared_snapshot.get(context.tenant.name, 'categories', CATEGORY_CACHE_SECONDS)
+        if categories is not None:
+            cache.set('categories', categories, ttl=CATEGORY_CACHE_SECONDS)
+    if categories is not None:
+        return categories
+    if connectivity.is_offline():
+        return cache.get('categories:last') or []
     try:
         # Query the database to get its properties
-        database = notion.databases.retrieve(database_id=DATABASE_ID)
+        database = notion.databases.retrieve(database_id=current_database_id())
         # Get the category options from the select property
         category_options = database.get('properties', {}).get('Category', {}).get('select', {}).get('options', [])
-        return [{'id': option.get('id'), 'name': option.get('name')} for option in category_options]
+        categories = [{'id': option.get('id'), 'name': option.get('name')} for option in category_options]
+        cache.set('categories', categories, ttl=CATEGORY_CACHE_SECONDS)
+        cache.set('categories:last', categories)
+        if shared_snapshot is not None:
+            shared_snapshot.set(context.tenant.name, 'categories', categories)
+        return categories
     except Exception as e:
-        print(f"Error fetching categories: {e}")
-        return []
+        logger.error("Error fetching categories: %s", e)
+        return cache.get('categories:last') or []
 
 def create_todo(title, description="", deadline=None, category_name=None):
     try:
-        # Get the current maximum order
-        todos = get_todos()
-        
-        # Find the last incomplete todo's order
-        last_incomplete_order = None
-        for todo in todos:
-            if not todo['properties'].get('Status', {}).get('checkbox', False):
-                order_text = todo['properties'].get('Order', {}).get('rich_text', [{}])[0].get('text', {}).get('content', '')
-                if order_text:
-                    last_incomplete_order = order_text
-
-        # Generate new order value
-        new_order = get_lexorank_between(last_incomplete_order, None, False)
-        logger.debug(f"Creating new todo with order {new_order}")
+        # Place the new todo after the last incomplete one
+        new_order = get_lexorank_between(last_order(ensure_task_store(), False, False), None, False)
+        logger.debug("Creating new todo with order %s", new_order)
 
-        properties = {
-            "Title": {
-                "title": [
-                    {
-                        "text": {
-                            "content": title
-                        }
+        properties = build_todo_properties(title, description, deadline, category_name, new_order)
+
+        submit_write('create', properties=properties)
+        return True
+    except Exception as e:
+        logger.error("Error creating todo: %s", e)
+        return False
+
+def build_todo_properties(title, description="", deadline=None, category_name=None, order=None,
+                          is_later=False, is_completed=False, completed_at=None):
+    properties = {
+        "Title": {
+            "title": [
+                {
+                    "text": {
+                        "content": title
                     }
-                ]
-            },
-            "Description": {
-                "rich_text": [
-                    {
-                        "text": {
-                            "content": description
-                        }
+                }
+            ]
+        },
+        "Description": {
+            "rich_text": [
+                {
+                    "text": {
+                        "content": description
                     }
-                ]
-            },
-            "Status": {
-                "checkbox": False
-            },
-            "Order": {
-                "rich_text": [{"text": {"content": new_order}}]
+                }
+            ]
+        },
+        "Status": {
+            "checkbox": is_completed
+        }
+    }
+
+    if order:
+        properties["Order"] = {
+            "rich_text": [{"text": {"content": order}}]
+        }
+
+    if is_later:
+        properties["IsLater"] = {
+            "checkbox": True
+        }
+
+    if is_completed and completed_at:
+        properties["CompletedAt"] = {
+            "date": {
+                "start": completed_at
             }
         }
 
-        # Add category if provided
-        if category_name:
-            properties["Category"] = {
-                "select": {
-                    "name": category_name
-                }
+    # Add category if provided
+    if category_name:
+        properties["Category"] = {
+            "select": {
+                "name": category_name
             }
+        }
 
-        # Add deadline if exists
-        if deadline:
-            properties["Deadline"] = {
-                "date": {
-                    "start": deadline
-                }
+    # Add deadline if exists
+    if deadline:
+        properties["Deadline"] = {
+            "date": {
+                "start": deadline
             }
+        }
 
-        notion.pages.create(
-            parent={"database_id": DATABASE_ID},
-            properties=properties
-        )
-        return True
-    except Exception as e:
-        logger.error(f"Error creating todo: {e}")
-        return False
+    return properties
 
 def update_todo_order(page_id, new_order):
     try:
-        notion.pages.update(
+        track_page(notion.pages.update(
             page_id=page_id,
             properties={
                 "Order": {
                     "rich_text": [{"text": {"content": new_order}}]
                 }
             }
-        )
+        ))
         return True
     except Exception as e:
-        logger.error(f"Error updating todo order: {e}")
+        logger.error("Error updating todo order: %s", e)
         return False
 
 def update_todo_category(page_id, new_category):
@@ -241,13 +841,13 @@ def update_todo_category(page_id, new_category):
                 } if new_category != "Uncategorized" else None
             }
         }
-        notion.pages.update(
+        track_page(notion.pages.update(
             page_id=page_id,
             properties=properties
-        )
+        ))
         return True
     except Exception as e:
-        print(f"Error updating todo category: {e}")
+        logger.error("Error updating todo category: %s", e)
         return False
 
 def update_todo_completion(page_id, is_completed, completion_date=None):
@@ -269,13 +869,13 @@ def update_todo_completion(page_id, is_completed, completion_date=None):
                 "date": None
             }
             
-        notion.pages.update(
+        track_page(notion.pages.update(
             page_id=page_id,
             properties=properties
-        )
+        ))
         return True
     except Exception as e:
-        print(f"Error updating todo completion: {e}")
+        logger.error("Error updating todo completion: %s", e)
         return False
 
 def update_todo(page_id, title, description="", deadline=None, category_name=None):
@@ -325,18 +925,15 @@ def update_todo(page_id, title, description="", deadline=None, category_name=Non
                 "date": None
             }
 
-        notion.pages.update(
-            page_id=page_id,
-            properties=properties
-        )
+        submit_write('update', page_id, properties)
         return True
     except Exception as e:
-        print(f"Error updating todo: {e}")
+        logger.error("Error updating todo: %s", e)
         return False
 
 def get_lexorank_between(prev_rank=None, next_rank=None, is_completed=False):
     """Generate a lexicographically ordered string rank between prev_rank and next_rank"""
-    logger.debug(f"Generating lexorank: prev_rank={prev_rank}, next_rank={next_rank}, is_completed={is_completed}")
+    logger.debug("Generating lexorank: prev_rank=%s, next_rank=%s, is_completed=%s", prev_rank, next_rank, is_completed, extra=LEXORANK_SAMPLE)
     
     BASE_36_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
     MIN_RANK = "0"
@@ -346,26 +943,26 @@ def get_lexorank_between(prev_rank=None, next_rank=None, is_completed=False):
     # If no ranks provided, return middle of available range
     if not prev_rank and not next_rank:
         result = COMPLETED_PREFIX + "5" + "0" * 8 if is_completed else "5" + "0" * 9
-        logger.debug(f"No ranks provided, returning middle rank: {result}")
+        logger.debug("No ranks provided, returning middle rank: %s", result, extra=LEXORANK_SAMPLE)
         return result
     
     # Handle edge cases
     if not prev_rank:
         prev_rank = MIN_RANK if not is_completed else COMPLETED_PREFIX + MIN_RANK
-        logger.debug(f"No prev_rank, using: {prev_rank}")
+        logger.debug("No prev_rank, using: %s", prev_rank, extra=LEXORANK_SAMPLE)
     if not next_rank:
         next_rank = MAX_RANK if is_completed else COMPLETED_PREFIX + MIN_RANK
-        logger.debug(f"No next_rank, using: {next_rank}")
+        logger.debug("No next_rank, using: %s", next_rank, extra=LEXORANK_SAMPLE)
         
     # Ensure proper length
     prev_rank = prev_rank.ljust(10, '0')
     next_rank = next_rank.ljust(10, '0')
-    logger.debug(f"Padded ranks: prev={prev_rank}, next={next_rank}")
+    logger.debug("Padded ranks: prev=%s, next=%s", prev_rank, next_rank, extra=LEXORANK_SAMPLE)
     
     # If ranks are consecutive in BASE_36, create a mid rank
     if ord(next_rank[-1]) - ord(prev_rank[-1]) == 1:
         prev_rank = prev_rank[:-1] + BASE_36_CHARS[(BASE_36_CHARS.index(prev_rank[-1]) + 1) % 36]
-        logger.debug(f"Adjusted consecutive ranks, new prev_rank: {prev_rank}")
+        logger.debug("Adjusted consecutive ranks, new prev_rank: %s", prev_rank, extra=LEXORANK_SAMPLE)
     
     # Find the midpoint
     mid_rank = ""
@@ -386,36 +983,67 @@ def get_lexorank_between(prev_rank=None, next_rank=None, is_completed=False):
     
     # Pad to 10 characters
     mid_rank = mid_rank.ljust(10, '0')
-    logger.debug(f"Generated mid_rank: {mid_rank}")
+    logger.debug("Generated mid_rank: %s", mid_rank, extra=LEXORANK_SAMPLE)
     
     # Add completed prefix if needed
     if is_completed and not mid_rank.startswith(COMPLETED_PREFIX):
         mid_rank = COMPLETED_PREFIX + mid_rank[1:]
-        logger.debug(f"Added completed prefix, final rank: {mid_rank}")
+        logger.debug("Added completed prefix, final rank: %s", mid_rank, extra=LEXORANK_SAMPLE)
         
     return mid_rank
 
+def get_lexorank_sequence(prev_rank=None, next_rank=None, count=1, is_completed=False):
+    """Generate count evenly spaced ranks strictly between prev_rank and next_rank"""
+    BASE_36_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    COMPLETED_PREFIX = "Z"
+
+    def to_int(rank):
+        value = 0
+        for char in rank.ljust(10, '0')[:10]:
+            value = value * 36 + BASE_36_CHARS.index(char)
+        return value
+
+    def to_rank(value):
+        chars = []
+        for _ in range(10):
+            value, digit = divmod(value, 36)
+            chars.append(BASE_36_CHARS[digit])
+        return ''.join(reversed(chars))
+
+    low = to_int(prev_rank) if prev_rank else to_int(COMPLETED_PREFIX if is_completed else "0")
+    if next_rank:
+        high = to_int(next_rank)
+    else:
+        high = 36 ** 10 if is_completed else to_int(COMPLETED_PREFIX)
+
+    step = (high - low) // (count + 1)
+    if step < 1:
+        raise ValueError(f"No room for {count} ranks between {prev_rank} and {next_rank}")
+    return [to_rank(low + step * (i + 1)) for i in range(count)]
+
 @app.route('/reorder', methods=['POST'])
 def reorder():
     try:
         data = request.get_json()
         todos = data.get('todos', [])
-        logger.info(f"Reordering {len(todos)} todos")
+        logger.info("Reordering %s todos", len(todos))
         
         # Update orders with retry mechanism
         prev_rank = None
         for todo_id in todos:
             try:
                 # Get current todo status
-                page = notion.pages.retrieve(page_id=todo_id)
+                todo_id = resolve_page_id(todo_id)
+                page = page_for(todo_id)
                 is_completed = page['properties']['Status']['checkbox']
                 
                 # Generate new rank
                 new_rank = get_lexorank_between(prev_rank, None, is_completed)
-                logger.debug(f"Updating todo {todo_id} with rank {new_rank} (prev_rank={prev_rank})")
+                logger.debug("Updating todo %s with rank %s (prev_rank=%s)", todo_id, new_rank, prev_rank)
                 
                 # Update the todo with new rank
-                success = update_notion_with_retry(
+                submit_write(
+                    'update',
                     todo_id,
                     {
                         "Order": {
@@ -424,58 +1052,34 @@ def reorder():
                     }
                 )
                 
-                if not success:
-                    logger.error(f"Failed to update order for todo {todo_id}")
-                    return jsonify({"success": False, "error": f"Failed to update order for todo {todo_id}"}), 500
-                
                 prev_rank = new_rank
                 
             except Exception as e:
-                logger.error(f"Error updating todo {todo_id}: {e}")
+                logger.error("Error updating todo %s: %s", todo_id, e)
                 return jsonify({"success": False, "error": f"Error updating todo {todo_id}: {e}"}), 500
         
         logger.info("Reordering completed successfully")
         return jsonify({"success": True})
         
     except Exception as e:
-        logger.error(f"Error in reorder: {e}")
+        logger.error("Error in reorder: %s", e)
         return jsonify({"success": False, "error": str(e)}), 500
 
 def toggle_todo(page_id):
     try:
         # Get current status and current date
-        page = notion.pages.retrieve(page_id=page_id)
+        page_id = resolve_page_id(page_id)
+        page = page_for(page_id)
         current_status = page['properties']['Status']['checkbox']
         now = get_utc_now()
         
         # Toggle status
         new_status = not current_status
         
-        # Get all todos to determine new order
-        todos = get_todos()
-        
-        # Find appropriate order value
-        new_order = None
-        if new_status:  # If task is being completed
-            # Find the last completed task's order
-            last_completed_order = None
-            for todo in todos:
-                if todo['properties'].get('Status', {}).get('checkbox', True):
-                    order_text = todo['properties'].get('Order', {}).get('rich_text', [{}])[0].get('text', {}).get('content', '')
-                    if order_text:
-                        last_completed_order = order_text
-            new_order = get_lexorank_between(last_completed_order, None, True)
-        else:  # If task is being uncompleted
-            # Find the last incomplete task's order
-            last_incomplete_order = None
-            for todo in todos:
-                if not todo['properties'].get('Status', {}).get('checkbox', False):
-                    order_text = todo['properties'].get('Order', {}).get('rich_text', [{}])[0].get('text', {}).get('content', '')
-                    if order_text:
-                        last_incomplete_order = order_text
-            new_order = get_lexorank_between(last_incomplete_order, None, False)
+        # Move the task after the last task of the list it joins (completed or incomplete)
+        new_order = get_lexorank_between(last_order(ensure_task_store(), False, new_status), None, new_status)
         
-        logger.debug(f"Toggling todo {page_id} to {new_status} with new order {new_order}")
+        logger.debug("Toggling todo %s to %s with new order %s", page_id, new_status, new_order)
         
         # Prepare properties update
         properties = {
@@ -501,91 +1105,116 @@ def toggle_todo(page_id):
             }
         
         # Update the page
-        notion.pages.update(
-            page_id=page_id,
-            properties=properties
-        )
+        submit_write('update', page_id, properties)
         return True
     except Exception as e:
-        logger.error(f"Error toggling todo: {e}")
+        logger.error("Error toggling todo: %s", e)
         return False
 
 def delete_todo(page_id):
     try:
-        notion.pages.update(
-            page_id=page_id,
-            archived=True
-        )
+        submit_write('archive', resolve_page_id(page_id))
         return True
     except Exception as e:
-        print(f"Error deleting todo: {e}")
+        logger.error("Error deleting todo: %s", e)
         return False
 
-def get_page_info(page_id):
-    try:
-        # First, retrieve the page itself
-        page = notion.pages.retrieve(page_id=page_id)
-        print(f"Retrieved page data: {page}")
+PREVIEW_BLOCK_LIMIT = 10  # blocks requested per preview; at most 5 become preview lines
+PREVIEW_WAIT_SECONDS = float(os.getenv('PREVIEW_WAIT_SECONDS', '0'))
+
+def fetch_page_info(page_id):
+    # First, retrieve the page itself
+    page = notion.pages.retrieve(page_id=page_id)
+    
+    # Find the title
+    title = ""
+    if 'properties' in page:
+        for prop in page['properties'].values():
+            if prop.get('type') == 'title':
+                title_parts = prop.get('title', [])
+                if title_parts:
+                    title = title_parts[0].get('plain_text', '')
+                    break
+
+    # Get the first blocks of the page content
+    blocks = notion.blocks.children.list(block_id=page_id, page_size=PREVIEW_BLOCK_LIMIT)
+    
+    preview_text = []
+    for block in blocks.get('results', []):
+        block_type = block.get('type', '')
         
-        # Find the title
-        title = ""
-        if 'properties' in page:
-            for prop in page['properties'].values():
-                if prop.get('type') == 'title':
-                    title_parts = prop.get('title', [])
-                    if title_parts:
-                        title = title_parts[0].get('plain_text', '')
-                        break
-
-        # Get the page content
-        blocks = notion.blocks.children.list(block_id=page_id)
-        print(f"Retrieved blocks: {blocks}")
+        if block_type == 'paragraph':
+            text_content = block['paragraph'].get('rich_text', [])
+            if text_content:
+                preview_text.append(text_content[0].get('plain_text', ''))
         
-        preview_text = []
-        for block in blocks.get('results', []):
-            block_type = block.get('type', '')
-            
-            if block_type == 'paragraph':
-                text_content = block['paragraph'].get('rich_text', [])
-                if text_content:
-                    preview_text.append(text_content[0].get('plain_text', ''))
-            
-            elif block_type == 'heading_1':
-                text_content = block['heading_1'].get('rich_text', [])
-                if text_content:
-                    preview_text.append(f"# {text_content[0].get('plain_text', '')}")
-            
-            elif block_type == 'heading_2':
-                text_content = block['heading_2'].get('rich_text', [])
-                if text_content:
-                    preview_text.append(f"## {text_content[0].get('plain_text', '')}")
-            
-            elif block_type == 'heading_3':
-                text_content = block['heading_3'].get('rich_text', [])
-                if text_content:
-                    preview_text.append(f"### {text_content[0].get('plain_text', '')}")
-            
-            elif block_type == 'bulleted_list_item':
-                text_content = block['bulleted_list_item'].get('rich_text', [])
-                if text_content:
-                    preview_text.append(f"• {text_content[0].get('plain_text', '')}")
-            
-            elif block_type == 'numbered_list_item':
-                text_content = block['numbered_list_item'].get('rich_text', [])
-                if text_content:
-                    preview_text.append(f"1. {text_content[0].get('plain_text', '')}")
-
-            # Max 5 blocks
-            if len(preview_text) >= 5:
-                break
-
-        return {
-            'title': title,
-            'preview': '\n'.join(preview_text)
-        }
-    except Exception as e:
-        print(f"Error fetching page info: {e}")
-        return {'title': '', 'preview': ''}
+        elif block_type == 'heading_1':
+            text_content = block['heading_1'].get('rich_text', [])
+            if text_content:
+                preview_text.append(f"# {text_content[0].get('plain_text', '')}")
+        
+        elif block_type == 'heading_2':
+            text_content = block['heading_2'].get('rich_text', [])
+            if text_content:
+                preview_text.append(f"## {text_content[0].get('plain_text', '')}")
+        
+        elif block_type == 'heading_3':
+            text_content = block['heading_3'].get('rich_text', [])
+            if text_content:
+                preview_text.append(f"### {text_content[0].get('plain_text', '')}")
+        
+        elif block_type == 'bulleted_list_item':
+            text_content = block['bulleted_list_item'].get('rich_text', [])
+            if text_content:
+                preview_text.append(f"• {text_content[0].get('plain_text', '')}")
+        
+        elif block_type == 'numbered_list_item':
+            text_content = block['numbered_list_item'].get('rich_text', [])
+            if text_content:
+                preview_text.append(f"1. {text_content[0].get('plain_text', '')}")
+
+        # Max 5 blocks
+        if len(preview_text) >= 5:
+            break
+
+    return {
+        'title': title,
+        'preview': '\n'.join(preview_text),
+        'last_edited_time': page.get('last_edited_time')
+    }
+
+preview_fetcher = PreviewFetcher(fetch_page_info)
+
+def get_page_info(page_id, wait=PREVIEW_WAIT_SECONDS):
+    """Cached preview of a page; None while it is still being fetched in the background"""
+    context = current_context()
+    known = context.store.summary(page_id)
+    last_edited_time = known['last_edited_time'] if known else None
+    return preview_fetcher.get(context, page_id, last_edited_time, wait=wait)
+
+@app.route('/page-info')
+def page_info():
+    page_ids = request.args.getlist('id')
+    page_ids += [extract_page_id_from_url(url) for url in request.args.getlist('url')]
+    page_ids = [page_id for page_id in page_ids if page_id]
+    if not page_ids:
+        return jsonify({"success": False, "error": "id or url is required"}), 400
+
+    try:
+        wait = min(float(request.args.get('wait', PREVIEW_WAIT_SECONDS)), 5.0)
+    except ValueError:
+        wait = PREVIEW_WAIT_SECONDS
+
+    # Start every fetch before waiting on any, so a batch costs one round of latency
+    context = current_context()
+    preview_fetcher.prefetch(context, [
+        (page_id, (context.store.summary(page_id) or {}).get('last_edited_time')) for page_id in page_ids
+    ])
+    previews = {}
+    for page_id in page_ids:
+        preview = get_page_info(page_id, wait=wait)
+        previews[page_id] = preview if preview is not None else {"pending": True}
+    return jsonify({"success": True, "previews": previews})
 
 def extract_page_id_from_url(url):
     try:
@@ -596,154 +1225,315 @@ def extract_page_id_from_url(url):
             return f"{page_id[:8]}-{page_id[8:12]}-{page_id[12:16]}-{page_id[16:20]}-{page_id[20:]}"
         return None
     except Exception as e:
-        print(f"Error extracting page ID from URL: {e}")
+        logger.error("Error extracting page ID from URL: %s", e)
         return None
 
 @app.route('/')
 def index():
-    todos = get_todos()
-    categories = get_categories()
+    with span('index.load'):
+        todos = get_todos()
+        categories = get_categories()
     now = get_utc_now()
     
-    # Get user's local timezone
-    local_tz = pytz.timezone('Europe/Istanbul')  # Türkiye için
-    today = now.astimezone(local_tz).date()
+    # Local day boundaries in the user's timezone; tasks are placed on days by epoch seconds
+    buckets = day_buckets(current_timezone_name(), now)
+    with span('index.group', tasks=len(todos)):
+        sorted_days, week_end = group_by_day(todos, buckets)
+    
+    with span('index.render'):
+        return render_template('index.html', 
+                             grouped_todos=sorted_days, 
+                             categories=categories, 
+                             now=now,
+                             today=buckets.today,
+                             week_end=week_end)
+
+def group_by_day(todos, buckets):
+    """Group tasks into Today, This Week and past days; returns (sorted days, end of this week)"""
+    today = buckets.today
+    store = current_context().store
     
-    # Calculate the end of this week (Sunday)
-    week_end = today + timedelta(days=(6 - today.weekday()))
+    # Days from today to the end of this week (Sunday)
+    week_end_offset = 6 - today.weekday()
+    week_end = buckets.day(week_end_offset)
     
-    # Dictionary to store todos grouped by day and category
+    # Dictionary to store todos grouped by day (as days from today) and category
     grouped_todos = {}
     
     # Initialize Today and This Week sections
-    today_str = today.strftime('%Y-%m-%d')
-    grouped_todos[today_str] = {
+    grouped_todos[0] = {
         'date': today,
         'categories': {},
         'section': 'today'
     }
     
     # Initialize This Week section with tomorrow's date
-    tomorrow = today + timedelta(days=1)
-    this_week_str = tomorrow.strftime('%Y-%m-%d')
-    grouped_todos[this_week_str] = {
-        'date': tomorrow,
+    grouped_todos[1] = {
+        'date': buckets.day(1),
         'categories': {},
         'section': 'this_week'
     }
     
     for todo in todos:
         try:
-            title = todo['properties'].get('Title', {}).get('title', [])
-            title_content = title[0]['text']['content'] if title else 'Untitled'
-            
-            description = todo['properties'].get('Description', {}).get('rich_text', [])
-            description_content = description[0]['text']['content'] if description else ''
-            
-            # Get deadline
-            deadline = todo['properties'].get('Deadline', {}).get('date', {})
-            deadline_date = None
-            if deadline and deadline.get('start'):
-                deadline_date = datetime.fromisoformat(deadline['start'].replace('Z', '+00:00')).astimezone(local_tz)
-            
-            # Get category from select field
-            category = todo['properties'].get('Category', {}).get('select', {})
-            category_name = category.get('name', '') if category else 'Uncategorized'
-            
-            # Get completion status and date
-            is_completed = todo['properties'].get('Status', {}).get('checkbox', False)
-            completed_at = todo['properties'].get('CompletedAt', {}).get('date', {})
-            completed_date = None
-            if completed_at and completed_at.get('start'):
-                # Parse the completion date and ensure it's in UTC
-                completed_str = completed_at['start']
-                # Fix malformed UTC offset by removing any duplicate +00:00
-                if completed_str.count('+00:00') > 1:
-                    completed_str = completed_str.replace('+00:00', '', completed_str.count('+00:00') - 1)
-                if not completed_str.endswith('Z') and not completed_str.endswith('+00:00'):
-                    completed_str += 'Z'
-                completed_date = datetime.fromisoformat(completed_str.replace('Z', '+00:00')).astimezone(local_tz)
-            
+            task = stored_summary(store, todo)
+            category_name = task['category'] or 'Uncategorized'
+            is_completed = task['completed']
+        
             # Format the todo
             formatted_todo = {
-                'id': todo['id'],
-                'title': title_content,
-                'description': description_content,
+                'id': task['id'],
+                'title': task['title'] or 'Untitled',
+                'description': task['description'],
                 'category': category_name,
                 'completed': is_completed,
-                'created_at': datetime.fromisoformat(todo['created_time'].replace('Z', '+00:00')).astimezone(local_tz),
-                'completed_at': completed_date,
-                'deadline': deadline_date,
-                'order': todo['properties'].get('Order', {}).get('rich_text', [{}])[0].get('text', {}).get('content', '0')
+                'completed_at': buckets.local(task['completed_ts']),
+                'deadline': buckets.local(task['deadline_ts']),
+                'order': task['order'] or '0',
+                'sort_key': (
+                    is_completed,
+                    task['order'] or '0',
+                    task['deadline_ts'] if task['deadline_ts'] is not None else float('inf'),
+                    task['completed_ts'] or task['created_ts'] or 0
+                )
             }
-            
+        
             # Determine which day to show the todo
-            if is_completed and completed_date:
-                display_date = completed_date.date()
-            elif deadline_date:
-                display_date = deadline_date.date()
+            if is_completed and task['completed_ts'] is not None:
+                offset = buckets.offset(task['completed_ts'])
+            elif task['deadline_ts'] is not None:
+                offset = buckets.offset(task['deadline_ts'])
             else:
-                display_date = today
-            
-            day_str = display_date.strftime('%Y-%m-%d')
-            
+                offset = 0
+        
             # Initialize the day if it doesn't exist
-            if day_str not in grouped_todos:
-                grouped_todos[day_str] = {
-                    'date': display_date,
+            if offset not in grouped_todos:
+                grouped_todos[offset] = {
+                    'date': buckets.day(offset),
                     'categories': {},
                     'section': 'past'  # Default section
                 }
-            
+        
             # Update section based on date
             if not is_completed:  # Only uncompleted tasks should be in Today or This Week
-                if display_date == today:
-                    grouped_todos[day_str]['section'] = 'today'
-                elif today < display_date <= week_end:
-                    grouped_todos[day_str]['section'] = 'this_week'
-            
-            # Initialize the category if it doesn't exist for this day
-            if category_name not in grouped_todos[day_str]['categories']:
-                grouped_todos[day_str]['categories'][category_name] = []
-            
+                if offset == 0:
+                    grouped_todos[offset]['section'] = 'today'
+                elif 0 < offset <= week_end_offset:
+                    grouped_todos[offset]['section'] = 'this_week'
+        
             # Add the todo to its category within the day
-            grouped_todos[day_str]['categories'][category_name].append(formatted_todo)
-            
+            grouped_todos[offset]['categories'].setdefault(category_name, []).append(formatted_todo)
+        
         except Exception as e:
-            print(f"Error formatting todo: {e}")
+            logger.error("Error formatting todo: %s", e)
             continue
-    
+
     # Sort days in reverse chronological order
-    sorted_days = sorted(grouped_todos.items(), key=lambda x: (
-        # Sort by section (today first, then this_week, then past)
-        0 if x[1]['section'] == 'today' else 1 if x[1]['section'] == 'this_week' else 2,
-        # Then by date
-        x[1]['date']
-    ))
-    
-    # For each day, sort categories alphabetically and sort todos within categories
-    for day_str, day_data in grouped_todos.items():
-        # Sort categories with Uncategorized always first, then alphabetically
-        day_data['categories'] = dict(sorted(
-            day_data['categories'].items(),
-            key=lambda x: ('1' if x[0] == '' or x[0] == 'Uncategorized' else '2' + x[0].lower())
-        ))
-        
-        # Sort todos within each category
-        for category in day_data['categories'].values():
-            category.sort(key=lambda x: (
-                x['completed'],
-                x['order'],
-                x['deadline'] if x['deadline'] else datetime.max.replace(tzinfo=pytz.UTC),
-                x['completed_at'] if x['completed_at'] else x['created_at']
+    with span('index.sort'):
+        sorted_days = [(day_data['date'].strftime('%Y-%m-%d'), day_data) for _, day_data in sorted(
+            grouped_todos.items(),
+            key=lambda x: (
+                # Sort by section (today first, then this_week, then past)
+                0 if x[1]['section'] == 'today' else 1 if x[1]['section'] == 'this_week' else 2,
+                # Then by date
+                x[0]
+            )
+        )]
+
+        # For each day, sort categories alphabetically and sort todos within categories
+        for day_data in grouped_todos.values():
+            # Sort categories with Uncategorized always first, then alphabetically
+            day_data['categories'] = dict(sorted(
+                day_data['categories'].items(),
+                key=lambda x: ('1' if x[0] == '' or x[0] == 'Uncategorized' else '2' + x[0].lower())
             ))
     
-    return render_template('index.html', 
-                         grouped_todos=sorted_days, 
-                         categories=categories, 
-                         now=now,
-                         today=today,
-                         week_end=week_end)
+            # Sort todos within each category
+            for category in day_data['categories'].values():
+                category.sort(key=lambda x: x['sort_key'])
+
+    return sorted_days, week_end
+
+def local_to_utc_iso(value):
+    """Convert an ISO date/datetime string to UTC; naive values are taken as the user's local time."""
+    local_dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if local_dt.tzinfo is None:
+        local_dt = localize(local_dt, current_timezone())
+    return local_dt.astimezone(pytz.UTC).isoformat()
+
+# Import jobs by id, most recent last; only the latest few are kept
+import_jobs = OrderedDict()
+MAX_IMPORT_JOBS = 100
+
+def last_order(store, is_later, is_completed):
+    return store.last_order('later' if is_later else 'active', is_completed)
+
+def assign_import_ranks(store, rows):
+    """Give every imported row an order after the last task of its list, in one pass."""
+    groups = OrderedDict()
+    for row in rows:
+        groups.setdefault((row['later'], row['completed']), []).append(row)
+    for (is_later, is_completed), group in groups.items():
+        ranks = get_lexorank_sequence(last_order(store, is_later, is_completed), None, len(group), is_completed)
+        for row, rank in zip(group, ranks):
+            row['order'] = rank
+
+def import_row(row):
+    now = get_utc_now().isoformat()
+    properties = build_todo_properties(
+        row['title'],
+        row['description'],
+        local_to_utc_iso(row['deadline']) if row['deadline'] else None,
+        row['category'],
+        row['order'],
+        is_later=row['later'],
+        is_completed=row['completed'],
+        completed_at=now if row['completed'] else None
+    )
+    return track_page(notion.pages.create(
+        parent={"database_id": current_database_id()},
+        properties=properties
+    ))
+
+def run_import(context, rows, progress):
+    with tenant_scope(context):
+        run_pipeline(import_row, rows, progress, wrap=lambda: tenant_scope(context))
+    logger.info("Import finished: %s created, %s failed", progress.done, progress.failed)
+
+@app.route('/import', methods=['POST'])
+def import_tasks():
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    fmt = request.args.get('format')
+    if not fmt:
+        name = upload.filename if upload else ''
+        mimetype = upload.mimetype if upload else request.mimetype
+        fmt = 'csv' if name.lower().endswith('.csv') or mimetype == 'text/csv' else 'json'
+
+    try:
+        rows = list(iter_import_rows(stream, fmt))
+    except (InvalidImport, ValueError, UnicodeDecodeError) as e:
+        return jsonify({"success": False, "error": f"Invalid {fmt} input: {e}"}), 400
+    if not rows:
+        return jsonify({"success": False, "error": "No tasks to import"}), 400
+
+    context = current_context()
+    try:
+        assign_import_ranks(ensure_task_store(), rows)
+    except Exception as e:
+        logger.error("Error preparing import: %s", e)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    job_id = uuid.uuid4().hex
+    progress = Progress(len(rows))
+    import_jobs[job_id] = progress
+    while len(import_jobs) > MAX_IMPORT_JOBS:
+        import_jobs.popitem(last=False)
+
+    threading.Thread(target=run_import, args=(context, rows, progress), daemon=True).start()
+    return jsonify({
+        "success": True,
+        "job": job_id,
+        "status_url": url_for('import_status', job_id=job_id),
+        **progress.to_dict()
+    }), 202
+
+@app.route('/import/<string:job_id>')
+def import_status(job_id):
+    progress = import_jobs.get(job_id)
+    if progress is None:
+        return jsonify({"success": False, "error": "Unknown import job"}), 404
+    return jsonify({"success": True, "job": job_id, **progress.to_dict()})
+
+@app.route('/export')
+def export_tasks():
+    try:
+        store = ensure_task_store()
+    except Exception as e:
+        logger.error("Error syncing tasks for export: %s", e)
+        return jsonify({"success": False, "error": str(e)}), 502
+
+    def generate():
+        for page in store.iter_pages():
+            yield to_ndjson(summarize_page(page))
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=tasks.ndjson'}
+    )
+
+MAX_SEARCH_RESULTS = 100
+
+@app.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    try:
+        limit = min(int(request.args.get('limit', 20)), MAX_SEARCH_RESULTS)
+    except ValueError:
+        limit = 20
+    if not query:
+        return jsonify({"success": True, "results": []})
+
+    try:
+        ensure_task_store()
+    except Exception as e:
+        # Fall back to whatever the store already holds
+        logger.error("Error syncing tasks for search: %s", e)
+
+    started = time.perf_counter()
+    results = current_context().search_index.search(query, limit)
+    took_ms = round((time.perf_counter() - started) * 1000, 3)
+    return jsonify({"success": True, "results": results, "took_ms": took_ms})
+
+MAX_QUERY_LIMIT = 1000
+
+def parse_bool_arg(value):
+    if value is None:
+        return None
+    return value.lower() in ('1', 'true', 'yes')
+
+@app.route('/api/tasks')
+def query_tasks():
+    args = request.args
+    section = args.get('section')
+    if section is not None and section not in SECTIONS:
+        return jsonify({"success": False, "error": f"section must be one of {', '.join(SECTIONS)}"}), 400
+
+    sort = args.get('sort', 'order')
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    if sort not in SORT_FIELDS:
+        return jsonify({"success": False, "error": f"sort must be one of {', '.join(SORT_FIELDS)}"}), 400
+
+    try:
+        limit = max(1, min(int(args.get('limit', 100)), MAX_QUERY_LIMIT))
+        deadline_from = parse_timestamp(local_to_utc_iso(args['deadline_from'])) if args.get('deadline_from') else None
+        deadline_to = parse_timestamp(local_to_utc_iso(args['deadline_to'])) if args.get('deadline_to') else None
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        store = ensure_task_store()
+    except Exception as e:
+        logger.error("Error syncing tasks for query: %s", e)
+        store = current_context().store
+
+    tasks = store.query(
+        category=args.get('category'),
+        section=section,
+        completed=parse_bool_arg(args.get('completed')),
+        deadline_from=deadline_from,
+        deadline_to=deadline_to,
+        parent=args.get('parent'),
+        sort=sort,
+        descending=descending,
+        limit=limit
+    )
+    for task in tasks:
+        for field in TIMESTAMP_FIELDS:
+            task.pop(field, None)
+    return jsonify({"success": True, "tasks": tasks, "count": len(tasks)})
 
 @app.route('/recurring')
 def recurring_tasks_page():
@@ -778,7 +1568,7 @@ def recurring_tasks_page():
                 'category': category
             })
         except Exception as e:
-            print(f"Error formatting recurring task: {str(e)}")
+            logger.error("Error formatting recurring task: %s", e)
             continue
     
     categories = get_categories()
@@ -794,10 +1584,7 @@ def add():
     if title:
         if deadline:
             # Convert local time to UTC
-            local_tz = pytz.timezone('Europe/Istanbul')
-            local_dt = datetime.fromisoformat(deadline)
-            local_dt = local_tz.localize(local_dt)
-            utc_dt = local_dt.astimezone(pytz.UTC).isoformat()
+            utc_dt = local_to_utc_iso(deadline)
             create_todo(title, description, utc_dt, category if category else None)
         else:
             create_todo(title, description, None, category if category else None)
@@ -816,25 +1603,61 @@ def delete(id):
 def update_notion_with_retry(page_id, properties, max_retries=3, delay=0.5):
     for attempt in range(max_retries):
         try:
-            logger.debug(f"Updating notion page {page_id} (attempt {attempt + 1}/{max_retries})")
-            logger.debug(f"Properties: {properties}")
+            logger.debug("Updating notion page %s (attempt %s/%s)", page_id, attempt + 1, max_retries)
+            logger.debug("Properties: %s", properties)
             
-            notion.pages.update(
+            track_page(notion.pages.update(
                 page_id=page_id,
                 properties=properties
-            )
-            logger.debug(f"Successfully updated page {page_id}")
+            ))
+            logger.debug("Successfully updated page %s", page_id)
             return True
         except Exception as e:
             if "Conflict" in str(e) and attempt < max_retries - 1:
-                logger.warning(f"Conflict error updating page {page_id}, retrying in {delay * (attempt + 1)}s")
+                logger.warning("Conflict error updating page %s, retrying in %ss", page_id, delay * (attempt + 1))
+                metrics.notion_update_retries.inc()
                 time.sleep(delay * (attempt + 1))  # Exponential backoff
                 continue
-            logger.error(f"Error updating todo (attempt {attempt + 1}/{max_retries}): {e}")
+            logger.error("Error updating todo (attempt %s/%s): %s", attempt + 1, max_retries, e)
             if attempt == max_retries - 1:
                 raise
     return False
 
+def build_move_properties(new_category=None, new_section=None):
+    # Prepare properties for a single update
+    properties = {}
+
+    # Add category update if needed
+    if new_category is not None:
+        properties["Category"] = {
+            "select": {
+                "name": new_category
+            } if new_category != "Uncategorized" else None
+        }
+
+    # Update deadline based on section
+    if new_section is not None:
+        local_tz = current_timezone()
+        today = get_utc_now().astimezone(local_tz).date()
+
+        if new_section == 'today':
+            # Set deadline to today
+            deadline = datetime.combine(today, datetime.min.time())
+            deadline = localize(deadline, local_tz).astimezone(pytz.UTC)
+        else:  # this_week
+            # Set deadline to tomorrow for "This Week" section
+            tomorrow = today + timedelta(days=1)
+            deadline = datetime.combine(tomorrow, datetime.min.time())
+            deadline = localize(deadline, local_tz).astimezone(pytz.UTC)
+
+        properties["Deadline"] = {
+            "date": {
+                "start": deadline.isoformat()
+            }
+        }
+
+    return properties
+
 @app.route('/move', methods=['POST'])
 def move_todo():
     try:
@@ -843,57 +1666,120 @@ def move_todo():
         new_category = data.get('newCategory')
         new_section = data.get('newSection')  # 'today' or 'this_week'
         is_completed = data.get('isCompleted', False)
-        
-        # Prepare properties for a single update
-        properties = {}
-        
-        # Add category update if needed
-        if new_category is not None:
-            properties["Category"] = {
-                "select": {
-                    "name": new_category
-                } if new_category != "Uncategorized" else None
-            }
-        
-        # Update deadline based on section
-        if new_section is not None:
-            now = get_utc_now()
-            local_tz = pytz.timezone('Europe/Istanbul')
-            today = now.astimezone(local_tz).date()
-            
-            if new_section == 'today':
-                # Set deadline to today
-                deadline = datetime.combine(today, datetime.min.time())
-                deadline = local_tz.localize(deadline).astimezone(pytz.UTC)
-            else:  # this_week
-                # Set deadline to tomorrow for "This Week" section
-                tomorrow = today + timedelta(days=1)
-                deadline = datetime.combine(tomorrow, datetime.min.time())
-                deadline = local_tz.localize(deadline).astimezone(pytz.UTC)
-            
-            properties["Deadline"] = {
-                "date": {
-                    "start": deadline.isoformat()
-                }
-            }
-        
-        # Make a single API call to update everything with retry logic
+
+        properties = build_move_properties(new_category, new_section)
+
+        # A single write updates everything
         if properties:
             try:
-                success = update_notion_with_retry(todo_id, properties)
-                if success:
-                    time.sleep(0.1)  # Small delay to prevent rapid consecutive updates
-                    return jsonify({"success": True})
-                return jsonify({"success": False, "error": "Failed to update after retries"}), 500
+                submit_write('update', resolve_page_id(todo_id), properties)
             except Exception as e:
-                print(f"Error updating todo: {e}")
+                logger.error("Error updating todo: %s", e)
                 return jsonify({"success": False, "error": str(e)}), 500
         
         return jsonify({"success": True})
     except Exception as e:
-        print(f"Error in move_todo: {e}")
+        logger.error("Error in move_todo: %s", e)
         return jsonify({"success": False, "error": str(e)}), 500
 
+BULK_ACTIONS = ('complete', 'uncomplete', 'delete', 'move', 'later', 'unlater')
+MAX_BULK_IDS = int(os.getenv('MAX_BULK_IDS', '500'))
+
+def plan_bulk_action(store, action, ids, data):
+    """Map each page id to the properties to write (None means archive), computing all ranks in one pass"""
+    now = get_utc_now().isoformat()
+
+    if action == 'delete':
+        return {page_id: None for page_id in ids}
+
+    if action == 'move':
+        properties = build_move_properties(data.get('newCategory'), data.get('newSection'))
+        return {page_id: properties for page_id in ids}
+
+    if action == 'later':
+        return {page_id: {"IsLater": {"checkbox": True}} for page_id in ids}
+
+    is_completed = action == 'complete'
+    ranks = get_lexorank_sequence(last_order(store, False, is_completed), None, len(ids), is_completed)
+    plan = {}
+    for page_id, rank in zip(ids, ranks):
+        properties = {
+            "Order": {
+                "rich_text": [{"text": {"content": rank}}]
+            }
+        }
+        if action == 'unlater':
+            properties["IsLater"] = {"checkbox": False}
+        else:
+            properties["Status"] = {"checkbox": is_completed}
+            properties["CompletedAt"] = {"date": {"start": now} if is_completed else None}
+        plan[page_id] = properties
+    return plan
+
+def apply_bulk_write(item):
+    """One page of a bulk action, through the write queue like any other write"""
+    page_id, properties = item
+    if properties is None:
+        return submit_write('archive', resolve_page_id(page_id))
+    return submit_write('update', page_id, properties)
+
+def delete_page(page_id):
+    notion.pages.update(
+        page_id=page_id,
+        archived=True
+    )
+    untrack_page(page_id)
+
+@app.route('/bulk', methods=['POST'])
+def bulk_action():
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    ids = list(dict.fromkeys(data.get('ids') or []))  # dedupe, keep order
+
+    if action not in BULK_ACTIONS:
+        return jsonify({"success": False, "error": f"action must be one of {', '.join(BULK_ACTIONS)}"}), 400
+    if not ids:
+        return jsonify({"success": False, "error": "ids is required"}), 400
+    if len(ids) > MAX_BULK_IDS:
+        return jsonify({"success": False, "error": f"At most {MAX_BULK_IDS} ids per request"}), 400
+
+    context = current_context()
+    try:
+        store = ensure_task_store() if action in ('complete', 'uncomplete', 'unlater') else context.store
+        plan = plan_bulk_action(store, action, ids, data)
+    except Exception as e:
+        logger.error("Error planning bulk %s: %s", action, e)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    if write_queue is not None:
+        # Queued writes are local SQLite inserts: no Notion call, so no rate limit or pool
+        outcomes = []
+        with write_queue.batch():
+            for item in plan.items():
+                try:
+                    outcomes.append((item, apply_bulk_write(item), None))
+                except Exception as e:
+                    logger.error("Error queueing bulk %s for %s: %s", action, item[0], e)
+                    outcomes.append((item, None, e))
+    else:
+        outcomes = run_pipeline(apply_bulk_write, plan.items(), wrap=lambda: tenant_scope(context))
+
+    results = {}
+    for (page_id, _), _, error in outcomes:
+        results[page_id] = {"success": True} if error is None else {"success": False, "error": str(error)}
+
+    failed = sum(1 for result in results.values() if not result['success'])
+    logger.info("Bulk %s on %s tasks finished with %s failures", action, len(ids), failed)
+    return jsonify({"success": failed == 0, "results": results}), 200 if failed == 0 else 207
+
+def same_local_deadline(page_id, deadline):
+    """True if a deadline from the edit form (local time, to the minute) is the task's current one"""
+    task = current_context().store.summary(resolve_page_id(page_id))
+    if not task or task['deadline_ts'] is None:
+        return False
+    current = datetime.fromtimestamp(task['deadline_ts'], current_timezone()).replace(tzinfo=None)
+    return timedelta(0) <= current - datetime.fromisoformat(deadline) < timedelta(minutes=1)
+
 @app.route('/edit', methods=['POST'])
 def edit():
     try:
@@ -904,12 +1790,12 @@ def edit():
         category = request.form.get('category', '')
         
         if todo_id and title:
-            if deadline:
+            if deadline and same_local_deadline(todo_id, deadline):
+                # Unchanged; leave Deadline out of the update
+                success = update_todo(todo_id, title, description, None, category)
+            elif deadline:
                 # Convert local time to UTC
-                local_tz = pytz.timezone('Europe/Istanbul')
-                local_dt = datetime.fromisoformat(deadline)
-                local_dt = local_tz.localize(local_dt)
-                utc_dt = local_dt.astimezone(pytz.UTC).isoformat()
+                utc_dt = local_to_utc_iso(deadline)
                 success = update_todo(todo_id, title, description, utc_dt, category)
             else:
                 success = update_todo(todo_id, title, description, "", category)
@@ -919,13 +1805,13 @@ def edit():
                 
         return redirect(url_for('index'))
     except Exception as e:
-        print(f"Error in edit: {e}")
+        logger.error("Error in edit: %s", e)
         return jsonify({"success": False, "error": str(e)}), 500
 
 def create_category(category_name):
     try:
         # First, get current database to retrieve existing categories
-        database = notion.databases.retrieve(database_id=DATABASE_ID)
+        database = notion.databases.retrieve(database_id=current_database_id())
         current_options = database.get('properties', {}).get('Category', {}).get('select', {}).get('options', [])
         
         # Check if category already exists
@@ -938,7 +1824,7 @@ def create_category(category_name):
         
         # Update database with all categories
         database = notion.databases.update(
-            database_id=DATABASE_ID,
+            database_id=current_database_id(),
             properties={
                 "Category": {
                     "select": {
@@ -948,6 +1834,8 @@ def create_category(category_name):
             }
         )
         
+        forget_categories()
+
         # Get the newly created category's details
         category_options = database.get('properties', {}).get('Category', {}).get('select', {}).get('options', [])
         for option in category_options:
@@ -955,7 +1843,7 @@ def create_category(category_name):
                 return {"id": option.get('id'), "name": option.get('name')}
         return None
     except Exception as e:
-        print(f"Error creating category: {e}")
+        logger.error("Error creating category: %s", e)
         return None
 
 @app.route('/create-category', methods=['POST'])
@@ -971,13 +1859,13 @@ def add_category():
             return jsonify({"success": True, "category": result})
         return jsonify({"success": False, "error": "Failed to create category"}), 500
     except Exception as e:
-        print(f"Error in add_category: {e}")
+        logger.error("Error in add_category: %s", e)
         return jsonify({"success": False, "error": str(e)}), 500
 
 def get_recurring_tasks():
     try:
         response = notion.databases.query(
-            database_id=DATABASE_ID,
+            database_id=current_database_id(),
             filter={
                 "and": [
                     {
@@ -997,7 +1885,7 @@ def get_recurring_tasks():
         )
         return response.get('results', [])
     except Exception as e:
-        print(f"Error fetching recurring tasks: {e}")
+        logger.error("Error fetching recurring tasks: %s", e)
         return []
 
 def create_recurring_task(title, description="", category_name=None, recurrence_pattern="daily", interval=1, interval_unit="days"):
@@ -1047,17 +1935,17 @@ def create_recurring_task(title, description="", category_name=None, recurrence_
             }
 
         # Create the recurring task template
-        response = notion.pages.create(
-            parent={"database_id": DATABASE_ID},
+        response = track_page(notion.pages.create(
+            parent={"database_id": current_database_id()},
             properties=properties
-        )
+        ))
 
         # Generate the first instance
         generate_task_instance(response['id'])
         
         return True
     except Exception as e:
-        print(f"Error creating recurring task: {e}")
+        logger.error("Error creating recurring task: %s", e)
         return False
 
 def generate_task_instance(template_id):
@@ -1068,7 +1956,7 @@ def generate_task_instance(template_id):
         # Get properties from template
         title = template['properties']['Title']['title'][0]['text']['content']
         description = template['properties']['Description']['rich_text'][0]['text']['content'] if template['properties']['Description']['rich_text'] else ""
-        category = template['properties'].get('Category', {}).get('select', {}).get('name')
+        category = (template['properties'].get('Category', {}).get('select') or {}).get('name')
         
         # Create the task instance
         properties = {
@@ -1112,13 +2000,13 @@ def generate_task_instance(template_id):
             }
 
         # Create the task instance
-        notion.pages.create(
-            parent={"database_id": DATABASE_ID},
+        track_page(notion.pages.create(
+            parent={"database_id": current_database_id()},
             properties=properties
-        )
+        ))
 
         # Update LastGenerated date on template
-        notion.pages.update(
+        track_page(notion.pages.update(
             page_id=template_id,
             properties={
                 "LastGenerated": {
@@ -1127,11 +2015,11 @@ def generate_task_instance(template_id):
                     }
                 }
             }
-        )
+        ))
 
         return True
     except Exception as e:
-        print(f"Error generating task instance: {e}")
+        logger.error("Error generating task instance: %s", e)
         return False
 
 def check_recurring_tasks():
@@ -1140,12 +2028,12 @@ def check_recurring_tasks():
         now = get_utc_now()
         
         for task in recurring_tasks:
-            last_generated = task['properties'].get('LastGenerated', {}).get('date', {}).get('start')
+            last_generated = (task['properties'].get('LastGenerated', {}).get('date') or {}).get('start')
             if not last_generated:
                 continue
                 
             last_generated = datetime.fromisoformat(last_generated.replace('Z', '+00:00'))
-            pattern = task['properties'].get('RecurrencePattern', {}).get('select', {}).get('name', 'daily')
+            pattern = (task['properties'].get('RecurrencePattern', {}).get('select') or {}).get('name', 'daily')
             interval = task['properties'].get('RecurrenceInterval', {}).get('number', 1)
             
             # Calculate next generation date
@@ -1164,12 +2052,75 @@ def check_recurring_tasks():
             if now >= next_date:
                 generate_task_instance(task['id'])
     except Exception as e:
-        print(f"Error checking recurring tasks: {e}")
+        logger.error("Error checking recurring tasks: %s", e)
 
-# Initialize the scheduler
-scheduler = BackgroundScheduler()
-scheduler.add_job(func=check_recurring_tasks, trigger="interval", minutes=30)
-scheduler.start()
+def check_recurring_tasks_all_tenants():
+    for name in tenant_pool.names():
+        try:
+            with tenant_scope(tenant_pool.get(name)):
+                check_recurring_tasks()
+        except Exception as e:
+            logger.error("Error checking recurring tasks for tenant %s: %s", name, e)
+
+def timed_job(func):
+    """Record each run of a scheduled job in the scheduler_job_duration_seconds histogram (and trace it)"""
+    def run():
+        started = time.perf_counter()
+        outcome = 'ok'
+        trace, tokens = tracing.start_trace(f'job {func.__name__}')
+        account, account_token = call_budget.start_account(func.__name__)
+        try:
+            func()
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            metrics.scheduler_job_duration.observe(time.perf_counter() - started, job=func.__name__, outcome=outcome)
+            call_budget.finish_account(account_token)
+            tracing.finish_trace(trace, tokens, outcome=outcome, notion_calls=account.total)
+    run.__name__ = func.__name__
+    return run
+
+# Scheduled jobs as (function, interval in minutes); see scheduler.py
+SCHEDULED_JOBS = [
+    (timed_job(check_recurring_tasks_all_tenants), RECURRING_CHECK_MINUTES),
+]
+
+_services_started = False
+_services_lock = threading.Lock()
+
+def start_background_services():
+    """Configure logging, open the write queue and start its worker and the scheduler, once per process.
+
+    Importing this module starts nothing. create_app() and the first request both
+    call this, so a process that never serves doesn't pay for the threads.
+    """
+    global _services_started, write_queue
+    if _services_started:
+        return
+    with _services_lock:
+        if _services_started:
+            return
+        configure_logging()
+        if WRITE_QUEUE_ENABLED:
+            write_queue = open_write_queue()
+        # Only the process holding the scheduler lock actually runs the jobs
+        start_embedded_scheduler(SCHEDULED_JOBS)
+        if write_queue is not None:
+            write_queue.start(apply_queued_write, transient=is_unavailable_error, paused=connectivity.is_offline)
+        _services_started = True
+
+@app.before_request
+def start_services_on_first_request():
+    start_background_services()
+
+def create_app():
+    """The application, ready to serve: ``gunicorn 'app:create_app()'``.
+
+    Notion clients, templates and static assets are still loaded on first use.
+    """
+    start_background_services()
+    return app
 
 @app.route('/recurring-tasks')
 def get_recurring_tasks_route():
@@ -1204,7 +2155,7 @@ def get_recurring_tasks_route():
                 'category': category
             })
         except Exception as e:
-            print(f"Error formatting recurring task: {str(e)}")
+            logger.error("Error formatting recurring task: %s", e)
             continue
     
     return jsonify(formatted_tasks)
@@ -1244,9 +2195,10 @@ def delete_recurring(id):
             page_id=id,
             archived=True
         )
+        untrack_page(id)
         return jsonify({"success": True})
     except Exception as e:
-        print(f"Error deleting recurring task: {e}")
+        logger.error("Error deleting recurring task: %s", e)
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/later')
@@ -1254,55 +2206,33 @@ def later_tasks():
     todos = get_later_todos()
     categories = get_categories()
     now = get_utc_now()
-    
-    # Get user's local timezone
-    local_tz = pytz.timezone('Europe/Istanbul')
-    today = now.astimezone(local_tz).date()
+    buckets = day_buckets(current_timezone_name(), now)
+    store = current_context().store
     
     # Dictionary to store todos grouped by category
     grouped_todos = {}
     
     for todo in todos:
         try:
-            title = todo['properties'].get('Title', {}).get('title', [])
-            title_content = title[0]['text']['content'] if title else 'Untitled'
-            
-            description = todo['properties'].get('Description', {}).get('rich_text', [])
-            description_content = description[0]['text']['content'] if description else ''
-            
-            # Get deadline
-            deadline = todo['properties'].get('Deadline', {}).get('date', {})
-            deadline_date = None
-            if deadline and deadline.get('start'):
-                deadline_date = datetime.fromisoformat(deadline['start'].replace('Z', '+00:00')).astimezone(local_tz)
-            
-            # Get category
-            category = todo['properties'].get('Category', {}).get('select', {})
-            category_name = category.get('name', '') if category else 'Uncategorized'
-            
-            # Get completion status
-            is_completed = todo['properties'].get('Status', {}).get('checkbox', False)
+            task = stored_summary(store, todo)
+            category_name = task['category'] or 'Uncategorized'
             
             # Format the todo
             formatted_todo = {
-                'id': todo['id'],
-                'title': title_content,
-                'description': description_content,
+                'id': task['id'],
+                'title': task['title'] or 'Untitled',
+                'description': task['description'],
                 'category': category_name,
-                'completed': is_completed,
-                'deadline': deadline_date,
-                'order': todo['properties'].get('Order', {}).get('rich_text', [{}])[0].get('text', {}).get('content', '0')
+                'completed': task['completed'],
+                'deadline': buckets.local(task['deadline_ts']),
+                'order': task['order'] or '0'
             }
             
-            # Initialize the category if it doesn't exist
-            if category_name not in grouped_todos:
-                grouped_todos[category_name] = []
-            
             # Add the todo to its category
-            grouped_todos[category_name].append(formatted_todo)
+            grouped_todos.setdefault(category_name, []).append(formatted_todo)
             
         except Exception as e:
-            print(f"Error formatting todo: {e}")
+            logger.error("Error formatting todo: %s", e)
             continue
     
     # Sort categories with Uncategorized always first
@@ -1313,6 +2243,97 @@ def later_tasks():
     
     return render_template('later.html', grouped_todos=sorted_categories, categories=categories, now=now)
 
+@app.route('/http-stats')
+def http_stats_route():
+    return jsonify(http_stats.snapshot())
+
+@app.route('/write-queue')
+def write_queue_route():
+    if write_queue is None:
+        return jsonify({"enabled": False})
+    tenant = current_context().tenant.name
+    return jsonify({
+        "enabled": True,
+        "notion": connectivity.status(),
+        "pending": len(write_queue.pending(tenant)),
+        "dead": [write.to_dict() for write in write_queue.dead_letters(tenant)]
+    })
+
+@app.route('/write-queue/<int:write_id>/<string:action>', methods=['POST'])
+def write_queue_action(write_id, action):
+    if write_queue is None or action not in ('retry', 'discard'):
+        abort(404)
+    tenant = current_context().tenant.name
+    done = write_queue.retry(write_id, tenant) if action == 'retry' else write_queue.discard(write_id, tenant)
+    if not done:
+        return jsonify({"success": False, "error": f"No failed write {write_id}"}), 404
+    if action == 'discard':
+        # The store still shows the discarded change; resync it on next use
+        current_context().store.synced_at = None
+    return jsonify({"success": True})
+
+def apply_webhook_events(batch):
+    """Refresh the task store with the pages named in a debounced batch of webhook events"""
+    by_tenant = OrderedDict()
+    for (tenant, page_id), event_type in batch.items():
+        by_tenant.setdefault(tenant, {})[page_id] = event_type
+    for tenant, events in by_tenant.items():
+        with tenant_scope(tenant_pool.get(tenant)):
+            context = current_context()
+            for page_id, event_type in events.items():
+                if page_id is None:
+                    forget_categories()
+                    continue
+                if event_type in PAGE_REMOVED_EVENTS:
+                    untrack_page(page_id)
+                    continue
+                try:
+                    page = notion.pages.retrieve(page_id=page_id)
+                except APIResponseError as e:
+                    if e.code != 'object_not_found':
+                        raise
+                    untrack_page(page_id)
+                    continue
+                track_page(page)
+                if write_queue is not None:
+                    for write in write_queue.pending(tenant, page_id):
+                        apply_write_locally(context.store, write.op, write.page_id, write.properties, write.created_at)
+            logger.info("Applied %s webhook events for %s", len(events), tenant)
+
+webhook_events = Debouncer(apply_webhook_events)
+
+def same_notion_id(first, second):
+    return first.replace('-', '') == second.replace('-', '')
+
+@app.route('/notion-webhook', methods=['POST'])
+def notion_webhook():
+    body = request.get_data()
+    payload = request.get_json(silent=True) or {}
+    if 'verification_token' in payload:
+        # Sent once, unsigned, when the subscription is created
+        logger.warning("Notion webhook verification token received; set NOTION_WEBHOOK_SECRET=%s",
+                       payload['verification_token'])
+        return jsonify({"success": True})
+    if not NOTION_WEBHOOK_SECRET:
+        abort(404)
+    if not verify_signature(body, request.headers.get(SIGNATURE_HEADER), NOTION_WEBHOOK_SECRET):
+        return jsonify({"success": False, "error": "Invalid signature"}), 401
+
+    event_type, entity_id, parent_id = parse_event(payload)
+    tenant = current_context().tenant.name
+    if parent_id and not same_notion_id(parent_id, current_database_id()):
+        outcome = 'ignored'  # a page of another database shared with the integration
+    elif entity_id and (event_type in PAGE_CHANGED_EVENTS or event_type in PAGE_REMOVED_EVENTS):
+        webhook_events.add((tenant, entity_id), event_type)
+        outcome = 'queued'
+    elif event_type == 'database.schema_updated':
+        webhook_events.add((tenant, None), event_type)
+        outcome = 'queued'
+    else:
+        outcome = 'ignored'
+    metrics.notion_webhook_events.inc(type=event_type or 'unknown', outcome=outcome)
+    return jsonify({"success": True})
+
 @app.route('/toggle-later/<string:id>')
 def toggle_later_route(id):
     toggle_later(id)
@@ -1324,50 +2345,34 @@ def toggle_later_route(id):
 def toggle_later(page_id):
     try:
         # Get current later status
-        page = notion.pages.retrieve(page_id=page_id)
+        page_id = resolve_page_id(page_id)
+        page = page_for(page_id)
         current_status = page['properties'].get('IsLater', {}).get('checkbox', False)
         
         # Toggle status
         new_status = not current_status
-        
-        # Update the page
-        notion.pages.update(
-            page_id=page_id,
-            properties={
-                "IsLater": {
-                    "checkbox": new_status
-                }
+        properties = {
+            "IsLater": {
+                "checkbox": new_status
             }
-        )
+        }
         
-        # If removing from later, update the order for current day
+        # If removing from later, move it after the last task of the current list
         if not new_status:
-            todos = get_todos()
-            last_incomplete_order = None
-            for todo in todos:
-                if not todo['properties'].get('Status', {}).get('checkbox', False):
-                    order_text = todo['properties'].get('Order', {}).get('rich_text', [{}])[0].get('text', {}).get('content', '')
-                    if order_text:
-                        last_incomplete_order = order_text
-            
-            new_order = get_lexorank_between(last_incomplete_order, None, False)
-            
-            notion.pages.update(
-                page_id=page_id,
-                properties={
-                    "Order": {
-                        "rich_text": [{"text": {"content": new_order}}]
-                    }
-                }
-            )
+            new_order = get_lexorank_between(last_order(ensure_task_store(), False, False), None, False)
+            properties["Order"] = {
+                "rich_text": [{"text": {"content": new_order}}]
+            }
         
+        # Update the page
+        submit_write('update', page_id, properties)
         return True
     except Exception as e:
-        logger.error(f"Error toggling later status: {e}")
+        logger.error("Error toggling later status: %s", e)
         return False
 
 if __name__ == '__main__':
-    if not NOTION_TOKEN or not DATABASE_ID:
-        print("Error: Please set NOTION_TOKEN and NOTION_DATABASE_ID in .env file")
+    if (not NOTION_TOKEN or not DATABASE_ID) and not TENANTS_FILE:
+        print("Error: Please set NOTION_TOKEN and NOTION_DATABASE_ID in .env file (or TENANTS_FILE)")
     else:
-        app.run(debug=True) 
\ No newline at end of file
+        create_app().run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""Fingerprinted, precompressed static assets.
+
+The board's stylesheets and scripts live in ``static/``. On first use each one is
+copied to ``static/build/`` under a name carrying a hash of its content
+(``css/app.3f2a9c1e.css``), next to gzip and, when the ``brotli`` package is
+installed, brotli compressed variants. Templates link to them with
+``asset_url('css/app.css')``.
+
+``/assets/<name>`` serves the build with ``Cache-Control: immutable`` and a
+one-year max age: a changed file gets a new name, so browsers never need to
+revalidate, and repeat page loads fetch only the HTML. The smallest variant the
+client accepts is sent as is; nothing is compressed per request.
+
+Drag-and-drop comes from ``static/js/sortable.js``, so the board loads no
+third-party scripts.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import sys
+
+from flask import abort, request, send_file
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are built
+    brotli = None
+
+from compression import accepted_encodings
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+BUILD_DIR = os.path.join(STATIC_DIR, 'build')
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Served compressed variants, best first: (Accept-Encoding token, file suffix)
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json')
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _fingerprinted(name, data):
+    root, ext = os.path.splitext(name)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def _sources(static_dir, build_dir):
+    for directory, _, files in os.walk(static_dir):
+        if os.path.abspath(directory).startswith(os.path.abspath(build_dir)):
+            continue
+        for filename in files:
+            path = os.path.join(directory, filename)
+            yield os.path.relpath(path, static_dir).replace(os.sep, '/'), path
+
+
+def build(static_dir=STATIC_DIR, build_dir=BUILD_DIR):
+    """Write every static file's fingerprinted copy and compressed variants; returns the manifest."""
+    manifest = {}
+    for name, path in sorted(_sources(static_dir, build_dir)):
+        with open(path, 'rb') as f:
+            data = f.read()
+        built = manifest[name] = _fingerprinted(name, data)
+        target = os.path.join(build_dir, built)
+        if os.path.exists(target):
+            continue  # same content, already built
+        _write_atomic(target, data)
+        if name.endswith(COMPRESSIBLE):
+            _write_atomic(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _write_atomic(target + '.br', brotli.compress(data, quality=11))
+    _write_atomic(os.path.join(build_dir, 'manifest.json'), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+class Assets:
+    """The built assets, built when a URL is first needed rather than at import."""
+
+    def __init__(self, static_dir=STATIC_DIR, build_dir=BUILD_DIR):
+        self.static_dir = static_dir
+        self.build_dir = build_dir
+        self._manifest = None
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            self.build()
+        return self._manifest
+
+    def build(self):
+        self._manifest = build(self.static_dir, self.build_dir)
+
+    def url(self, name):
+        """URL of static file ``name``'s fingerprinted build."""
+        built = self.manifest.get(name)
+        if built is None:
+            raise KeyError(f'No static asset named {name!r}')
+        return f'/assets/{built}'
+
+    def send(self, filename):
+        """Response for ``/assets/<filename>``, compressed as the client prefers."""
+        path = os.path.realpath(os.path.join(self.build_dir, filename))
+        if not path.startswith(os.path.realpath(self.build_dir) + os.sep) or not os.path.isfile(path):
+            abort(404)
+
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        encoding = None
+        if filename.endswith(COMPRESSIBLE):
+            for token, suffix in ENCODINGS:
+                if token in accepted and os.path.isfile(path + suffix):
+                    encoding, path = token, path + suffix
+                    break
+
+        response = send_file(path, mimetype=_mimetype(filename), max_age=ASSET_MAX_AGE, conditional=True)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if filename.endswith(COMPRESSIBLE):
+            response.vary.add('Accept-Encoding')
+        return response
+
+
+def _mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+    if command == 'build':
+        for name, built in build().items():
+            print(f'{name} -> {built}')
+    else:
+        sys.exit('usage: python assets.py [build]')
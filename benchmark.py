@@ -0,0 +1,354 @@
+"""Benchmarks for the main request paths against a local Notion stand-in.
+
+Runs each scenario against ``fake_notion.FakeNotion`` databases of the given
+sizes and reports throughput, p50/p99 latency, Notion calls per operation and
+peak memory. Results are written as JSON so runs can be compared:
+
+    python benchmark.py --sizes 1000,10000 --latency-ms 150 --jitter-ms 50
+    python benchmark.py --compare benchmark-results/<earlier run>.json
+
+Scenarios: ``index`` (GET /), ``later`` (GET /later), ``reorder`` (POST
+/reorder), ``move`` (POST /move), ``create_todo`` (POST /add),
+``toggle_todo`` (GET /complete/<id>), ``check_recurring_tasks``,
+``group_by_day`` (the board's day grouping over every stored task, without
+Notion calls) and ``startup`` (a fresh process per run: time to import the app,
+run the first full sync and serve the first and second GET /, with cold and
+with warm template caches).
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# Must be set before app is imported
+os.environ['SCHEDULER_MODE'] = 'disabled'
+os.environ.setdefault('NOTION_TOKEN', 'fake-token')
+os.environ.setdefault('NOTION_DATABASE_ID', 'fake-database')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.pop('TENANTS_FILE', None)
+os.environ.setdefault('WRITE_QUEUE_PATH', os.path.join(tempfile.mkdtemp(), 'write-queue.sqlite3'))
+os.environ.setdefault('WRITE_QUEUE_POLL_SECONDS', '0.05')
+
+from fake_notion import FakeNotion
+
+SCENARIOS = ('index', 'later', 'reorder', 'move', 'create_todo', 'toggle_todo', 'check_recurring_tasks', 'group_by_day',
+             'startup')
+DEFAULT_SIZES = '1000,10000,50000,100000'
+RESULTS_DIR = 'benchmark-results'
+REORDER_BATCH = 10
+# Measured processes per template cache state (cold, warm) and size in the startup scenario
+STARTUP_RUNS = 5
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Bench:
+    def __init__(self, app_module, fake, rng):
+        self.app = app_module
+        self.fake = fake
+        self.rng = rng
+        self.client = app_module.app.test_client()
+        self._stored_pages = None
+
+    def _active_ids(self):
+        return self.fake.matching_ids(IsLater=False, IsRecurringTemplate=False, Status=False)
+
+    def _check(self, response):
+        if response.status_code >= 400:
+            raise RuntimeError(f'{response.status_code}: {response.get_data(as_text=True)[:200]}')
+
+    def wait_for_writes(self, timeout=300):
+        """Let the write queue deliver everything, so its Notion calls are counted."""
+        queue = getattr(self.app, 'write_queue', None)
+        deadline = time.monotonic() + timeout
+        while queue is not None:
+            counts = queue.counts()
+            if not counts.get('pending', 0) + counts.get('in_progress', 0):
+                return
+            if time.monotonic() > deadline:
+                raise RuntimeError('write queue did not drain')
+            time.sleep(0.01)
+
+    def index(self):
+        self._check(self.client.get('/'))
+
+    def later(self):
+        self._check(self.client.get('/later'))
+
+    def reorder(self):
+        ids = self._active_ids()
+        batch = self.rng.sample(ids, min(REORDER_BATCH, len(ids)))
+        self._check(self.client.post('/reorder', json={'todos': batch}))
+
+    def move(self):
+        todo_id = self.rng.choice(self._active_ids())
+        category = self.rng.choice(self.fake.categories)['name']
+        self._check(self.client.post('/move', json={'todoId': todo_id, 'newCategory': category, 'newSection': 'today'}))
+
+    def create_todo(self):
+        self._check(self.client.post('/add', data={'title': f'Benchmark task {self.rng.random():.6f}'}))
+
+    def toggle_todo(self):
+        self._check(self.client.get(f'/complete/{self.rng.choice(self._active_ids())}'))
+
+    def check_recurring_tasks(self):
+        self.app.check_recurring_tasks()
+
+    def group_by_day(self):
+        from local_time import day_buckets
+        from tenants import tenant_scope
+
+        with tenant_scope(self.app.tenant_pool.get()):
+            if self._stored_pages is None:
+                self._stored_pages = list(self.app.ensure_task_store().iter_pages())
+            buckets = day_buckets(self.app.current_timezone_name(), self.app.get_utc_now())
+            self.app.group_by_day(self._stored_pages, buckets)
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_scenario(bench, name, iterations, warmup, trace_memory):
+    operation = getattr(bench, name)
+    for _ in range(warmup):
+        operation()
+    bench.wait_for_writes()
+
+    gc.collect()
+    bench.fake.reset_calls()
+    if trace_memory:
+        tracemalloc.start()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - started
+    bench.wait_for_writes()
+    traced_peak = None
+    if trace_memory:
+        traced_peak = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        tracemalloc.stop()
+
+    calls = dict(bench.fake.calls)
+    return {
+        'iterations': iterations,
+        'throughput_per_s': round(iterations / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'notion_calls_per_op': round(sum(calls.values()) / iterations, 2),
+        'notion_calls': calls,
+        'rate_limited': bench.fake.rate_limited,
+        'peak_rss_mb': peak_rss_mb(),
+        'traced_peak_mb': traced_peak,
+    }
+
+
+def boot_probe(size, seed):
+    """Run in a fresh process by ``run_startup``: time the import, the first sync and the first requests."""
+    from tenants import DEFAULT_TENANT, Tenant, TenantPool, tenant_scope
+
+    fake = FakeNotion(seed=seed).seed(size)
+    started = time.perf_counter()
+    import app as app_module
+    imported = time.perf_counter()
+    app_module.create_app()
+    created = time.perf_counter()
+    app_module.tenant_pool = TenantPool(
+        {DEFAULT_TENANT: Tenant(DEFAULT_TENANT, 'fake-token', fake.database_id)},
+        client_factory=lambda token: fake.client(token, config=app_module.http_config)
+    )
+    # The first full sync is timed on its own, so the requests measure templates and rendering
+    with tenant_scope(app_module.tenant_pool.get()):
+        app_module.ensure_task_store()
+    synced = time.perf_counter()
+    client = app_module.app.test_client()
+    timings = {'import_ms': imported - started, 'create_app_ms': created - imported, 'sync_ms': synced - created}
+    for key in ('first_request_ms', 'second_request_ms'):
+        begin = time.perf_counter()
+        response = client.get('/')
+        timings[key] = time.perf_counter() - begin
+        if response.status_code != 200:
+            raise RuntimeError(f'GET / returned {response.status_code}')
+    print(json.dumps({key: round(value * 1000, 2) for key, value in timings.items()}))
+
+
+def _boot(size, seed, template_cache_dir):
+    env = dict(os.environ, TEMPLATE_CACHE_DIR=template_cache_dir)
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--boot-probe', str(size), '--seed', str(seed)],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _p50(probes, key):
+    return round(percentile([probe[key] for probe in probes], 0.5), 2)
+
+
+def run_startup(size, runs, seed):
+    """Boot ``runs`` fresh processes with an empty template cache and ``runs`` with a filled one."""
+    cold = [_boot(size, seed, tempfile.mkdtemp(prefix='template-cache-')) for _ in range(runs)]
+    shared_cache = tempfile.mkdtemp(prefix='template-cache-')
+    _boot(size, seed, shared_cache)  # fills the cache; not measured
+    warm = [_boot(size, seed, shared_cache) for _ in range(runs)]
+    probes = cold + warm
+    boot = [probe['import_ms'] + probe['create_app_ms'] for probe in probes]
+    return {
+        'iterations': len(probes),
+        'throughput_per_s': None,
+        'p50_ms': round(percentile(boot, 0.5), 2),
+        'p99_ms': round(percentile(boot, 0.99), 2),
+        'mean_ms': round(statistics.fmean(boot), 2),
+        'import_p50_ms': _p50(probes, 'import_ms'),
+        'sync_p50_ms': _p50(probes, 'sync_ms'),
+        'cold_first_request_p50_ms': _p50(cold, 'first_request_ms'),
+        'first_request_p50_ms': _p50(warm, 'first_request_ms'),
+        'second_request_p50_ms': _p50(probes, 'second_request_ms'),
+        'notion_calls_per_op': None,
+        'peak_rss_mb': None,
+    }
+
+
+def run(args):
+    import app as app_module
+    from tenants import DEFAULT_TENANT, Tenant, TenantPool
+
+    app_module.create_app()
+
+    results = []
+    for size in args.sizes:
+        fake = FakeNotion(
+            latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+            rate_limit=args.rate_limit or None, seed=args.seed
+        ).seed(size)
+        # A fresh pool per size, so caches and the task store start cold
+        app_module.tenant_pool = TenantPool(
+            {DEFAULT_TENANT: Tenant(DEFAULT_TENANT, 'fake-token', fake.database_id)},
+            client_factory=lambda token, fake=fake: fake.client(token, config=app_module.http_config)
+        )
+        bench = Bench(app_module, fake, random.Random(args.seed))
+        for name in args.scenarios:
+            if name == 'startup':
+                result = run_startup(size, STARTUP_RUNS, args.seed)
+                result.update(scenario=name, size=size)
+                results.append(result)
+                print(f"{name:<24} {size:>7}  boot p50 {result['p50_ms']:>7} ms  sync {result['sync_p50_ms']} ms  "
+                      f"first request {result['cold_first_request_p50_ms']} ms cold, "
+                      f"{result['first_request_p50_ms']} ms warm  second {result['second_request_p50_ms']} ms",
+                      flush=True)
+                continue
+            iterations = max(1, args.iterations if size <= 10000 else args.iterations // 5)
+            result = run_scenario(bench, name, iterations, args.warmup, args.trace_memory)
+            result.update(scenario=name, size=size)
+            results.append(result)
+            print(f"{name:<24} {size:>7}  {result['throughput_per_s']:>9} op/s  "
+                  f"p50 {result['p50_ms']:>9} ms  p99 {result['p99_ms']:>9} ms  "
+                  f"calls/op {result['notion_calls_per_op']:>7}  rss {result['peak_rss_mb']} MB", flush=True)
+    return results
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(item['scenario'], item['size']): item for item in json.load(f)['results']}
+    print(f'\nCompared with {baseline_path}:')
+    for item in current:
+        before = baseline.get((item['scenario'], item['size']))
+        if before is None:
+            continue
+        deltas = []
+        for key in ('p50_ms', 'p99_ms', 'notion_calls_per_op'):
+            if before.get(key):
+                deltas.append(f'{key} {(item[key] - before[key]) / before[key] * 100:+.1f}%')
+        print(f"{item['scenario']:<24} {item['size']:>7}  " + '  '.join(deltas))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        type=lambda value: [int(size) for size in value.split(',')],
+                        help=f'database sizes to test (default {DEFAULT_SIZES})')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        type=lambda value: [name for name in value.split(',') if name],
+                        help='comma-separated scenarios to run (default: all)')
+    parser.add_argument('--iterations', type=int, default=20,
+                        help='measured runs per scenario; a fifth of that above 10k pages (default 20)')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured runs per scenario (default 2)')
+    parser.add_argument('--latency-ms', type=float, default=0, help='added latency per Notion call')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='random extra latency per Notion call')
+    parser.add_argument('--rate-limit', type=float, default=0,
+                        help='Notion requests per second before 429s (0 = unlimited; Notion allows about 3)')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the synthetic data and scenario inputs')
+    parser.add_argument('--trace-memory', action='store_true', help='record tracemalloc peaks (slower)')
+    parser.add_argument('--output', help=f'results file (default {RESULTS_DIR}/<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--boot-probe', type=int, help=argparse.SUPPRESS)  # see run_startup
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.boot_probe is not None:
+        boot_probe(args.boot_probe, args.seed)
+        return 0
+    results = run(args)
+
+    started = datetime.now(timezone.utc)
+    output = args.output or os.path.join(RESULTS_DIR, started.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'timestamp': started.isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+            'results': results,
+        }, f, indent=2)
+    print(f'\nResults written to {output}')
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
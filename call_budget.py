@@ -0,0 +1,120 @@
+"""Per-request accounting of Notion API calls, with optional budgets.
+
+Each request gets a ``CallAccount`` that counts the Notion calls made on its
+behalf (by operation) and the bytes sent and received. Budgets cap the number
+of calls per Flask endpoint:
+
+- ``NOTION_CALL_BUDGETS``: per-endpoint limits, e.g. ``index=12,add=3,reorder=25``
+- ``NOTION_CALL_BUDGET_DEFAULT``: limit for endpoints not listed (default ``0``, no limit)
+- ``NOTION_CALL_BUDGET_MODE``: ``log`` (default) warns once per request that goes
+  over budget; ``raise`` fails the call that exceeds it with ``CallBudgetExceeded``,
+  which is what tests and benchmarks want; ``off`` only counts
+"""
+import logging
+import os
+from collections import Counter
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+BUDGET_MODE = os.getenv('NOTION_CALL_BUDGET_MODE', 'log')  # 'off', 'log' or 'raise'
+DEFAULT_BUDGET = int(os.getenv('NOTION_CALL_BUDGET_DEFAULT', '0'))
+
+
+def _parse_budgets(value):
+    budgets = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            endpoint, _, limit = item.partition('=')
+            budgets[endpoint.strip()] = int(limit)
+    return budgets
+
+
+BUDGETS = _parse_budgets(os.getenv('NOTION_CALL_BUDGETS'))
+
+_current_account = ContextVar('notion_call_account', default=None)
+
+
+class CallBudgetExceeded(RuntimeError):
+    def __init__(self, account, operation):
+        super().__init__(
+            f"{account.route} exceeded its budget of {account.budget} Notion calls "
+            f"(next call: {operation}; so far: {dict(account.calls)})"
+        )
+        self.account = account
+
+
+class CallAccount:
+    def __init__(self, route, budget=None):
+        self.route = route
+        self.budget = budget
+        self.calls = Counter()
+        self.total = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.refused = 0
+        self.warned = False
+
+    def add(self, call, error=None):
+        self.calls[call.operation] += 1
+        self.total += 1
+        self.bytes_sent += call.bytes_sent
+        self.bytes_received += call.bytes_received
+        if error is not None:
+            self.errors += 1
+
+    @property
+    def over_budget(self):
+        return bool(self.budget) and self.total > self.budget
+
+    def to_dict(self):
+        return {
+            'route': self.route,
+            'calls': self.total,
+            'by_operation': dict(self.calls),
+            'errors': self.errors,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'budget': self.budget,
+            'refused': self.refused,
+        }
+
+
+def budget_for(route):
+    return BUDGETS.get(route, DEFAULT_BUDGET) or None
+
+
+def start_account(route):
+    """Start accounting for the current context; returns ``(account, token)``."""
+    account = CallAccount(route, budget_for(route) if BUDGET_MODE != 'off' else None)
+    return account, _current_account.set(account)
+
+
+def finish_account(token):
+    _current_account.reset(token)
+
+
+def current_account():
+    return _current_account.get()
+
+
+def record_call(call, duration, error):
+    """``notion_http`` call observer: charge the call to the current request."""
+    account = _current_account.get()
+    if account is None:
+        return
+    account.add(call, error)
+    if BUDGET_MODE == 'log' and account.over_budget and not account.warned:
+        account.warned = True
+        logger.warning("%s went over its budget of %s Notion calls: %s",
+                       account.route, account.budget, dict(account.calls))
+
+
+def enforce_budget(call, proceed):
+    """``notion_http`` call middleware: refuse calls past the budget in ``raise`` mode."""
+    account = _current_account.get()
+    if BUDGET_MODE == 'raise' and account is not None and account.budget and account.total >= account.budget:
+        account.refused += 1
+        raise CallBudgetExceeded(account, call.operation)
+    return proceed()
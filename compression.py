@@ -0,0 +1,121 @@
+"""Minified templates and compression of dynamic HTML and JSON responses.
+
+Templates are indented for reading, and on a big board that indentation is
+more than half of the page. ``StripIndentation`` removes it (and blank lines)
+from template source when Jinja loads it, so rendering costs nothing extra;
+the contents of ``<pre>`` and ``<textarea>`` are kept as written.
+
+``compress_response`` is an ``after_request`` hook that gzip- or
+brotli-compresses a response when the client accepts it. Brotli is used when
+the ``brotli`` package is installed and the client lists ``br``.
+
+The level follows the size of the body: anything under
+``COMPRESS_MIN_BYTES`` (default ``1024``) is sent as is, since the headers and
+CPU cost more than the few bytes saved; typical pages get a high level; and
+bodies over ``LARGE_RESPONSE_BYTES`` (a board with thousands of tasks) get a
+faster one, which still shrinks them about as much but keeps compression from
+adding noticeably to the response time.
+
+Streamed responses (exports, progress streams) and responses that already carry
+a ``Content-Encoding`` (static assets) are left alone. ``COMPRESSION_ENABLED=0``
+turns it off, e.g. behind a proxy that compresses already.
+"""
+import gzip
+import logging
+import os
+import re
+
+from flask import request
+from jinja2.ext import Extension
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', '1').lower() in ('1', 'true', 'yes')
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+LARGE_RESPONSE_BYTES = 256 * 1024
+COMPRESSIBLE_TYPES = {'text/html', 'application/json', 'text/plain', 'text/csv'}
+
+# (gzip level, brotli quality) for ordinary and for large bodies
+LEVELS = (6, 5)
+LARGE_LEVELS = (4, 4)
+
+
+# Elements whose whitespace is significant
+_PRESERVED = re.compile(r'(<(pre|textarea)\b.*?</\2\s*>)', re.S | re.I)
+_INDENT = re.compile(r'^[ \t]+', re.M)
+_BLANK_LINES = re.compile(r'\n{2,}')
+
+
+def strip_indentation(source):
+    parts = _PRESERVED.split(source)
+    # split() yields text, element, tag name, text, ...
+    for i in range(0, len(parts), 3):
+        parts[i] = _BLANK_LINES.sub('\n', _INDENT.sub('', parts[i]))
+    return ''.join(part for i, part in enumerate(parts) if i % 3 != 2)
+
+
+class StripIndentation(Extension):
+    """Jinja extension: minify templates as they are loaded; see ``strip_indentation``."""
+
+    def preprocess(self, source, name, filename=None):
+        return strip_indentation(source)
+
+
+def accepted_encodings(header):
+    """Encodings named in an Accept-Encoding header, leaving out any refused with ``q=0``."""
+    accepted = set()
+    for item in header.split(','):
+        token, _, params = item.partition(';')
+        token = token.strip().lower()
+        if token and params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(token)
+    return accepted
+
+
+def choose_encoding(accepted):
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    gzip_level, brotli_quality = LARGE_LEVELS if len(data) > LARGE_RESPONSE_BYTES else LEVELS
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def compress_response(response):
+    """``after_request`` hook: compress an HTML or JSON body for clients that accept it."""
+    if (not COMPRESSION_ENABLED or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_TYPES or 'Content-Encoding' in response.headers
+            or request.method == 'HEAD' or response.status_code in (204, 304)):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    encoding = choose_encoding(accepted_encodings(request.headers.get('Accept-Encoding', '')))
+    if encoding is None:
+        return response
+
+    compressed = compress(data, encoding)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if response.headers.get('ETag'):
+        # A strong validator names exact bytes, and these aren't the uncompressed ones
+        etag, weak = response.get_etag()
+        response.set_etag(f'{etag}-{encoding}', weak=weak)
+    metrics.http_response_bytes.inc(len(data), encoding=encoding, stage='original')
+    metrics.http_response_bytes.inc(len(compressed), encoding=encoding, stage='sent')
+    return response
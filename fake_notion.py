@@ -0,0 +1,524 @@
+"""An in-process stand-in for the Notion API, for benchmarks and local runs.
+
+``FakeNotion`` serves a single synthetic task database over an
+``httpx.MockTransport``, so the app's real ``NotionClient`` (middleware,
+observers, connection stats) is exercised without touching api.notion.com:
+
+    fake = FakeNotion(latency=0.15, jitter=0.05, rate_limit=3)
+    fake.seed(10000)
+    client = fake.client()
+
+It implements what the app uses: database query (filters, sorts, pagination),
+database retrieve/update, page create/retrieve/update and block children.
+Requests can be slowed down (``latency`` + up to ``jitter`` seconds) and
+throttled (``rate_limit`` requests per second, answered with 429
+``rate_limited`` like the real API). Every call is counted by operation in
+``calls``.
+
+``edit_page`` and ``delete_page`` change pages as someone editing in Notion
+would; with a ``WebhookSender`` attached as ``webhook``, each such change is
+announced to the app's ``/notion-webhook`` like a real subscription would:
+
+    fake.webhook = WebhookSender(app.test_client(), secret='test-secret')
+    fake.edit_page(page_id, Title='Renamed in Notion')
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from notion_http import create_notion_client, operation_name
+from webhooks import SIGNATURE_HEADER, sign
+
+DATABASE_ID = 'fake-database'
+PAGE_SIZE_LIMIT = 100
+
+SCHEMA = {
+    'Title': 'title',
+    'Description': 'rich_text',
+    'Status': 'checkbox',
+    'Category': 'select',
+    'Deadline': 'date',
+    'Order': 'rich_text',
+    'IsLater': 'checkbox',
+    'CompletedAt': 'date',
+    'IsRecurringTemplate': 'checkbox',
+    'RecurrencePattern': 'select',
+    'RecurrenceInterval': 'number',
+    'LastGenerated': 'date',
+    'RecurringParentId': 'rich_text',
+}
+
+CATEGORIES = ('Work', 'Home', 'Errands', 'Health', 'Reading', 'Finance', 'Travel', 'Ideas')
+WORDS = (
+    'call', 'email', 'review', 'plan', 'buy', 'fix', 'write', 'book', 'clean', 'read',
+    'report', 'budget', 'dentist', 'groceries', 'invoice', 'slides', 'garden', 'car',
+    'meeting', 'draft', 'tickets', 'laundry', 'backup', 'taxes', 'notes', 'design',
+)
+BASE_36_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+class APIError(Exception):
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+def _rank(value):
+    chars = []
+    for _ in range(10):
+        value, digit = divmod(value, 36)
+        chars.append(BASE_36_CHARS[digit])
+    return ''.join(reversed(chars))
+
+
+def _iso(moment):
+    return moment.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def _page_time(moment):
+    """created_time/last_edited_time as Notion reports them: rounded down to the minute."""
+    return _iso(moment.replace(second=0, microsecond=0))
+
+
+def _plain_text(items):
+    return ''.join(item.get('plain_text') or item.get('text', {}).get('content', '') for item in items or [])
+
+
+def _rich_text(content):
+    if not content:
+        return []
+    return [{
+        'type': 'text',
+        'text': {'content': content, 'link': None},
+        'annotations': {'bold': False, 'italic': False, 'strikethrough': False,
+                        'underline': False, 'code': False, 'color': 'default'},
+        'plain_text': content,
+        'href': None,
+    }]
+
+
+class FakeNotion:
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit=None, burst=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.burst = burst or max(1, int(rate_limit or 1))
+        self.database_id = DATABASE_ID
+        self.calls = Counter()
+        self.rate_limited = 0
+        self.categories = [{'id': uuid.uuid4().hex[:8], 'name': name, 'color': 'default'} for name in CATEGORIES]
+
+        # Pages are kept as plain values per property and rendered on the way out,
+        # which keeps 100k-page databases affordable
+        self._pages = {}
+        self._order = []  # page ids in creation order
+        self._version = 0
+        self._query_cache = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self.webhook = None  # a WebhookSender told about edit_page/delete_page changes
+
+    # -- setup -----------------------------------------------------------------
+
+    def seed(self, count, later_ratio=0.08, completed_ratio=0.2, template_ratio=0.01, now=None):
+        """Fill the database with ``count`` synthetic tasks."""
+        now = now or datetime.now(timezone.utc)
+        rng = self._random
+        step = 36 ** 10 // (count + 2)
+        for i in range(count):
+            roll = rng.random()
+            is_template = roll < template_ratio
+            is_later = not is_template and roll < template_ratio + later_ratio
+            completed = not is_template and not is_later and rng.random() < completed_ratio
+            created = now - timedelta(days=rng.uniform(0, 365))
+            values = {
+                'Title': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).capitalize(),
+                'Description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 12))),
+                'Status': completed,
+                'Category': rng.choice(CATEGORIES) if rng.random() < 0.9 else None,
+                'Deadline': _iso(now + timedelta(days=rng.uniform(-30, 60))) if rng.random() < 0.6 else None,
+                'Order': ('Z' + _rank(step * (i + 1))[1:]) if completed else _rank(step * (i + 1) // 2),
+                'IsLater': is_later,
+                'CompletedAt': _iso(created + timedelta(days=rng.uniform(0, 30))) if completed else None,
+                'IsRecurringTemplate': is_template,
+                'RecurrencePattern': rng.choice(('daily', 'weekly', 'monthly')) if is_template else None,
+                'RecurrenceInterval': 1 if is_template else None,
+                'LastGenerated': _iso(now - timedelta(days=rng.uniform(0, 40))) if is_template else None,
+                'RecurringParentId': '',
+            }
+            self._insert(values, created)
+        return self
+
+    def transport(self):
+        return httpx.MockTransport(self.handle)
+
+    def client(self, token='fake-token', **kwargs):
+        return create_notion_client(token, transport=self.transport(), **kwargs)
+
+    def page_ids(self, include_archived=False):
+        with self._lock:
+            return [page_id for page_id in self._order
+                    if include_archived or not self._pages[page_id]['archived']]
+
+    def matching_ids(self, **values):
+        """Ids of live pages whose properties equal ``values``, e.g. ``IsLater=False``."""
+        with self._lock:
+            return [
+                page_id for page_id in self._order
+                if not self._pages[page_id]['archived']
+                and all(self._pages[page_id]['values'].get(name) == value for name, value in values.items())
+            ]
+
+    def edit_page(self, page_id, **values):
+        """Change a page's property values as an edit made in Notion would."""
+        with self._lock:
+            page = self._get_page(page_id)
+            page['values'].update(values)
+            page['last_edited_time'] = _page_time(datetime.now(timezone.utc))
+            self._version += 1
+        if self.webhook is not None:
+            self.webhook.send('page.properties_updated', page_id, self.database_id, updated_properties=list(values))
+
+    def delete_page(self, page_id):
+        with self._lock:
+            page = self._get_page(page_id)
+            page['archived'] = True
+            page['last_edited_time'] = _page_time(datetime.now(timezone.utc))
+            self._version += 1
+        if self.webhook is not None:
+            self.webhook.send('page.deleted', page_id, self.database_id)
+
+    def reset_calls(self):
+        self.calls.clear()
+        self.rate_limited = 0
+
+    # -- transport ---------------------------------------------------------------
+
+    def handle(self, request):
+        path = request.url.path
+        if path.startswith('/v1/'):
+            path = path[len('/v1/'):]
+        operation = operation_name(request.method, path)
+        self.calls[operation] += 1
+
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self._random.uniform(0, self.jitter))
+        if not self._take_token():
+            self.rate_limited += 1
+            return self._error(429, 'rate_limited', 'You have been rate limited. Please try again in a few minutes.',
+                               headers={'Retry-After': '1'})
+
+        try:
+            body = json.loads(request.content) if request.content else {}
+            return httpx.Response(200, json=self._dispatch(request.method, path, request.url.params, body))
+        except APIError as e:
+            return self._error(e.status, e.code, str(e))
+
+    def _take_token(self):
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @staticmethod
+    def _error(status, code, message, headers=None):
+        return httpx.Response(status, headers=headers,
+                              json={'object': 'error', 'status': status, 'code': code, 'message': message})
+
+    def _dispatch(self, method, path, params, body):
+        segments = path.strip('/').split('/')
+        resource = segments[0]
+        if resource == 'databases' and len(segments) >= 2:
+            self._check_database(segments[1])
+            if len(segments) == 3 and segments[2] == 'query' and method == 'POST':
+                return self._query(body)
+            if len(segments) == 2 and method == 'GET':
+                return self._render_database()
+            if len(segments) == 2 and method == 'PATCH':
+                return self._update_database(body)
+        elif resource == 'pages':
+            if len(segments) == 1 and method == 'POST':
+                return self._create_page(body)
+            if len(segments) == 2 and method == 'GET':
+                return self._render_page(self._get_page(segments[1]))
+            if len(segments) == 2 and method == 'PATCH':
+                return self._update_page(segments[1], body)
+        elif resource == 'blocks' and len(segments) == 3 and segments[2] == 'children' and method == 'GET':
+            return self._block_children(segments[1], params)
+        raise APIError(400, 'invalid_request_url', f'Invalid request URL: {method} /v1/{path}')
+
+    # -- databases ---------------------------------------------------------------
+
+    def _check_database(self, database_id):
+        if database_id.replace('-', '') != self.database_id.replace('-', ''):
+            raise APIError(404, 'object_not_found', f'Could not find database with ID: {database_id}.')
+
+    def _render_database(self):
+        properties = {}
+        for name, kind in SCHEMA.items():
+            config = {}
+            if name == 'Category':
+                config = {'options': self.categories}
+            elif kind == 'select':
+                config = {'options': []}
+            properties[name] = {'id': name.lower(), 'name': name, 'type': kind, kind: config}
+        return {'object': 'database', 'id': self.database_id, 'title': _rich_text('Tasks'), 'properties': properties}
+
+    def _update_database(self, body):
+        options = body.get('properties', {}).get('Category', {}).get('select', {}).get('options')
+        if options is not None:
+            known = {option['name']: option for option in self.categories}
+            self.categories = [
+                known.get(option['name']) or {'id': uuid.uuid4().hex[:8], 'name': option['name'], 'color': 'default'}
+                for option in options
+            ]
+        return self._render_database()
+
+    def _query(self, body):
+        page_size = min(int(body.get('page_size') or PAGE_SIZE_LIMIT), PAGE_SIZE_LIMIT)
+        key = json.dumps([body.get('filter'), body.get('sorts')], sort_keys=True)
+        with self._lock:
+            cached = self._query_cache.get(key)
+            if cached is None or cached[0] != self._version:
+                # Pagination walks one result list per query, as long as nothing changes in between
+                ids = [page_id for page_id in self._order
+                       if not self._pages[page_id]['archived'] and self._matches(self._pages[page_id], body.get('filter'))]
+                for sort in reversed(body.get('sorts') or []):
+                    ids.sort(key=lambda page_id: self._sort_key(self._pages[page_id], sort),
+                             reverse=sort.get('direction') == 'descending')
+                cached = self._query_cache[key] = (self._version, ids)
+            ids = cached[1]
+            start = int(body.get('start_cursor') or 0)
+            chunk = ids[start:start + page_size]
+            pages = [self._render_page(self._pages[page_id]) for page_id in chunk]
+        has_more = start + page_size < len(ids)
+        return {
+            'object': 'list',
+            'results': pages,
+            'has_more': has_more,
+            'next_cursor': str(start + page_size) if has_more else None,
+            'type': 'page_or_database',
+        }
+
+    def _matches(self, page, condition):
+        if not condition:
+            return True
+        if 'and' in condition:
+            return all(self._matches(page, item) for item in condition['and'])
+        if 'or' in condition:
+            return any(self._matches(page, item) for item in condition['or'])
+        if 'timestamp' in condition:
+            kind = condition['timestamp']
+            return self._compare(page[kind], condition[kind])
+
+        name = condition['property']
+        kind = SCHEMA.get(name)
+        if kind is None:
+            raise APIError(400, 'validation_error', f'Could not find property with name or id: {name}')
+        value = page['values'].get(name)
+        test = condition.get(kind, {})
+        if kind == 'checkbox':
+            if 'equals' in test:
+                return bool(value) == test['equals']
+            return bool(value) != test['does_not_equal']
+        if kind == 'date':
+            return self._compare(value, test)
+        if 'is_empty' in test:
+            return not value
+        if 'is_not_empty' in test:
+            return bool(value)
+        if 'equals' in test:
+            return value == test['equals']
+        if 'does_not_equal' in test:
+            return value != test['does_not_equal']
+        if 'contains' in test:
+            return test['contains'].lower() in (value or '').lower()
+        raise APIError(400, 'validation_error', f'Unsupported filter for {name}: {test}')
+
+    @staticmethod
+    def _compare(value, test):
+        if 'is_empty' in test:
+            return not value
+        if 'is_not_empty' in test:
+            return bool(value)
+        if not value:
+            return False
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        for op, bound in test.items():
+            bound = datetime.fromisoformat(bound.replace('Z', '+00:00'))
+            if bound.tzinfo is None:
+                bound = bound.replace(tzinfo=timezone.utc)
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+            if op == 'before' and not moment < bound:
+                return False
+            if op == 'after' and not moment > bound:
+                return False
+            if op == 'on_or_before' and not moment <= bound:
+                return False
+            if op == 'on_or_after' and not moment >= bound:
+                return False
+            if op == 'equals' and moment.date() != bound.date():
+                return False
+        return True
+
+    @staticmethod
+    def _sort_key(page, sort):
+        if 'timestamp' in sort:
+            return page[sort['timestamp']]
+        value = page['values'].get(sort['property'])
+        # Empty values go last in both directions, as in Notion
+        empty = value is None or value == ''
+        if sort.get('direction') == 'descending':
+            return (not empty, value if not empty else 0)
+        return (empty, value if not empty else 0)
+
+    # -- pages -------------------------------------------------------------------
+
+    def _insert(self, values, created=None):
+        created = _page_time(created or datetime.now(timezone.utc))
+        page = {
+            'id': str(uuid.UUID(int=self._random.getrandbits(128), version=4)),
+            'created_time': created,
+            'last_edited_time': created,
+            'archived': False,
+            'values': values,
+        }
+        with self._lock:
+            self._pages[page['id']] = page
+            self._order.append(page['id'])
+            self._version += 1
+        return page
+
+    def _get_page(self, page_id):
+        page = self._pages.get(page_id)
+        if page is None:
+            raise APIError(404, 'object_not_found', f'Could not find page with ID: {page_id}.')
+        return page
+
+    def _parse_properties(self, properties):
+        values = {}
+        for name, prop in properties.items():
+            kind = SCHEMA.get(name)
+            if kind is None:
+                raise APIError(400, 'validation_error', f'{name} is not a property that exists.')
+            raw = prop.get(kind)
+            if kind in ('title', 'rich_text'):
+                values[name] = _plain_text(raw)
+            elif kind == 'select':
+                values[name] = raw.get('name') if raw else None
+                if values[name] and values[name] not in {option['name'] for option in self.categories}:
+                    self.categories.append({'id': uuid.uuid4().hex[:8], 'name': values[name], 'color': 'default'})
+            elif kind == 'date':
+                values[name] = raw.get('start') if raw else None
+            else:
+                values[name] = raw
+        return values
+
+    def _create_page(self, body):
+        parent = body.get('parent', {}).get('database_id', '')
+        self._check_database(parent)
+        values = dict.fromkeys(SCHEMA)
+        values.update({'Title': '', 'Description': '', 'Order': '', 'RecurringParentId': '',
+                       'Status': False, 'IsLater': False, 'IsRecurringTemplate': False})
+        values.update(self._parse_properties(body.get('properties', {})))
+        return self._render_page(self._insert(values))
+
+    def _update_page(self, page_id, body):
+        values = self._parse_properties(body.get('properties', {}))
+        with self._lock:
+            page = self._get_page(page_id)
+            page['values'].update(values)
+            if 'archived' in body:
+                page['archived'] = bool(body['archived'])
+            if 'in_trash' in body:
+                page['archived'] = bool(body['in_trash'])
+            page['last_edited_time'] = _page_time(datetime.now(timezone.utc))
+            self._version += 1
+            return self._render_page(page)
+
+    def _render_page(self, page):
+        properties = {}
+        for name, kind in SCHEMA.items():
+            value = page['values'].get(name)
+            if kind in ('title', 'rich_text'):
+                rendered = _rich_text(value)
+            elif kind == 'select':
+                rendered = {'id': name.lower(), 'name': value, 'color': 'default'} if value else None
+            elif kind == 'date':
+                rendered = {'start': value, 'end': None, 'time_zone': None} if value else None
+            else:
+                rendered = value if value is not None else (False if kind == 'checkbox' else None)
+            properties[name] = {'id': name.lower(), 'type': kind, kind: rendered}
+        return {
+            'object': 'page',
+            'id': page['id'],
+            'created_time': page['created_time'],
+            'last_edited_time': page['last_edited_time'],
+            'archived': page['archived'],
+            'in_trash': page['archived'],
+            'parent': {'type': 'database_id', 'database_id': self.database_id},
+            'url': f"https://www.notion.so/{page['id'].replace('-', '')}",
+            'properties': properties,
+        }
+
+    def _block_children(self, page_id, params):
+        with self._lock:
+            page = self._get_page(page_id)
+        description = page['values'].get('Description') or ''
+        blocks = [
+            {'object': 'block', 'id': f'{page_id}-{index}', 'type': 'paragraph', 'has_children': False,
+             'paragraph': {'rich_text': _rich_text(sentence)}}
+            for index, sentence in enumerate(filter(None, re.split(r'(?<=\.)\s+', description)))
+        ]
+        page_size = int(params.get('page_size') or PAGE_SIZE_LIMIT)
+        return {'object': 'list', 'results': blocks[:page_size], 'has_more': len(blocks) > page_size,
+                'next_cursor': None, 'type': 'block'}
+
+
+class WebhookSender:
+    """Sends signed Notion-style webhook events to the app.
+
+    ``target`` is a Flask test client or the base URL of a running app.
+    """
+
+    def __init__(self, target, secret, path='/notion-webhook', headers=None):
+        self.target = target
+        self.secret = secret
+        self.path = path
+        self.headers = headers or {}
+        self.sent = 0
+
+    def event(self, event_type, page_id, database_id=DATABASE_ID, **data):
+        return {
+            'id': str(uuid.uuid4()),
+            'timestamp': _iso(datetime.now(timezone.utc)),
+            'type': event_type,
+            'entity': {'id': page_id, 'type': 'page'},
+            'data': {'parent': {'id': database_id, 'type': 'database'}, **data},
+        }
+
+    def send(self, event_type, page_id, database_id=DATABASE_ID, **data):
+        """Send one event; returns the response status code."""
+        body = json.dumps(self.event(event_type, page_id, database_id, **data)).encode()
+        headers = {'Content-Type': 'application/json', SIGNATURE_HEADER: sign(body, self.secret), **self.headers}
+        self.sent += 1
+        if isinstance(self.target, str):
+            return httpx.post(self.target.rstrip('/') + self.path, content=body, headers=headers).status_code
+        return self.target.post(self.path, data=body, headers=headers).status_code
@@ -0,0 +1,81 @@
+"""The user's timezone, and grouping tasks into local days without parsing dates.
+
+Task dates are parsed once, when a page enters the task store, into epoch seconds
+(``deadline_ts``, ``completed_ts`` and ``created_ts`` in its summaries).
+``DayBuckets`` holds the local midnights around today for one timezone, so
+placing a task on a local day is a bisect over those numbers rather than a
+datetime conversion. Buckets are built once per timezone and day.
+
+Dates are shown in the first of these that names a valid IANA zone:
+
+- the ``timezone`` cookie, which the board sets from the browser's own timezone
+- the tenant's ``"timezone"`` in ``TENANTS_FILE``
+- ``DEFAULT_TIMEZONE`` (default ``Europe/Istanbul``)
+"""
+import bisect
+import logging
+import os
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEZONE = os.getenv('DEFAULT_TIMEZONE', 'Europe/Istanbul')
+TIMEZONE_COOKIE = 'timezone'
+# Days on either side of today covered by DayBuckets; dates further out are converted directly
+BUCKET_DAYS = 400
+
+
+@lru_cache(maxsize=256)
+def get_timezone(name):
+    """The ``ZoneInfo`` for an IANA name, or None if there is no such zone."""
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def localize(naive, tz):
+    """Attach ``tz`` to a naive local datetime."""
+    return naive.replace(tzinfo=tz)
+
+
+class DayBuckets:
+    """Local-midnight boundaries around ``today`` in ``tz``, as epoch seconds."""
+
+    def __init__(self, tz, today, days=BUCKET_DAYS):
+        self.tz = tz
+        self.today = today
+        self.days = days
+        first = today - timedelta(days=days)
+        self._midnights = [
+            datetime.combine(first + timedelta(days=offset), time.min, tz).timestamp()
+            for offset in range(2 * days + 2)
+        ]
+
+    def offset(self, timestamp):
+        """Days from today to the local day of ``timestamp`` (0 for today, -1 for yesterday)."""
+        index = bisect.bisect_right(self._midnights, timestamp) - 1
+        if 0 <= index < len(self._midnights) - 1:
+            return index - self.days
+        return (datetime.fromtimestamp(timestamp, self.tz).date() - self.today).days
+
+    def day(self, offset):
+        return self.today + timedelta(days=offset)
+
+    def local(self, timestamp):
+        """``timestamp`` as an aware local datetime, for display."""
+        return datetime.fromtimestamp(timestamp, self.tz) if timestamp is not None else None
+
+
+@lru_cache(maxsize=32)
+def _buckets(name, today):
+    return DayBuckets(get_timezone(name), today)
+
+
+def day_buckets(name, now):
+    """The (cached) ``DayBuckets`` for timezone ``name`` on the local day of ``now``."""
+    return _buckets(name, now.astimezone(get_timezone(name)).date())
@@ -0,0 +1,97 @@
+"""Logging setup for the app and its background jobs.
+
+- ``LOG_LEVEL``: root level (default ``INFO``)
+- ``LOG_LEVELS``: per-logger overrides, e.g. ``app=DEBUG,notion_client=WARNING``
+- ``LOG_ASYNC``: ``1`` (default) hands records to a queue drained by a background
+  thread, so request threads never block on stream I/O
+- ``LOG_SAMPLE_RATES``: keep only 1 in N records of a high-frequency event,
+  e.g. ``lexorank=100``. Events are tagged at the call site with
+  ``extra={'sample': 'lexorank'}``; untagged records are never sampled.
+
+Call sites use lazy ``%``-style arguments, so disabled levels cost a level check
+and nothing else.
+"""
+import atexit
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+NOISY_LOGGERS = {
+    'apscheduler': logging.WARNING,
+    'httpx': logging.WARNING,
+    'httpcore': logging.WARNING,
+    'notion_client': logging.WARNING,
+    'tzlocal': logging.WARNING,
+}
+
+_listener = None
+
+
+def _parse_mapping(value):
+    mapping = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            key, _, setting = item.partition('=')
+            mapping[key.strip()] = setting.strip()
+    return mapping
+
+
+class SamplingFilter(logging.Filter):
+    """Let through 1 in ``rate`` records for each tagged event."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, 'sample', None)
+        rate = self.rates.get(key) if key else None
+        if not rate or rate <= 1:
+            return True
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = itertools.count()
+            return next(counter) % rate == 0
+
+
+def configure_logging():
+    """Configure root logging once; safe to call again (later calls are no-ops)."""
+    global _listener
+    root = logging.getLogger()
+    if getattr(root, '_todo_app_configured', False):
+        return
+    root._todo_app_configured = True
+
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    for name, level in NOISY_LOGGERS.items():
+        logging.getLogger(name).setLevel(level)
+    for name, level in _parse_mapping(os.getenv('LOG_LEVELS')).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    rates = {key: int(rate) for key, rate in _parse_mapping(os.getenv('LOG_SAMPLE_RATES')).items()}
+    sampling = SamplingFilter(rates)
+
+    if os.getenv('LOG_ASYNC', '1').lower() in ('1', 'true', 'yes'):
+        records = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(records)
+        _listener = logging.handlers.QueueListener(records, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+    else:
+        handler = stream_handler
+
+    # Sample before the record is queued, so dropped records cost nothing downstream
+    handler.addFilter(sampling)
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
@@ -0,0 +1,178 @@
+"""Minimal Prometheus-style metrics.
+
+Counters and histograms are kept in process memory and rendered in the
+Prometheus text exposition format by ``render()``. Values that already live
+elsewhere (cache statistics, connection pool counters) are exported through
+collectors: callables registered with ``register_collector`` that return
+``(name, type, help, [(labels, value), ...])`` tuples at scrape time.
+"""
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_metrics = []
+_collectors = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple((name, labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_items(items))
+        return lines
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_items(self, items):
+        if not items and not self.labelnames:
+            return [f'{self.name} 0']
+        return [f'{self.name}{_format_labels(key)} {_format_value(value)}' for key, value in items]
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_items(self, items):
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels(key + (("le", _format_value(float(bound))),))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(key + (("le", "+Inf"),))} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+
+def register_collector(collector):
+    with _registry_lock:
+        _collectors.append(collector)
+
+
+def render():
+    with _registry_lock:
+        metrics = list(_metrics)
+        collectors = list(_collectors)
+
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    for collector in collectors:
+        for name, metric_type, help, samples in collector():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+http_request_duration = Histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests, by Flask endpoint.',
+    ('route', 'method', 'status')
+)
+http_response_bytes = Counter(
+    'http_response_bytes_total', 'Bytes of compressed responses before and after compression, by encoding.',
+    ('encoding', 'stage')
+)
+admission_wait = Histogram(
+    'admission_wait_seconds', 'Time Notion-bound requests waited for an admission slot, by class.', ('kind',),
+    buckets=(0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+admission_rejections = Counter(
+    'admission_rejections_total', 'Requests refused by admission control, by endpoint and reason.', ('route', 'reason')
+)
+notion_request_duration = Histogram(
+    'notion_request_duration_seconds', 'Latency of Notion API calls, by operation.',
+    ('operation', 'outcome')
+)
+notion_calls_per_request = Histogram(
+    'notion_calls_per_request', 'Notion API calls made while handling one request, by Flask endpoint.',
+    ('route',), buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+)
+notion_bytes = Counter(
+    'notion_bytes_total', 'Notion API request and response body bytes, by Flask endpoint.', ('route', 'direction')
+)
+notion_memo_hits = Counter(
+    'notion_memo_hits_total', 'Notion reads answered from the request memo instead of the API, by Flask endpoint.',
+    ('route',)
+)
+notion_webhook_events = Counter(
+    'notion_webhook_events_total', 'Notion webhook events received, by event type and what was done with them.',
+    ('type', 'outcome')
+)
+notion_hedged_reads = Counter(
+    'notion_hedged_reads_total', 'Slow Notion reads sent a second time, by operation and which copy answered first.',
+    ('operation', 'winner')
+)
+notion_deadline_exceeded = Counter(
+    'notion_deadline_exceeded_total', 'Notion calls not made because the request had run out of time, by operation.',
+    ('operation',)
+)
+notion_update_retries = Counter(
+    'notion_update_retries_total', 'Retries of conflicting page updates in update_notion_with_retry.'
+)
+scheduler_job_duration = Histogram(
+    'scheduler_job_duration_seconds', 'Duration of scheduled job runs.', ('job', 'outcome'),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+)
@@ -0,0 +1,321 @@
+"""HTTP transport for the Notion clients.
+
+notion-client creates a bare ``httpx.Client()`` by default: a small connection
+pool, a single overall timeout and no visibility into whether connections are
+reused. Clients built here share one tuned configuration:
+
+- ``NOTION_HTTP_MAX_CONNECTIONS``: pool size per client (default ``20``)
+- ``NOTION_HTTP_MAX_KEEPALIVE``: idle connections kept open (default ``10``)
+- ``NOTION_HTTP_KEEPALIVE_EXPIRY``: seconds an idle connection is kept (default ``60``)
+- ``NOTION_HTTP2``: ``1`` to negotiate HTTP/2 (needs the ``h2`` package)
+- ``NOTION_HTTP_CONNECT_TIMEOUT`` / ``_READ_TIMEOUT`` / ``_WRITE_TIMEOUT`` /
+  ``_POOL_TIMEOUT``: per-phase timeouts in seconds
+
+Connection reuse is tracked through httpcore's ``trace`` extension, so
+``ConnectionStats`` can tell how many requests paid for a new TCP/TLS handshake.
+
+Every API call goes through ``NotionClient.request``, which names the call
+(``databases.query``, ``pages.update``, ...) and runs it through two hook lists:
+
+- ``call_observers``: ``observer(call, duration, error)`` after each call, for
+  both the sync and async clients (metrics, tracing, accounting)
+- ``call_middleware``: ``middleware(call, proceed)`` around each sync call,
+  returning ``proceed()`` or a substitute result
+
+Observers see each call's ``bytes_sent`` and ``bytes_received`` (body sizes).
+
+A call made while ``call_deadline`` is set (a ``time.monotonic()`` value) has each
+of its timeouts cut to the time left, so no single call outlasts the request it
+is made for; see resilience.py.
+"""
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+import httpx
+from notion_client import AsyncClient, Client
+
+logger = logging.getLogger(__name__)
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+class HTTPConfig:
+    def __init__(self, max_connections=20, max_keepalive=10, keepalive_expiry=60.0, http2=False,
+                 connect_timeout=5.0, read_timeout=30.0, write_timeout=30.0, pool_timeout=10.0):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.pool_timeout = pool_timeout
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_connections=int(os.getenv('NOTION_HTTP_MAX_CONNECTIONS', '20')),
+            max_keepalive=int(os.getenv('NOTION_HTTP_MAX_KEEPALIVE', '10')),
+            keepalive_expiry=_env_float('NOTION_HTTP_KEEPALIVE_EXPIRY', '60'),
+            http2=os.getenv('NOTION_HTTP2', '0').lower() in ('1', 'true', 'yes'),
+            connect_timeout=_env_float('NOTION_HTTP_CONNECT_TIMEOUT', '5'),
+            read_timeout=_env_float('NOTION_HTTP_READ_TIMEOUT', '30'),
+            write_timeout=_env_float('NOTION_HTTP_WRITE_TIMEOUT', '30'),
+            pool_timeout=_env_float('NOTION_HTTP_POOL_TIMEOUT', '10'),
+        )
+
+    def limits(self):
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeout(self):
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+    def use_http2(self):
+        if not self.http2:
+            return False
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("NOTION_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+            return False
+        return True
+
+
+class ConnectionStats:
+    """Process-wide counters of requests versus newly opened connections."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _record(self, event):
+        with self._lock:
+            if event == 'connection.connect_tcp.complete':
+                self.connections_opened += 1
+            elif event == 'connection.start_tls.complete':
+                self.tls_handshakes += 1
+            elif event.endswith('.failed'):
+                self.errors += 1
+
+    def trace(self, event, info):
+        self._record(event)
+
+    async def atrace(self, event, info):
+        self._record(event)
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def snapshot(self):
+        with self._lock:
+            reused = max(self.requests - self.connections_opened - self.errors, 0)
+            return {
+                'requests': self.requests,
+                'connections_opened': self.connections_opened,
+                'tls_handshakes': self.tls_handshakes,
+                'connections_reused': reused,
+                'reuse_ratio': round(reused / self.requests, 4) if self.requests else 0.0,
+                'errors': self.errors,
+            }
+
+
+http_stats = ConnectionStats()
+
+call_observers = []
+call_middleware = []
+
+# Monotonic time by which calls made in this context must finish, or None
+call_deadline = ContextVar('notion_call_deadline', default=None)
+
+
+def remaining_time():
+    """Seconds left before ``call_deadline``, or None if there is no deadline."""
+    deadline = call_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _cap_timeout(request):
+    remaining = remaining_time()
+    if remaining is None:
+        return
+    # Never zero: httpx treats that as "fail at once", and a call that got this far may still make it
+    remaining = max(remaining, 0.05)
+    timeout = request.extensions.get('timeout') or {}
+    request.extensions['timeout'] = {
+        phase: remaining if limit is None else min(limit, remaining)
+        for phase, limit in {**dict.fromkeys(('connect', 'read', 'write', 'pool')), **timeout}.items()
+    }
+
+_VERBS = {'GET': 'retrieve', 'PATCH': 'update', 'DELETE': 'delete', 'POST': 'create'}
+
+
+def operation_name(method, path):
+    """Name a Notion API call after the SDK method that makes it, e.g. ``databases.query``."""
+    segments = [segment for segment in path.strip('/').split('/') if segment]
+    if not segments:
+        return method.lower()
+    resource = segments[0]
+    if len(segments) >= 3:
+        sub = segments[2]
+        if sub == 'query':
+            return f'{resource}.query'
+        if sub == 'children':
+            return f'{resource}.children.{"list" if method == "GET" else "append"}'
+        return f'{resource}.{sub}.{_VERBS.get(method, method.lower())}'
+    if len(segments) == 1:
+        if resource == 'search':
+            return 'search'
+        return f'{resource}.{"list" if method == "GET" else _VERBS.get(method, method.lower())}'
+    return f'{resource}.{_VERBS.get(method, method.lower())}'
+
+
+class NotionCall:
+    __slots__ = ('operation', 'method', 'path', 'query', 'body', 'client', 'bytes_sent', 'bytes_received')
+
+    def __init__(self, method, path, query, body, client):
+        self.operation = operation_name(method, path)
+        self.method = method
+        self.path = path
+        self.query = query
+        self.body = body
+        self.client = client
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    @property
+    def is_read(self):
+        return self.method == 'GET' or self.operation == 'databases.query'
+
+
+def _notify_observers(call, started, error):
+    duration = time.perf_counter() - started
+    for observer in call_observers:
+        try:
+            observer(call, duration, error)
+        except Exception as e:
+            logger.debug("Notion call observer failed: %s", e)
+
+
+# The call being sent in this thread/task, so response sizes can be attached to it
+_sending = ContextVar('notion_call_sending', default=None)
+
+
+def _measure(response):
+    call = _sending.get()
+    if call is not None:
+        call.bytes_sent = len(response.request.content)
+        call.bytes_received = len(response.content)
+
+
+class NotionClient(Client):
+    def request(self, path, method, query=None, body=None, auth=None):
+        call = NotionCall(method, path, query, body, self)
+
+        def send():
+            started = time.perf_counter()
+            token = _sending.set(call)
+            try:
+                result = Client.request(self, path, method, query, body, auth)
+            except Exception as e:
+                _notify_observers(call, started, e)
+                raise
+            finally:
+                _sending.reset(token)
+            _notify_observers(call, started, None)
+            return result
+
+        proceed = send
+        for middleware in reversed(call_middleware):
+            proceed = (lambda middleware, inner: lambda: middleware(call, inner))(middleware, proceed)
+        return proceed()
+
+    def _parse_response(self, response):
+        _measure(response)
+        return super()._parse_response(response)
+
+
+class AsyncNotionClient(AsyncClient):
+    async def request(self, path, method, query=None, body=None, auth=None):
+        call = NotionCall(method, path, query, body, self)
+        started = time.perf_counter()
+        token = _sending.set(call)
+        try:
+            result = await AsyncClient.request(self, path, method, query, body, auth)
+        except Exception as e:
+            _notify_observers(call, started, e)
+            raise
+        finally:
+            _sending.reset(token)
+        _notify_observers(call, started, None)
+        return result
+
+    def _parse_response(self, response):
+        _measure(response)
+        return super()._parse_response(response)
+
+
+def build_http_client(config=None, stats=http_stats, transport=None):
+    config = config or HTTPConfig.from_env()
+
+    def on_request(request):
+        request.extensions['trace'] = stats.trace
+        _cap_timeout(request)
+        stats.count_request()
+
+    return httpx.Client(
+        limits=config.limits(),
+        timeout=config.timeout(),
+        http2=config.use_http2(),
+        transport=transport,
+        event_hooks={'request': [on_request]},
+    )
+
+
+def build_async_http_client(config=None, stats=http_stats, transport=None):
+    config = config or HTTPConfig.from_env()
+
+    async def on_request(request):
+        request.extensions['trace'] = stats.atrace
+        _cap_timeout(request)
+        stats.count_request()
+
+    return httpx.AsyncClient(
+        limits=config.limits(),
+        timeout=config.timeout(),
+        http2=config.use_http2(),
+        transport=transport,
+        event_hooks={'request': [on_request]},
+    )
+
+
+def create_notion_client(token, config=None, stats=http_stats, transport=None):
+    config = config or HTTPConfig.from_env()
+    client = NotionClient(auth=token, client=build_http_client(config, stats, transport))
+    # notion-client replaces the timeout with a single overall value; restore per-phase timeouts
+    client.client.timeout = config.timeout()
+    return client
+
+
+def create_async_notion_client(token, config=None, stats=http_stats, transport=None):
+    config = config or HTTPConfig.from_env()
+    client = AsyncNotionClient(auth=token, client=build_async_http_client(config, stats, transport))
+    client.client.timeout = config.timeout()
+    return client
@@ -0,0 +1,121 @@
+"""Offline mode: keep working from local state while Notion is unavailable.
+
+``Connectivity`` watches every Notion call (it is a ``notion_http`` call
+observer) and acts as a circuit breaker. ``OFFLINE_AFTER_FAILURES`` (default
+``3``) calls in a row that fail because Notion is unreachable, timing out,
+failing on its side or rate limiting put the app offline for
+``OFFLINE_RETRY_SECONDS``. While offline, reads are served from the tenant's
+task store instead of calling Notion, and writes wait in the write queue. After
+the retry interval Notion is tried again: a success brings the app back online,
+and a single failure takes it offline for another interval.
+
+Writes that waited in the queue longer than ``RECONCILE_AFTER_SECONDS`` are
+reconciled against the page's current state in Notion before they are sent:
+
+- Field-level last writer wins. A field that was also changed in Notion after the
+  local change was made keeps Notion's value. A field Notion changed before the
+  local change is overwritten. Fields nobody else touched are always written.
+  Notion only records when a page was last edited, not each field, so that page
+  time stands in for the time of each remote field change. It is rounded down to
+  the minute, so a remote edit in the same minute as the local one wins.
+- Rank conflicts are fixed by re-ranking. If the queued ``Order`` matches another
+  task's, the task gets a new rank between its neighbours.
+"""
+import logging
+import os
+import threading
+import time
+
+import httpx
+from notion_client.errors import APIResponseError, HTTPResponseError, RequestTimeoutError
+
+from task_store import parse_timestamp, property_value
+
+logger = logging.getLogger(__name__)
+
+OFFLINE_RETRY_SECONDS = float(os.getenv('OFFLINE_RETRY_SECONDS', '30'))
+OFFLINE_AFTER_FAILURES = int(os.getenv('OFFLINE_AFTER_FAILURES', '3'))
+RECONCILE_AFTER_SECONDS = float(os.getenv('RECONCILE_AFTER_SECONDS', '10'))
+
+UNAVAILABLE_CODES = {'rate_limited', 'internal_server_error', 'service_unavailable', 'database_connection_unavailable',
+                     'gateway_timeout'}
+
+
+def is_unavailable_error(error):
+    """True for errors meaning Notion can't be used right now, as opposed to a bad request."""
+    if isinstance(error, (httpx.TransportError, RequestTimeoutError)):
+        return True
+    if isinstance(error, APIResponseError):
+        return error.code in UNAVAILABLE_CODES
+    if isinstance(error, HTTPResponseError):
+        return error.status >= 500
+    return False
+
+
+class Connectivity:
+    def __init__(self, retry_seconds=OFFLINE_RETRY_SECONDS, failure_threshold=OFFLINE_AFTER_FAILURES):
+        self.retry_seconds = retry_seconds
+        self.failure_threshold = max(1, failure_threshold)
+        self.offline_since = None
+        self.last_error = None
+        self.failures = 0  # unavailable errors in a row
+        self._offline_until = 0.0
+        self._lock = threading.Lock()
+
+    def is_offline(self):
+        return time.monotonic() < self._offline_until
+
+    def observe(self, call, duration, error):
+        """``notion_http`` call observer."""
+        if error is not None and not is_unavailable_error(error):
+            return  # Notion answered; the request itself was wrong
+        with self._lock:
+            if error is None:
+                if self.offline_since is not None:
+                    logger.info("Notion is reachable again after %.0fs", time.time() - self.offline_since)
+                self.offline_since = None
+                self.last_error = None
+                self.failures = 0
+                self._offline_until = 0.0
+                return
+            self.failures += 1
+            self.last_error = str(error)
+            # Once offline, a failed retry is enough to stay offline
+            if self.offline_since is None and self.failures < self.failure_threshold:
+                return
+            if self.offline_since is None:
+                self.offline_since = time.time()
+                logger.warning("Notion unavailable (%s), serving from local state", error)
+            self._offline_until = time.monotonic() + self.retry_seconds
+
+    def status(self):
+        return {
+            'offline': self.is_offline(),
+            'offline_since': self.offline_since,
+            'last_error': self.last_error,
+            'consecutive_failures': self.failures,
+        }
+
+
+def merge_properties(local, base, remote_page, written_at):
+    """Field-level last-writer-wins merge of a queued write into the page now in Notion.
+
+    ``local`` is the queued properties, ``base`` the same fields as they were when
+    the write was queued, ``written_at`` when it was queued (epoch seconds).
+    Returns the properties still worth writing, which may be empty.
+    """
+    remote = remote_page.get('properties', {})
+    remote_edited = parse_timestamp(remote_page.get('last_edited_time'))
+    # Notion's edit times are whole minutes; one in the local write's minute may be later
+    written_minute = written_at - written_at % 60
+    merged = {}
+    for name, value in local.items():
+        remote_value = property_value(remote.get(name))
+        changed_remotely = name in base and remote_value != property_value(base[name])
+        if changed_remotely and remote_edited is not None and remote_edited >= written_minute:
+            logger.info("Keeping Notion's newer %s on %s", name, remote_page.get('id'))
+            continue
+        if remote_value == property_value(value):
+            continue  # already there
+        merged[name] = value
+    return merged
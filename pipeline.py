@@ -0,0 +1,118 @@
+"""Concurrent, rate-limited execution of many Notion calls.
+
+Notion allows an average of about three requests per second per integration.
+``run_pipeline`` fans work out over a small thread pool while a shared token
+bucket keeps the overall request rate under ``NOTION_RATE_LIMIT`` (requests per
+second, default ``3``), and retries calls Notion rejects with ``rate_limited``.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from notion_client import APIResponseError
+
+logger = logging.getLogger(__name__)
+
+NOTION_RATE_LIMIT = float(os.getenv('NOTION_RATE_LIMIT', '3'))
+NOTION_RATE_BURST = int(os.getenv('NOTION_RATE_BURST', '5'))
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', '4'))
+PIPELINE_MAX_RETRIES = 3
+
+
+class RateLimiter:
+    """Token bucket shared by every thread of the process."""
+
+    def __init__(self, rate=NOTION_RATE_LIMIT, burst=NOTION_RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+rate_limiter = RateLimiter()
+
+
+class Progress:
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.errors = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def record(self, error=None, item=None):
+        with self._lock:
+            if error is None:
+                self.done += 1
+            else:
+                self.failed += 1
+                if len(self.errors) < 50:
+                    self.errors.append({'item': item, 'error': str(error)})
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'total': self.total,
+                'done': self.done,
+                'failed': self.failed,
+                'finished': self.finished,
+                'errors': list(self.errors),
+            }
+
+
+def _call_with_retry(func, item, limiter):
+    for attempt in range(PIPELINE_MAX_RETRIES):
+        limiter.acquire()
+        try:
+            return func(item)
+        except APIResponseError as e:
+            if e.code != 'rate_limited' or attempt == PIPELINE_MAX_RETRIES - 1:
+                raise
+            delay = 2 ** attempt
+            logger.warning("Rate limited by Notion, retrying in %ss", delay)
+            time.sleep(delay)
+
+
+def run_pipeline(func, items, progress=None, limiter=rate_limiter, workers=PIPELINE_WORKERS, wrap=None):
+    """Call ``func(item)`` for every item concurrently; return ``[(item, result, error), ...]`` in order.
+
+    ``wrap``, if given, is a context manager factory entered around each call (used to carry
+    the current tenant into worker threads).
+    """
+    items = list(items)
+    progress = progress or Progress(len(items))
+
+    def run(item):
+        try:
+            if wrap:
+                with wrap():
+                    result = _call_with_retry(func, item, limiter)
+            else:
+                result = _call_with_retry(func, item, limiter)
+            progress.record()
+            return item, result, None
+        except Exception as e:
+            logger.error("Pipeline call failed for %r: %s", item, e)
+            progress.record(e, item)
+            return item, None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(items) or 1))) as executor:
+        results = list(executor.map(run, items))
+    progress.finished = True
+    return results
@@ -0,0 +1,92 @@
+"""Lazy, cached page previews for Notion links.
+
+Fetching a preview takes two Notion calls (the page, then its first blocks), so
+previews are fetched on a small background pool and cached in the tenant's
+preview LRU (``context.previews``, separate from ``context.cache`` so previews
+never evict what the offline fallback relies on), keyed by page id and
+``last_edited_time``: an edited page gets a new key and the stale preview
+simply ages out. Concurrent requests for the same preview
+share a single in-flight fetch instead of each calling Notion.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from tenants import tenant_scope
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_WORKERS = int(os.getenv('PREVIEW_WORKERS', '4'))
+# Previews of pages whose edit time we don't know yet are only trusted briefly
+UNVERSIONED_PREVIEW_TTL = int(os.getenv('UNVERSIONED_PREVIEW_TTL', '60'))
+
+
+class PreviewFetcher:
+    def __init__(self, fetch, workers=PREVIEW_WORKERS):
+        self._fetch = fetch  # fetch(page_id) -> preview dict, run inside the tenant's scope
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='preview')
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(page_id, last_edited_time):
+        return ('preview', page_id, last_edited_time)
+
+    def get(self, context, page_id, last_edited_time=None, wait=None):
+        """Return the cached preview, or start fetching it.
+
+        Waits up to ``wait`` seconds for a fetch in progress; returns ``None`` if the
+        preview isn't ready by then.
+        """
+        key = self._cache_key(page_id, last_edited_time)
+        preview = context.previews.get(key)
+        if preview is not None:
+            return preview
+
+        future = self._submit(context, page_id, last_edited_time)
+        if not wait:
+            return None
+        try:
+            return future.result(timeout=wait)
+        except TimeoutError:
+            return None
+        except Exception:
+            return None
+
+    def prefetch(self, context, pages):
+        """Start fetching previews for ``(page_id, last_edited_time)`` pairs that aren't cached."""
+        for page_id, last_edited_time in pages:
+            if context.previews.get(self._cache_key(page_id, last_edited_time)) is None:
+                self._submit(context, page_id, last_edited_time)
+
+    def _submit(self, context, page_id, last_edited_time):
+        flight_key = (id(context), page_id, last_edited_time)
+        with self._lock:
+            future = self._in_flight.get(flight_key)
+            if future is not None:
+                return future
+            future = self._executor.submit(self._run, context, page_id, last_edited_time)
+            self._in_flight[flight_key] = future
+        # Outside the lock: a fetch that already finished runs the callback right here
+        future.add_done_callback(lambda _: self._forget(flight_key))
+        return future
+
+    def _forget(self, flight_key):
+        with self._lock:
+            self._in_flight.pop(flight_key, None)
+
+    def _run(self, context, page_id, last_edited_time):
+        with tenant_scope(context):
+            try:
+                preview = self._fetch(page_id)
+            except Exception as e:
+                logger.error("Error fetching preview for %s: %s", page_id, e)
+                raise
+
+        edited = preview.get('last_edited_time') or last_edited_time
+        if edited:
+            context.previews.set(self._cache_key(page_id, edited), preview)
+        if last_edited_time is None:
+            context.previews.set(self._cache_key(page_id, None), preview, ttl=UNVERSIONED_PREVIEW_TTL)
+        return preview
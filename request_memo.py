@@ -0,0 +1,82 @@
+"""Request-scoped memoization of Notion reads.
+
+A request often reads the same thing twice: a page it just looked up comes back
+again in a database query, or a page it just created is retrieved to copy from.
+``memoize_reads`` is a ``notion_http`` call middleware that remembers each read
+made while handling a request (in Flask's ``g``) and answers identical reads from
+memory. Reads are keyed by client, method, path, query string and body.
+
+Writes keep the memo honest. A page create or update records the returned page
+as that page's ``pages.retrieve`` result and forgets every memoized database
+query, since any of them may include the page. A database update forgets the
+database's retrieve result as well.
+
+Memoized results are shared with the caller that made the original read, so they
+must be treated as read-only, like task store pages. ``REQUEST_MEMO_ENABLED=0``
+turns memoization off.
+"""
+import json
+import logging
+import os
+
+from flask import g, has_request_context
+
+logger = logging.getLogger(__name__)
+
+REQUEST_MEMO_ENABLED = os.getenv('REQUEST_MEMO_ENABLED', '1').lower() in ('1', 'true', 'yes')
+
+
+class RequestMemo:
+    def __init__(self):
+        self.results = {}
+        self.hits = 0
+
+    def invalidate(self, predicate):
+        for key in [key for key in self.results if predicate(key)]:
+            del self.results[key]
+
+
+def _key(client, method, path, query=None, body=None):
+    return (
+        id(client), method, path.strip('/'),
+        json.dumps(query, sort_keys=True) if query else None,
+        json.dumps(body, sort_keys=True) if body else None,
+    )
+
+
+def current_memo():
+    """The current request's memo, or None outside of a request."""
+    if not REQUEST_MEMO_ENABLED or not has_request_context():
+        return None
+    memo = g.get('notion_memo')
+    if memo is None:
+        memo = g.notion_memo = RequestMemo()
+    return memo
+
+
+def memoize_reads(call, proceed):
+    """``notion_http`` call middleware: answer repeated reads within a request from memory."""
+    memo = current_memo()
+    if memo is None:
+        return proceed()
+
+    if call.is_read:
+        key = _key(call.client, call.method, call.path, call.query, call.body)
+        if key in memo.results:
+            memo.hits += 1
+            logger.debug("Memoized %s %s", call.operation, call.path)
+            return memo.results[key]
+        result = memo.results[key] = proceed()
+        return result
+
+    result = proceed()
+    client = id(call.client)
+    if call.operation in ('pages.create', 'pages.update'):
+        memo.invalidate(lambda key: key[0] == client and key[2].startswith('databases/'))
+        if isinstance(result, dict) and result.get('id'):
+            memo.results[_key(call.client, 'GET', f"pages/{result['id']}")] = result
+    elif call.operation.startswith('databases.'):
+        memo.invalidate(lambda key: key[0] == client and key[2].startswith('databases/'))
+    else:
+        memo.invalidate(lambda key: key[0] == client)  # anything else: start over
+    return result
@@ -0,0 +1,175 @@
+"""Deadlines and hedged reads for Notion calls.
+
+Notion's tail latency, not its median, decides how long the board takes to load:
+one slow page of a ``databases.query`` holds up the whole render. Two
+``notion_http`` call middlewares deal with it:
+
+- ``enforce_deadline``: each request gets ``NOTION_REQUEST_DEADLINE_SECONDS``
+  (default ``30``, ``0`` for none) for all of its Notion calls. Every call's HTTP
+  timeouts are cut to the time left, and a call started after the deadline fails
+  at once with ``DeadlineExceeded``. Either way the route falls back to the task
+  store, as it does when Notion is down.
+- ``hedge_reads``: a read that hasn't answered within the 95th percentile of
+  recent calls of its kind is sent a second time, and whichever copy answers
+  first is used. Hedges are capped at ``NOTION_HEDGE_RATIO`` of reads (default
+  ``0.05``) so a slow Notion doesn't get twice the traffic, and are never sent
+  for writes. ``NOTION_HEDGE_ENABLED=0`` turns hedging off.
+
+Consecutive failures and timeouts trip ``offline.Connectivity``, which serves
+reads from the task store until Notion recovers.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from notion_client.errors import RequestTimeoutError
+
+import metrics
+from notion_http import call_deadline, remaining_time
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DEADLINE_SECONDS = float(os.getenv('NOTION_REQUEST_DEADLINE_SECONDS', '30'))
+HEDGE_ENABLED = os.getenv('NOTION_HEDGE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+HEDGE_RATIO = float(os.getenv('NOTION_HEDGE_RATIO', '0.05'))
+HEDGE_WORKERS = int(os.getenv('NOTION_HEDGE_WORKERS', '16'))
+# Latency samples kept per operation, and how many are needed before hedging it
+HEDGE_SAMPLES = 200
+HEDGE_MIN_SAMPLES = 20
+# Never hedge sooner than this, however fast the operation usually is
+HEDGE_MIN_DELAY = 0.05
+HEDGE_BURST = 10
+
+
+class DeadlineExceeded(RequestTimeoutError):
+    def __init__(self, operation):
+        super().__init__(f"No time left in the request's deadline for {operation}")
+
+
+def start_deadline(seconds=REQUEST_DEADLINE_SECONDS):
+    """Give Notion calls in the current context ``seconds`` to finish; returns a token for ``finish_deadline``."""
+    return call_deadline.set(time.monotonic() + seconds if seconds else None)
+
+
+def finish_deadline(token):
+    call_deadline.reset(token)
+
+
+def enforce_deadline(call, proceed):
+    """``notion_http`` call middleware: fail calls made after the request's deadline."""
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        metrics.notion_deadline_exceeded.inc(operation=call.operation)
+        raise DeadlineExceeded(call.operation)
+    return proceed()
+
+
+class LatencyTracker:
+    """Recent successful call durations per operation, and their 95th percentile."""
+
+    def __init__(self, size=HEDGE_SAMPLES, min_samples=HEDGE_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._samples = defaultdict(lambda: deque(maxlen=size))
+        self._p95 = {}
+        self._lock = threading.Lock()
+
+    def observe(self, call, duration, error):
+        """``notion_http`` call observer."""
+        if error is not None or not call.is_read:
+            return
+        with self._lock:
+            samples = self._samples[call.operation]
+            samples.append(duration)
+            # Sorting a few hundred floats is cheap, but not on every call
+            if len(samples) >= self.min_samples and len(samples) % 10 == 0:
+                ordered = sorted(samples)
+                self._p95[call.operation] = ordered[int(0.95 * (len(ordered) - 1))]
+
+    def p95(self, operation):
+        return self._p95.get(operation)
+
+
+class HedgeBudget:
+    """Token bucket: each read earns ``ratio`` of a hedge, each hedge spends one."""
+
+    def __init__(self, ratio=HEDGE_RATIO, burst=HEDGE_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = float(burst)
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def spend(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+latency = LatencyTracker()
+hedge_budget = HedgeBudget()
+_executor = None
+_executor_lock = threading.Lock()
+_running = 0  # attempts on the executor, so hedging backs off instead of queueing behind itself
+
+
+def _submit(proceed):
+    global _executor, _running
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='notion-hedge')
+        if _running >= HEDGE_WORKERS:
+            return None
+        _running += 1
+    # Each attempt runs in its own copy of the caller's context (request, account, deadline)
+    future = _executor.submit(contextvars.copy_context().run, proceed)
+    future.add_done_callback(_release)
+    return future
+
+
+def _release(future):
+    global _running
+    with _executor_lock:
+        _running -= 1
+
+
+def hedge_reads(call, proceed):
+    """``notion_http`` call middleware: resend slow reads and use whichever copy answers first."""
+    if not HEDGE_ENABLED or not call.is_read:
+        return proceed()
+    hedge_budget.earn()
+    p95 = latency.p95(call.operation)
+    if p95 is None:
+        return proceed()
+    delay = max(p95, HEDGE_MIN_DELAY)
+    remaining = remaining_time()
+    if remaining is not None and remaining <= delay:
+        return proceed()  # a hedge couldn't start in time to help
+
+    first = _submit(proceed)
+    if first is None:
+        return proceed()
+    done, _ = wait([first], timeout=delay)
+    if done or not hedge_budget.spend():
+        return first.result()
+    second = _submit(proceed)
+    if second is None:
+        return first.result()
+
+    logger.debug("Hedging %s after %.0fms", call.operation, delay * 1000)
+    done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+    winner = done.pop()
+    if winner.exception() is not None:
+        # One copy failed; the other may still succeed
+        winner = second if winner is first else first
+    metrics.notion_hedged_reads.inc(operation=call.operation, winner='hedge' if winner is second else 'original')
+    # The loser can't be cancelled mid-request; it finishes in the background and is ignored
+    return winner.result()
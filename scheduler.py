@@ -0,0 +1,136 @@
+"""Background jobs for the todo app.
+
+Scheduled jobs (currently ``check_recurring_tasks``) must run in exactly one
+process, even when the web app is served by several gunicorn workers. The
+process that holds an exclusive lock on ``SCHEDULER_LOCK_FILE`` is the leader
+and runs the jobs; the others periodically retry the lock so a new leader takes
+over if the current one exits.
+
+Set ``SCHEDULER_MODE=standalone`` to keep web workers from scheduling anything
+and run the jobs in a dedicated process instead:
+
+    python -m scheduler
+"""
+import logging
+import os
+import sys
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_MODE = os.getenv('SCHEDULER_MODE', 'embedded')  # 'embedded', 'standalone' or 'disabled'
+SCHEDULER_LOCK_FILE = os.getenv(
+    'SCHEDULER_LOCK_FILE',
+    os.path.join(tempfile.gettempdir(), 'todo-app-scheduler.lock')
+)
+RECURRING_CHECK_MINUTES = int(os.getenv('RECURRING_CHECK_MINUTES', '30'))
+LEADER_RETRY_SECONDS = int(os.getenv('SCHEDULER_LEADER_RETRY_SECONDS', '60'))
+
+_lock_handle = None
+_scheduler = None
+_state_lock = threading.Lock()
+
+
+def acquire_scheduler_lock(path=SCHEDULER_LOCK_FILE):
+    """Try to become the scheduler leader. Returns True if this process holds the lock."""
+    global _lock_handle
+    if _lock_handle is not None:
+        return True
+
+    handle = open(path, 'a+')
+    try:
+        if fcntl:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        handle.close()
+        return False
+
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    _lock_handle = handle
+    logger.info("Process %s is the scheduler leader", os.getpid())
+    return True
+
+
+def is_scheduler_leader():
+    return _lock_handle is not None
+
+
+def _add_jobs(scheduler, jobs):
+    for func, minutes in jobs:
+        scheduler.add_job(func=func, trigger="interval", minutes=minutes)
+
+
+def _start_background(jobs):
+    global _scheduler
+    # Imported lazily so processes that never lead don't pay for APScheduler
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    _scheduler = BackgroundScheduler()
+    _add_jobs(_scheduler, jobs)
+    _scheduler.start()
+
+
+def _retry_leadership(jobs):
+    with _state_lock:
+        if _scheduler is not None:
+            return
+        if acquire_scheduler_lock():
+            _start_background(jobs)
+            return
+    timer = threading.Timer(LEADER_RETRY_SECONDS, _retry_leadership, args=(jobs,))
+    timer.daemon = True
+    timer.start()
+
+
+def start_embedded_scheduler(jobs):
+    """Run ``jobs`` (a list of ``(func, minutes)``) inside this web process if it wins the lock.
+
+    Does nothing unless ``SCHEDULER_MODE`` is ``embedded``.
+    """
+    if SCHEDULER_MODE != 'embedded':
+        logger.info("Embedded scheduler disabled (SCHEDULER_MODE=%s)", SCHEDULER_MODE)
+        return
+    _retry_leadership(jobs)
+
+
+def run_standalone(jobs):
+    """Run ``jobs`` in the foreground, waiting for the lock if another process holds it."""
+    from apscheduler.schedulers.blocking import BlockingScheduler
+
+    while not acquire_scheduler_lock():
+        logger.info("Another process holds %s, waiting...", SCHEDULER_LOCK_FILE)
+        threading.Event().wait(LEADER_RETRY_SECONDS)
+
+    scheduler = BlockingScheduler()
+    _add_jobs(scheduler, jobs)
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+
+
+def main():
+    # Keep the app module from starting its own embedded scheduler on import
+    os.environ['SCHEDULER_MODE'] = 'standalone'
+    import app
+
+    app.start_background_services()  # logging, and the write queue worker the jobs write through
+    run_standalone(app.SCHEDULED_JOBS)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
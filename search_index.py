@@ -0,0 +1,146 @@
+"""In-memory inverted index over task titles, descriptions and categories.
+
+The index subscribes to a ``TaskStore`` and is updated incrementally on every
+change, so it stays in step with syncs and write paths without rescanning.
+Terms are kept in a sorted list next to the postings dictionary, which makes
+prefix lookups a pair of binary searches instead of a scan over the vocabulary.
+
+All query terms must match (AND); the last term also matches as a prefix so
+results update while the user is typing. Tasks matching every term in their
+title rank first, then incomplete before completed, then by order.
+"""
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+
+from task_store import summarize_page
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_PREFIX_TERMS = 200
+
+
+def tokenize(text):
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _TOKEN_RE.findall(text)
+
+
+class _Postings:
+    """Term -> page ids, plus the sorted vocabulary for prefix lookups."""
+
+    def __init__(self):
+        self.postings = {}
+        self.terms = []
+
+    def add(self, term, page_id):
+        ids = self.postings.get(term)
+        if ids is None:
+            ids = self.postings[term] = set()
+            bisect.insort(self.terms, term)
+        ids.add(page_id)
+
+    def discard(self, term, page_id):
+        ids = self.postings.get(term)
+        if ids is None:
+            return
+        ids.discard(page_id)
+        if not ids:
+            del self.postings[term]
+            index = bisect.bisect_left(self.terms, term)
+            if index < len(self.terms) and self.terms[index] == term:
+                del self.terms[index]
+
+    def exact(self, term):
+        return self.postings.get(term, set())
+
+    def prefix(self, prefix):
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + '\uffff')
+        terms = self.terms[start:min(end, start + MAX_PREFIX_TERMS)]
+        if len(terms) == 1:
+            return self.postings[terms[0]]
+        return set().union(*(self.postings[term] for term in terms))
+
+    def match_all(self, terms):
+        """Ids containing every term, the last one as a prefix. May return an internal set."""
+        candidate_sets = [self.exact(term) for term in terms[:-1]] + [self.prefix(terms[-1])]
+        if len(candidate_sets) == 1:
+            return candidate_sets[0]
+        candidate_sets.sort(key=len)
+        return candidate_sets[0].intersection(*candidate_sets[1:])
+
+
+class SearchIndex:
+    def __init__(self, store=None):
+        self._all = _Postings()  # title, description and category terms
+        self._titles = _Postings()  # title terms only, for ranking
+        self._doc_terms = {}  # page id -> (all terms, title terms)
+        self._docs = {}  # page id -> summary returned with results
+        self._sort_keys = {}  # page id -> (completed, order)
+        self._lock = threading.RLock()
+        if store is not None:
+            self.attach(store)
+
+    def attach(self, store):
+        store.subscribe(self.on_change)
+        for page in store.iter_pages():
+            self.on_change(page['id'], page)
+
+    def on_change(self, page_id, page):
+        if page is None:
+            self.remove(page_id)
+        else:
+            self.add(page)
+
+    def add(self, page):
+        task = summarize_page(page)
+        page_id = task['id']
+        title_terms = set(tokenize(task['title']))
+        terms = title_terms | set(tokenize(task['description'])) | set(tokenize(task['category']))
+        with self._lock:
+            old_terms, old_title_terms = self._doc_terms.get(page_id, (set(), set()))
+            for term in old_terms - terms:
+                self._all.discard(term, page_id)
+            for term in terms - old_terms:
+                self._all.add(term, page_id)
+            for term in old_title_terms - title_terms:
+                self._titles.discard(term, page_id)
+            for term in title_terms - old_title_terms:
+                self._titles.add(term, page_id)
+            self._doc_terms[page_id] = (terms, title_terms)
+            self._docs[page_id] = task
+            self._sort_keys[page_id] = (task['completed'], task['order'] or '')
+
+    def remove(self, page_id):
+        with self._lock:
+            terms, title_terms = self._doc_terms.pop(page_id, ((), ()))
+            for term in terms:
+                self._all.discard(term, page_id)
+            for term in title_terms:
+                self._titles.discard(term, page_id)
+            self._docs.pop(page_id, None)
+            self._sort_keys.pop(page_id, None)
+
+    def search(self, query, limit=20):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            matches = self._all.match_all(terms)
+            if not matches:
+                return []
+            # Title matches are a subset of matches, since titles are indexed in both
+            title_matches = self._titles.match_all(terms)
+            sort_key = self._sort_keys.__getitem__
+            ranked = heapq.nsmallest(limit, title_matches, key=sort_key)
+            if len(ranked) < limit:
+                rest = matches if not title_matches else (page_id for page_id in matches if page_id not in title_matches)
+                ranked += heapq.nsmallest(limit - len(ranked), rest, key=sort_key)
+            return [self._docs[page_id] for page_id in ranked]
+
+    def __len__(self):
+        return len(self._docs)
@@ -0,0 +1,302 @@
+"""Task snapshot shared by the worker processes of one host.
+
+Without it, every gunicorn worker keeps its own task store and runs its own full
+syncs with Notion. With ``SHARED_SNAPSHOT_PATH`` set, workers share:
+
+- a SQLite database of every tenant's pages plus a few cached values such as
+  categories. Each row carries the version at which it last changed, and deleted
+  pages stay behind as tombstones for ``TOMBSTONE_SECONDS``.
+- a version counter, kept in a small memory-mapped file next to it
+  (``<path>.version``). A worker checks whether anything changed since its last
+  look with a single 8-byte read, and otherwise pulls only the rows with a newer
+  version into its task store.
+
+Changes made in one worker's task store (queued writes, webhook refreshes, pages
+read from Notion) are published to the snapshot as they happen. The store calls
+its listeners while holding its lock, so ``publish`` only queues the change; a
+background thread writes queued changes in one transaction, and ``pull``
+writes any still queued before it reads. Full syncs are
+run by one worker at a time. The worker holding ``<path>.lock`` syncs, and the
+others keep serving their current copy and pick up its result.
+"""
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+SHARED_SNAPSHOT_PATH = os.getenv('SHARED_SNAPSHOT_PATH')
+# Deleted pages are remembered this long; a worker that hasn't pulled for longer reloads everything
+TOMBSTONE_SECONDS = 24 * 3600
+# How long the publisher waits after a change for more to write in the same transaction
+FLUSH_DELAY_SECONDS = 0.02
+
+_VERSION = struct.Struct('<Q')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    tenant TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    data TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (tenant, page_id)
+);
+CREATE INDEX IF NOT EXISTS pages_by_version ON pages (tenant, version);
+CREATE TABLE IF NOT EXISTS syncs (
+    tenant TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    tenant TEXT NOT NULL,
+    key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (tenant, key)
+);
+CREATE TABLE IF NOT EXISTS counter (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counter (id, version) VALUES (1, 0);
+"""
+
+
+class SharedSnapshot:
+    def __init__(self, path=SHARED_SNAPSHOT_PATH):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        with open(path + '.version', 'a+b') as f:
+            if os.fstat(f.fileno()).st_size < _VERSION.size:
+                f.write(b'\0' * _VERSION.size)
+                f.flush()
+            self._version_map = mmap.mmap(f.fileno(), _VERSION.size)
+        self._lock_path = path + '.lock'
+
+        self._pending = {}  # tenant -> {page_id: page or None} published but not written yet
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # keeps batches in the order they were taken
+        self._flush_wanted = threading.Event()
+        self._flusher_pid = None
+
+        self._stores = {}  # tenant -> the task store kept in step with the snapshot
+        self._seen = {}  # tenant -> snapshot version last pulled into that store
+        self._pulled_at = {}
+        self._synced_at = {}
+
+    # -- version counter -----------------------------------------------------------
+
+    def version(self):
+        """The snapshot's current version: O(1), without touching SQLite."""
+        return _VERSION.unpack_from(self._version_map)[0]
+
+    def _bump(self, tenant):
+        """Take the next version inside a write transaction; returns it."""
+        current = self._db.execute('SELECT version FROM counter WHERE id = 1').fetchone()[0]
+        self._db.execute('UPDATE counter SET version = ? WHERE id = 1', (current + 1,))
+        if self._seen.get(tenant) == current:
+            # Nothing else changed since our last pull, so our store already matches
+            self._seen[tenant] = current + 1
+        return current + 1
+
+    @contextmanager
+    def _write(self):
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+                version = self._db.execute('SELECT version FROM counter WHERE id = 1').fetchone()[0]
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+            _VERSION.pack_into(self._version_map, 0, version)
+
+    # -- task stores -----------------------------------------------------------------
+
+    def attach(self, tenant, store):
+        """Keep ``store`` in step with the snapshot: publish its changes, pull others'."""
+        if self._stores.get(tenant) is store:
+            return
+        self._stores[tenant] = store
+        self._seen.pop(tenant, None)
+        self._synced_at.pop(tenant, None)
+        store.subscribe(lambda page_id, page: self.publish(tenant, page_id, page))
+
+    @contextmanager
+    def muted(self):
+        """Don't publish store changes made in this block (they're published in bulk)."""
+        self._local.muted = True
+        try:
+            yield
+        finally:
+            self._local.muted = False
+
+    def publish(self, tenant, page_id, page):
+        """Task store listener: queue one page change (``page`` None for a removal) for ``flush``."""
+        if getattr(self._local, 'muted', False):
+            return
+        with self._pending_lock:
+            self._pending.setdefault(tenant, {})[page_id] = page
+            if self._flusher_pid != os.getpid():  # not started yet, or lost in a fork
+                self._flusher_pid = os.getpid()
+                threading.Thread(target=self._run_flusher, name='snapshot-publisher', daemon=True).start()
+        self._flush_wanted.set()
+
+    def flush(self):
+        """Write the queued page changes, in one transaction; returns how many there were."""
+        with self._flush_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            now = time.time()
+            try:
+                with self._write():
+                    for tenant, changes in pending.items():
+                        version = self._bump(tenant)
+                        self._db.executemany(
+                            'INSERT OR REPLACE INTO pages (tenant, page_id, version, data, updated_at) '
+                            'VALUES (?, ?, ?, ?, ?)',
+                            ((tenant, page_id, version, json.dumps(page) if page is not None else None, now)
+                             for page_id, page in changes.items())
+                        )
+            except Exception:
+                # Put the batch back for the next flush, under any changes queued since
+                with self._pending_lock:
+                    for tenant, changes in pending.items():
+                        self._pending[tenant] = {**changes, **self._pending.get(tenant, {})}
+                raise
+            return sum(len(changes) for changes in pending.values())
+
+    def _run_flusher(self):
+        while True:
+            self._flush_wanted.wait()
+            time.sleep(FLUSH_DELAY_SECONDS)
+            self._flush_wanted.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Publishing task changes to the shared snapshot failed")
+
+    def publish_all(self, tenant, pages):
+        """Record the result of a full sync: ``pages`` is every page the tenant has."""
+        pages = list(pages)
+        now = time.time()
+        with self._write():
+            version = self._bump(tenant)
+            self._db.execute('CREATE TEMP TABLE IF NOT EXISTS synced_ids (page_id TEXT PRIMARY KEY)')
+            self._db.execute('DELETE FROM synced_ids')
+            self._db.executemany(
+                'INSERT INTO pages (tenant, page_id, version, data, updated_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (tenant, page_id) DO UPDATE SET version = excluded.version, data = excluded.data, '
+                'updated_at = excluded.updated_at WHERE data IS NOT excluded.data',
+                ((tenant, page['id'], version, json.dumps(page), now) for page in pages)
+            )
+            self._db.executemany('INSERT OR IGNORE INTO synced_ids VALUES (?)', ((page['id'],) for page in pages))
+            self._db.execute(
+                'UPDATE pages SET data = NULL, version = ?, updated_at = ? WHERE tenant = ? AND data IS NOT NULL '
+                'AND page_id NOT IN (SELECT page_id FROM synced_ids)',
+                (version, now, tenant)
+            )
+            self._db.execute(
+                'DELETE FROM pages WHERE tenant = ? AND data IS NULL AND updated_at < ?',
+                (tenant, now - TOMBSTONE_SECONDS)
+            )
+            self._db.execute('INSERT OR REPLACE INTO syncs (tenant, synced_at) VALUES (?, ?)', (tenant, now))
+        self._synced_at[tenant] = now
+
+    def pull(self, tenant, store):
+        """Bring ``store`` up to the snapshot's version; returns the number of pages applied."""
+        self.attach(tenant, store)
+        # Our own queued changes first, so older rows can't be pulled over them
+        self.flush()
+        version = self.version()
+        seen = self._seen.get(tenant)
+        if seen == version:
+            return 0
+
+        # A store that hasn't pulled for longer than tombstones are kept may have missed deletions
+        reload = seen is not None and time.time() - self._pulled_at.get(tenant, 0) > TOMBSTONE_SECONDS
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT page_id, data, version FROM pages WHERE tenant = ? AND version > ?',
+                (tenant, 0 if seen is None or reload else seen)
+            ).fetchall()
+            synced = self._db.execute('SELECT synced_at FROM syncs WHERE tenant = ?', (tenant,)).fetchone()
+
+        with self.muted():
+            if reload:
+                store.replace_all([json.loads(data) for _, data, _ in rows if data is not None])
+                store.synced_at = None
+                self._synced_at.pop(tenant, None)
+            else:
+                for page_id, data, _ in rows:
+                    if data is None:
+                        store.remove(page_id)
+                    else:
+                        store.upsert(json.loads(data))
+        self._seen[tenant] = max([version] + [row[2] for row in rows])
+        self._pulled_at[tenant] = time.time()
+        if synced is not None and synced[0] != self._synced_at.get(tenant):
+            self._synced_at[tenant] = synced[0]
+            # TaskStore ages syncs by the monotonic clock
+            store.synced_at = time.monotonic() - (time.time() - synced[0])
+        return len(rows)
+
+    @contextmanager
+    def sync_lock(self, wait=False):
+        """Yields True if this process may run a full sync now (only one at a time does)."""
+        handle = open(self._lock_path, 'a+')
+        try:
+            try:
+                if fcntl:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+                else:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK if wait else msvcrt.LK_NBLCK, 1)
+            except OSError:
+                yield False
+                return
+            yield True
+        finally:
+            handle.close()  # releases the lock
+
+    # -- cached values -----------------------------------------------------------------
+
+    def get(self, tenant, key, max_age):
+        """A value stored with ``set`` less than ``max_age`` seconds ago, else None."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT data FROM entries WHERE tenant = ? AND key = ? AND updated_at > ?',
+                (tenant, key, time.time() - max_age)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, tenant, key, value):
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries (tenant, key, data, updated_at) VALUES (?, ?, ?, ?)',
+                (tenant, key, json.dumps(value), time.time())
+            )
+
+    def discard(self, tenant, key):
+        with self._lock:
+            self._db.execute('DELETE FROM entries WHERE tenant = ? AND key = ?', (tenant, key))
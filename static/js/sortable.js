@@ -0,0 +1,230 @@
+// Drag-and-drop reordering of list items, between lists of the same group.
+//
+// Implements the part of the SortableJS API the board uses, so no third-party
+// script (or CDN) is needed:
+//
+//     new Sortable(list, {group, animation, ghostClass, chosenClass, dragClass, handle, onEnd})
+//
+// onEnd receives {item, from, to, oldIndex, newIndex} once a drag finishes.
+// Works with mouse, pen and touch (touch drags start after a short press, so
+// the page still scrolls).
+(function() {
+    'use strict';
+
+    const START_DISTANCE = 5;  // px the pointer moves before a press becomes a drag
+    const TOUCH_DELAY = 150;  // ms a finger rests on an item before it can be dragged
+    const IGNORED = 'a, button, input, select, textarea, label, [contenteditable]';
+
+    const instances = [];
+    let active = null;  // the drag in progress
+
+    function indexOf(element) {
+        return Array.prototype.indexOf.call(element.parentNode.children, element);
+    }
+
+    function rects(list) {
+        return new Map(Array.from(list.children).map(child => [child, child.getBoundingClientRect()]));
+    }
+
+    // Slide siblings from where they were to where they are now (FLIP)
+    function animate(before, duration) {
+        if (!duration) {
+            return;
+        }
+        before.forEach((rect, child) => {
+            if (!child.isConnected || child === active.item) {
+                return;
+            }
+            const now = child.getBoundingClientRect();
+            const dy = rect.top - now.top;
+            const dx = rect.left - now.left;
+            if (!dx && !dy) {
+                return;
+            }
+            child.style.transition = 'none';
+            child.style.transform = `translate(${dx}px, ${dy}px)`;
+            child.getBoundingClientRect();  // apply the offset before animating it away
+            child.style.transition = `transform ${duration}ms ease`;
+            child.style.transform = '';
+        });
+    }
+
+    // The item of instance's list that target is in (its handle, if one is set), or null
+    function itemFor(target, instance) {
+        let node = instance.options.handle ? target.closest(instance.options.handle) : target;
+        while (node && node.parentNode !== instance.el) {
+            node = instance.options.handle ? null : node.parentNode;
+        }
+        return node;
+    }
+
+    function listAt(x, y, group) {
+        const target = document.elementFromPoint(x, y);
+        for (let node = target; node; node = node.parentElement) {
+            const instance = instances.find(candidate => candidate.el === node);
+            if (instance && instance.options.group === group) {
+                return {instance, target};
+            }
+        }
+        return null;
+    }
+
+    function startDrag(event) {
+        const {instance, item} = active;
+        const options = instance.options;
+        const rect = item.getBoundingClientRect();
+
+        active.started = true;
+        active.offsetX = event.clientX - rect.left;
+        active.offsetY = event.clientY - rect.top;
+
+        const clone = item.cloneNode(true);
+        if (options.dragClass) {
+            clone.classList.add(options.dragClass);
+        }
+        Object.assign(clone.style, {
+            position: 'fixed', left: `${rect.left}px`, top: `${rect.top}px`, width: `${rect.width}px`,
+            margin: '0', pointerEvents: 'none', zIndex: '10000', opacity: '0.9',
+        });
+        document.body.appendChild(clone);
+        active.clone = clone;
+
+        if (options.ghostClass) {
+            item.classList.add(options.ghostClass);
+        }
+        document.body.style.userSelect = 'none';
+    }
+
+    function moveTo(event) {
+        const {clone, instance, item} = active;
+        clone.style.left = `${event.clientX - active.offsetX}px`;
+        clone.style.top = `${event.clientY - active.offsetY}px`;
+
+        const over = listAt(event.clientX, event.clientY, instance.options.group);
+        if (!over) {
+            return;
+        }
+        const list = over.instance.el;
+        const sibling = itemFor(over.target, over.instance);
+        if (sibling === item) {
+            return;
+        }
+
+        let reference;
+        if (sibling) {
+            const rect = sibling.getBoundingClientRect();
+            reference = event.clientY < rect.top + rect.height / 2 ? sibling : sibling.nextSibling;
+        } else if (item.parentNode !== list) {
+            reference = null;  // over an empty part of another list: append
+        } else {
+            return;
+        }
+        if (reference === item || (item.parentNode === list && item.nextSibling === reference)) {
+            return;
+        }
+
+        const before = rects(list);
+        if (item.parentNode !== list) {
+            rects(item.parentNode).forEach((rect, child) => before.set(child, rect));
+        }
+        list.insertBefore(item, reference);
+        animate(before, over.instance.options.animation);
+    }
+
+    function swallowClick(event) {
+        event.stopPropagation();
+        event.preventDefault();
+    }
+
+    function finish() {
+        const drag = active;
+        active = null;
+        clearTimeout(drag.timer);
+        const options = drag.instance.options;
+        if (options.chosenClass) {
+            drag.item.classList.remove(options.chosenClass);
+        }
+        if (!drag.started) {
+            return;
+        }
+        drag.clone.remove();
+        if (options.ghostClass) {
+            drag.item.classList.remove(options.ghostClass);
+        }
+        document.body.style.userSelect = '';
+
+        const to = instances.find(candidate => candidate.el === drag.item.parentNode);
+        if (to && to.options.onEnd) {
+            to.options.onEnd({item: drag.item, from: drag.from, to: to.el, oldIndex: drag.oldIndex, newIndex: indexOf(drag.item)});
+        }
+        // Don't let the release count as a click on the item
+        window.addEventListener('click', swallowClick, true);
+        setTimeout(() => window.removeEventListener('click', swallowClick, true), 0);
+    }
+
+    document.addEventListener('pointermove', event => {
+        if (!active || event.pointerId !== active.pointerId) {
+            return;
+        }
+        if (!active.started) {
+            const moved = Math.hypot(event.clientX - active.x, event.clientY - active.y);
+            if (moved < START_DISTANCE) {
+                return;
+            }
+            if (!active.ready) {
+                finish();  // a touch that moved before the press delay: a scroll
+                return;
+            }
+            startDrag(event);
+        }
+        moveTo(event);
+    });
+    document.addEventListener('pointerup', event => {
+        if (active && event.pointerId === active.pointerId) {
+            finish();
+        }
+    });
+    document.addEventListener('pointercancel', event => {
+        if (active && event.pointerId === active.pointerId) {
+            finish();
+        }
+    });
+    // While dragging with a finger, the page must not scroll
+    document.addEventListener('touchmove', event => {
+        if (active && active.started) {
+            event.preventDefault();
+        }
+    }, {passive: false});
+
+    class Sortable {
+        constructor(el, options) {
+            this.el = el;
+            this.options = Object.assign({group: null, animation: 0, handle: null}, options);
+            instances.push(this);
+            el.addEventListener('pointerdown', event => this.press(event));
+        }
+
+        press(event) {
+            if (active || event.button !== 0 || event.target.closest(IGNORED)) {
+                return;
+            }
+            const item = itemFor(event.target, this);
+            if (!item) {
+                return;
+            }
+            active = {
+                instance: this, item, from: this.el, oldIndex: indexOf(item), pointerId: event.pointerId,
+                x: event.clientX, y: event.clientY, started: false, ready: event.pointerType !== 'touch',
+            };
+            if (!active.ready) {
+                const drag = active;
+                drag.timer = setTimeout(() => { drag.ready = true; }, TOUCH_DELAY);
+            }
+            if (this.options.chosenClass) {
+                item.classList.add(this.options.chosenClass);
+            }
+        }
+    }
+
+    window.Sortable = Sortable;
+})();
@@ -0,0 +1,100 @@
+"""Streaming parsers and serializers for bulk task import/export.
+
+Imports accept CSV (with a header row) or JSON, either a top-level array of
+objects or newline-delimited objects. Input is read from the request stream in
+chunks, so the raw upload never has to be held in memory as a whole.
+
+Recognized fields (case-insensitive): ``title`` (required), ``description``,
+``deadline`` (ISO date/datetime), ``category``, ``later`` and ``completed``.
+"""
+import csv
+import io
+import json
+
+CHUNK_SIZE = 64 * 1024
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 'x')
+
+
+class InvalidImport(ValueError):
+    """Raised for malformed import input."""
+
+
+def _as_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in TRUE_VALUES
+
+
+def normalize_row(row):
+    row = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+    title = str(row.get('title') or '').strip()
+    if not title:
+        return None
+    return {
+        'title': title,
+        'description': str(row.get('description') or ''),
+        'deadline': str(row.get('deadline') or '').strip() or None,
+        'category': str(row.get('category') or '').strip() or None,
+        'later': _as_bool(row.get('later')),
+        'completed': _as_bool(row.get('completed')),
+    }
+
+
+def iter_csv_rows(stream, encoding='utf-8'):
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding=encoding, newline=''))
+    for row in reader:
+        yield row
+
+
+def _iter_text_chunks(stream, encoding='utf-8'):
+    decoder = io.TextIOWrapper(stream, encoding=encoding)
+    while True:
+        chunk = decoder.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_json_rows(stream, encoding='utf-8'):
+    """Incrementally decode a JSON array of objects or newline-delimited JSON."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    in_array = None
+    for chunk in _iter_text_chunks(stream, encoding):
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip()
+            if in_array is None and buffer:
+                in_array = buffer.startswith('[')
+                if in_array:
+                    buffer = buffer[1:]
+                    continue
+            if in_array and buffer[:1] == ',':
+                buffer = buffer[1:]
+                continue
+            if in_array and buffer[:1] == ']':
+                return
+            if not buffer:
+                break
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                break  # need more input
+            if not isinstance(value, dict):
+                raise InvalidImport("Each imported task must be a JSON object")
+            yield value
+            buffer = buffer[end:]
+    if buffer.strip() and buffer.strip() != ']':
+        raise InvalidImport("Unexpected end of JSON input")
+
+
+def iter_import_rows(stream, fmt):
+    rows = iter_csv_rows(stream) if fmt == 'csv' else iter_json_rows(stream)
+    for row in rows:
+        normalized = normalize_row(row)
+        if normalized:
+            yield normalized
+
+
+def to_ndjson(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
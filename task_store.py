@@ -0,0 +1,307 @@
+"""Local mirror of a tenant's Notion database.
+
+The store keeps the raw Notion page objects it has seen, keyed by page id. It is
+filled by full syncs and by every read of the database, and kept current by the
+app's write paths, which feed back the pages Notion returns from create/update
+calls. Code that only needs to look at tasks can read from here instead of
+scanning the database again.
+
+Listeners registered with ``subscribe`` are called as ``listener(page_id, page)``
+after every change; ``page`` is ``None`` when the page was removed.
+
+The store also maintains secondary indexes (category, section, completion,
+recurring parent and a sorted deadline index) so ``query`` can answer filtered
+requests by intersecting id sets instead of scanning every task, and a sorted
+index of ranks per list for ``last_order`` and ``order_after``.
+"""
+import bisect
+import heapq
+import threading
+import time
+from datetime import datetime, timezone
+
+SECTIONS = ('active', 'later', 'templates')
+SORT_FIELDS = ('order', 'deadline', 'created_time', 'last_edited_time', 'title')
+# Dates of a summary as epoch seconds, added when the page is stored
+TIMESTAMP_FIELDS = {'deadline_ts': 'deadline', 'completed_ts': 'completed_at', 'created_ts': 'created_time'}
+
+
+def _plain_text(prop, key):
+    parts = (prop or {}).get(key) or []
+    if not parts:
+        return ''
+    first = parts[0]
+    return first.get('plain_text') or first.get('text', {}).get('content', '')
+
+
+def _date_start(prop):
+    date = (prop or {}).get('date') or {}
+    return date.get('start')
+
+
+def _select_name(prop):
+    select = (prop or {}).get('select') or {}
+    return select.get('name')
+
+
+def parse_timestamp(value):
+    """Epoch seconds for a Notion date or datetime string (dates are midnight UTC)."""
+    if not value:
+        return None
+    if value.count('+00:00') > 1:
+        # Some CompletedAt values were written with the offset doubled
+        value = value.replace('+00:00', '', value.count('+00:00') - 1)
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def property_value(prop):
+    """The plain value of a property as written or as Notion returns it, for comparisons.
+
+    Text is joined across its parts, selects compare by name and dates by instant.
+    """
+    if not prop:
+        return None
+    for kind in ('title', 'rich_text'):
+        if kind in prop:
+            return ''.join(
+                part.get('plain_text') or part.get('text', {}).get('content', '') for part in prop[kind] or []
+            )
+    if 'select' in prop:
+        return _select_name(prop)
+    if 'date' in prop:
+        start = _date_start(prop)
+        return parse_timestamp(start) if start else None
+    for kind in ('checkbox', 'number'):
+        if kind in prop:
+            return prop[kind]
+    return None
+
+
+def summarize_with_timestamps(page):
+    """``summarize_page`` plus its dates parsed to epoch seconds (see ``TIMESTAMP_FIELDS``)."""
+    task = summarize_page(page)
+    for field, source in TIMESTAMP_FIELDS.items():
+        task[field] = parse_timestamp(task[source])
+    return task
+
+
+def section_of(task):
+    if task['is_recurring_template']:
+        return 'templates'
+    return 'later' if task['is_later'] else 'active'
+
+
+def summarize_page(page):
+    """Flatten a Notion page into the plain task fields the app works with."""
+    properties = page.get('properties', {})
+    return {
+        'id': page['id'],
+        'title': _plain_text(properties.get('Title'), 'title'),
+        'description': _plain_text(properties.get('Description'), 'rich_text'),
+        'category': _select_name(properties.get('Category')),
+        'completed': (properties.get('Status') or {}).get('checkbox', False),
+        'is_later': (properties.get('IsLater') or {}).get('checkbox', False),
+        'order': _plain_text(properties.get('Order'), 'rich_text'),
+        'deadline': _date_start(properties.get('Deadline')),
+        'completed_at': _date_start(properties.get('CompletedAt')),
+        'is_recurring_template': (properties.get('IsRecurringTemplate') or {}).get('checkbox', False),
+        'recurring_parent_id': _plain_text(properties.get('RecurringParentId'), 'rich_text') or None,
+        'created_time': page.get('created_time'),
+        'last_edited_time': page.get('last_edited_time'),
+    }
+
+
+class TaskStore:
+    def __init__(self):
+        self._pages = {}
+        self._summaries = {}
+        self._by_category = {}
+        self._by_section = {}
+        self._by_completed = {}
+        self._by_parent = {}
+        self._deadlines = []  # sorted (deadline epoch, page id)
+        self._orders = {}  # (section, completed) -> sorted (Order, page id) of tasks that have one
+        self._lock = threading.RLock()
+        self._listeners = []
+        self.synced_at = None  # time.monotonic() of the last full sync
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, page_id, page):
+        for listener in self._listeners:
+            listener(page_id, page)
+
+    def get(self, page_id):
+        with self._lock:
+            return self._pages.get(page_id)
+
+    def upsert(self, page):
+        if not page or 'id' not in page:
+            return
+        if page.get('archived') or page.get('in_trash'):
+            self.remove(page['id'])
+            return
+        with self._lock:
+            current = self._pages.get(page['id'])
+            if current is not None:
+                # Notion's copy always wins: its last_edited_time is rounded to the
+                # minute, so it can't be used to tell an older copy from a newer one
+                if current == page:
+                    return
+                self._unindex(page['id'])
+            self._pages[page['id']] = page
+            self._index(page)
+            self._notify(page['id'], page)
+
+    def upsert_many(self, pages):
+        for page in pages:
+            self.upsert(page)
+
+    def remove(self, page_id):
+        with self._lock:
+            if self._pages.pop(page_id, None) is not None:
+                self._unindex(page_id)
+                self._notify(page_id, None)
+
+    def replace_all(self, pages):
+        """Make the store an exact copy of ``pages`` (the result of a full sync), overwriting local edits."""
+        pages = {page['id']: page for page in pages if not page.get('archived')}
+        with self._lock:
+            for page_id in [page_id for page_id in self._pages if page_id not in pages]:
+                self.remove(page_id)
+            for page in pages.values():
+                self.upsert(page)
+            self.synced_at = time.monotonic()
+
+    def is_fresh(self, max_age):
+        return self.synced_at is not None and time.monotonic() - self.synced_at < max_age
+
+    def iter_pages(self):
+        """Yield stored pages one at a time, without copying them."""
+        with self._lock:
+            page_ids = list(self._pages)
+        for page_id in page_ids:
+            page = self.get(page_id)
+            if page is not None:
+                yield page
+
+    def summary(self, page_id):
+        with self._lock:
+            return self._summaries.get(page_id)
+
+    def _index(self, page):
+        task = summarize_with_timestamps(page)
+        page_id = task['id']
+        self._summaries[page_id] = task
+        self._by_category.setdefault(task['category'], set()).add(page_id)
+        self._by_section.setdefault(section_of(task), set()).add(page_id)
+        self._by_completed.setdefault(task['completed'], set()).add(page_id)
+        if task['recurring_parent_id']:
+            self._by_parent.setdefault(task['recurring_parent_id'], set()).add(page_id)
+        if task['deadline_ts'] is not None:
+            bisect.insort(self._deadlines, (task['deadline_ts'], page_id))
+        if task['order']:
+            bisect.insort(self._orders.setdefault((section_of(task), task['completed']), []), (task['order'], page_id))
+
+    def _unindex(self, page_id):
+        task = self._summaries.pop(page_id, None)
+        if task is None:
+            return
+        self._discard(self._by_category, task['category'], page_id)
+        self._discard(self._by_section, section_of(task), page_id)
+        self._discard(self._by_completed, task['completed'], page_id)
+        if task['recurring_parent_id']:
+            self._discard(self._by_parent, task['recurring_parent_id'], page_id)
+        if task['deadline_ts'] is not None:
+            entry = (task['deadline_ts'], page_id)
+            position = bisect.bisect_left(self._deadlines, entry)
+            if position < len(self._deadlines) and self._deadlines[position] == entry:
+                del self._deadlines[position]
+        if task['order']:
+            orders = self._orders[section_of(task), task['completed']]
+            entry = (task['order'], page_id)
+            position = bisect.bisect_left(orders, entry)
+            if position < len(orders) and orders[position] == entry:
+                del orders[position]
+
+    @staticmethod
+    def _discard(index, key, page_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(page_id)
+            if not ids:
+                del index[key]
+
+    def query(self, category=None, section=None, completed=None, deadline_from=None, deadline_to=None,
+              parent=None, sort='order', descending=False, limit=100):
+        """Return task summaries matching every given filter, using the secondary indexes.
+
+        ``category`` may be ``''`` for uncategorized tasks; deadlines are epoch seconds
+        (inclusive). Tasks without a deadline sort last when sorting by deadline.
+        """
+        with self._lock:
+            candidate_sets = []
+            if category is not None:
+                candidate_sets.append(self._by_category.get(category or None, set()))
+            if section is not None:
+                candidate_sets.append(self._by_section.get(section, set()))
+            if completed is not None:
+                candidate_sets.append(self._by_completed.get(completed, set()))
+            if parent is not None:
+                candidate_sets.append(self._by_parent.get(parent, set()))
+            if deadline_from is not None or deadline_to is not None:
+                start = 0 if deadline_from is None else bisect.bisect_left(self._deadlines, (deadline_from, ''))
+                end = len(self._deadlines) if deadline_to is None else bisect.bisect_right(self._deadlines, (deadline_to, '\uffff'))
+                candidate_sets.append({page_id for _, page_id in self._deadlines[start:end]})
+
+            if candidate_sets:
+                candidate_sets.sort(key=len)
+                matches = candidate_sets[0].intersection(*candidate_sets[1:])
+            else:
+                matches = self._summaries.keys()
+
+            summaries = self._summaries
+            if sort == 'order':
+                def key(page_id):
+                    return (summaries[page_id]['completed'], summaries[page_id]['order'] or '')
+            elif sort == 'deadline':
+                def key(page_id):
+                    deadline = summaries[page_id]['deadline_ts']
+                    # Missing deadlines last in either direction
+                    if deadline is None:
+                        return (not descending, 0)
+                    return (descending, deadline)
+            else:
+                def key(page_id):
+                    return summaries[page_id][sort] or ''
+
+            select = heapq.nlargest if descending else heapq.nsmallest
+            return [dict(summaries[page_id]) for page_id in select(limit, matches, key=key)]
+
+    def last_order(self, section, completed):
+        """The greatest Order in a list (``section`` and completion), or None."""
+        with self._lock:
+            orders = self._orders.get((section, completed))
+            return orders[-1][0] if orders else None
+
+    def order_after(self, section, completed, order, exclude=None):
+        """``(taken, following)``: whether a task other than ``exclude`` in the list has Order
+        ``order``, and the next greater Order in it (None if there is none)."""
+        with self._lock:
+            orders = self._orders.get((section, completed), [])
+            taken = False
+            position = bisect.bisect_left(orders, (order, ''))
+            while position < len(orders) and (orders[position][0] == order or orders[position][1] == exclude):
+                taken = taken or (orders[position][0] == order and orders[position][1] != exclude)
+                position += 1
+            return taken, orders[position][0] if position < len(orders) else None
+
+    def __len__(self):
+        return len(self._pages)
@@ -0,0 +1,254 @@
+"""Tenant routing for serving many Notion boards from one process.
+
+Each tenant is a Notion database plus the integration token used to access it.
+Tenants are loaded from the JSON file named by ``TENANTS_FILE``::
+
+    {
+        "alice": {"token": "secret_...", "database_id": "...", "timezone": "Europe/Berlin"},
+        "bob": {"token": "secret_...", "database_id": "..."}
+    }
+
+The ``NOTION_TOKEN``/``NOTION_DATABASE_ID`` pair from the environment is always
+available as the ``default`` tenant. Both the ``X-Tenant`` header and the Host
+are set by the client, so requests are only routed by them when
+``TENANT_TRUST_PROXY`` is on: the app must then sit behind a proxy that
+authenticates users and sets (or strips) the header and Host itself. With it
+off, the default, every request goes to the ``default`` tenant. When it is on,
+a request is routed by the ``X-Tenant`` header, or by the first label of its
+host name (``alice.todo.example.com``).
+
+Notion clients are pooled per token and per-tenant caches are bounded both in
+entries and in (approximate) bytes; the least recently used tenants and cache
+entries are evicted first. A tenant's task store and search index are not
+bounded: they hold its whole board for as long as the tenant is in the pool,
+so memory grows with ``TENANT_POOL_SIZE`` times the size of a board.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from notion_client import Client
+
+from search_index import SearchIndex
+from task_store import TaskStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = 'default'
+TENANTS_FILE = os.getenv('TENANTS_FILE')
+TENANT_HEADER = os.getenv('TENANT_HEADER', 'X-Tenant')
+TENANT_TRUST_PROXY = os.getenv('TENANT_TRUST_PROXY', '0').lower() in ('1', 'true', 'yes')
+TENANT_POOL_SIZE = int(os.getenv('TENANT_POOL_SIZE', '256'))
+TENANT_CACHE_MAX_ENTRIES = int(os.getenv('TENANT_CACHE_MAX_ENTRIES', '1000'))
+TENANT_CACHE_MAX_BYTES = int(os.getenv('TENANT_CACHE_MAX_BYTES', str(4 * 1024 * 1024)))
+# Page previews get an LRU of their own, so many of them can't evict the values in the main cache
+TENANT_PREVIEW_CACHE_MAX_ENTRIES = int(os.getenv('TENANT_PREVIEW_CACHE_MAX_ENTRIES', '500'))
+TENANT_PREVIEW_CACHE_MAX_BYTES = int(os.getenv('TENANT_PREVIEW_CACHE_MAX_BYTES', str(2 * 1024 * 1024)))
+
+_scoped_context = ContextVar('tenant_context', default=None)
+
+
+class UnknownTenant(LookupError):
+    pass
+
+
+class Tenant:
+    def __init__(self, name, token, database_id, timezone=None):
+        self.name = name
+        self.token = token
+        self.database_id = database_id
+        self.timezone = timezone  # IANA name dates are shown in, if not DEFAULT_TIMEZONE
+
+    def __repr__(self):
+        return f"Tenant({self.name!r}, database_id={self.database_id!r})"
+
+
+def _approx_size(value):
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count and approximate size in bytes.
+
+    Entries may carry a TTL in seconds; expired entries count as misses.
+    """
+
+    def __init__(self, max_entries=TENANT_CACHE_MAX_ENTRIES, max_bytes=TENANT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[2] is not None and entry[2] < time.monotonic()):
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None, size=None):
+        size = _approx_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, expires_at)
+            self.size_bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.size_bytes -= size
+
+
+class TenantContext:
+    """Everything a request needs to talk to one tenant's board."""
+
+    def __init__(self, tenant, client):
+        self.tenant = tenant
+        self.client = client
+        self.cache = LRUCache()
+        self.previews = LRUCache(TENANT_PREVIEW_CACHE_MAX_ENTRIES, TENANT_PREVIEW_CACHE_MAX_BYTES)
+        self.store = TaskStore()
+        self.search_index = SearchIndex(self.store)
+
+    @property
+    def database_id(self):
+        return self.tenant.database_id
+
+
+class TenantPool:
+    """Resolves tenants to contexts, keeping at most ``max_size`` contexts alive."""
+
+    def __init__(self, tenants, client_factory=None, max_size=TENANT_POOL_SIZE):
+        self.tenants = dict(tenants)
+        self.max_size = max_size
+        self._client_factory = client_factory or (lambda token: Client(auth=token))
+        self._contexts = OrderedDict()
+        self._clients = OrderedDict()  # token -> client, shared by tenants on the same integration
+        self._lock = threading.Lock()
+
+    def get(self, name=DEFAULT_TENANT):
+        with self._lock:
+            context = self._contexts.get(name)
+            if context is not None:
+                self._contexts.move_to_end(name)
+                return context
+
+            tenant = self.tenants.get(name)
+            if tenant is None:
+                raise UnknownTenant(name)
+            context = TenantContext(tenant, self._client_for(tenant.token))
+            self._contexts[name] = context
+            while len(self._contexts) > self.max_size:
+                evicted, _ = self._contexts.popitem(last=False)
+                logger.debug("Evicted tenant context %s", evicted)
+            self._prune_clients()
+            return context
+
+    def _client_for(self, token):
+        client = self._clients.get(token)
+        if client is None:
+            client = self._client_factory(token)
+            self._clients[token] = client
+        else:
+            self._clients.move_to_end(token)
+        return client
+
+    def _prune_clients(self):
+        in_use = {context.tenant.token for context in self._contexts.values()}
+        # Evicted clients are dropped rather than closed: a request that resolved
+        # its context just before eviction may still be using one.
+        for token in [token for token in self._clients if token not in in_use]:
+            del self._clients[token]
+
+    def names(self):
+        return list(self.tenants)
+
+    def contexts(self):
+        """Contexts currently kept warm in the pool."""
+        with self._lock:
+            return list(self._contexts.values())
+
+
+def load_tenants(default_token, default_database_id, path=TENANTS_FILE):
+    tenants = {}
+    if default_token and default_database_id:
+        tenants[DEFAULT_TENANT] = Tenant(DEFAULT_TENANT, default_token, default_database_id)
+
+    if path:
+        with open(path) as f:
+            for name, config in json.load(f).items():
+                tenants[name] = Tenant(name, config['token'], config['database_id'], config.get('timezone'))
+
+    if len(tenants) > 1 and not TENANT_TRUST_PROXY:
+        logger.warning("%s lists tenants, but TENANT_TRUST_PROXY is off: every request goes to the %r tenant",
+                       path, DEFAULT_TENANT)
+
+    if DEFAULT_TENANT not in tenants:
+        # Keep the app importable without credentials; calls will fail at Notion
+        tenants[DEFAULT_TENANT] = Tenant(DEFAULT_TENANT, default_token, default_database_id)
+    return tenants
+
+
+def resolve_tenant_name(request, known_names, trust_proxy=TENANT_TRUST_PROXY):
+    """The tenant a request is for; see the module docstring for why this needs ``trust_proxy``."""
+    if not trust_proxy:
+        return DEFAULT_TENANT
+
+    name = request.headers.get(TENANT_HEADER)
+    if name:
+        return name
+
+    host = request.host.split(':')[0]
+    label = host.split('.')[0]
+    if '.' in host and label in known_names:
+        return label
+    return DEFAULT_TENANT
+
+
+@contextmanager
+def tenant_scope(context):
+    """Make ``context`` the current tenant outside of a request (e.g. in scheduled jobs)."""
+    token = _scoped_context.set(context)
+    try:
+        yield context
+    finally:
+        _scoped_context.reset(token)
+
+
+def scoped_context():
+    return _scoped_context.get()
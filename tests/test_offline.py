@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+
+import httpx
+from notion_client.errors import APIResponseError
+
+from offline import Connectivity, merge_properties
+
+
+def title(text):
+    return {'title': [{'text': {'content': text}, 'plain_text': text}]}
+
+
+def checkbox(value):
+    return {'checkbox': value}
+
+
+def epoch(text):
+    return datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp()
+
+
+def remote_page(edited, **properties):
+    return {'id': 'page-1', 'last_edited_time': edited, 'properties': properties}
+
+
+def test_remote_change_after_the_write_wins():
+    merged = merge_properties(
+        {'Title': title('local')}, {'Title': title('before')},
+        remote_page('2026-01-01T10:05:00.000Z', Title=title('remote')), epoch('2026-01-01T10:03:30'),
+    )
+    assert merged == {}
+
+
+def test_remote_change_before_the_write_is_overwritten():
+    merged = merge_properties(
+        {'Title': title('local')}, {'Title': title('before')},
+        remote_page('2026-01-01T10:02:00.000Z', Title=title('remote')), epoch('2026-01-01T10:03:30'),
+    )
+    assert merged == {'Title': title('local')}
+
+
+def test_remote_change_in_the_same_minute_wins():
+    # Notion reports 10:03:00 for an edit made at 10:03:50, after the write at 10:03:30
+    merged = merge_properties(
+        {'Title': title('local')}, {'Title': title('before')},
+        remote_page('2026-01-01T10:03:00.000Z', Title=title('remote')), epoch('2026-01-01T10:03:30'),
+    )
+    assert merged == {}
+
+
+def test_fields_only_changed_locally_are_written():
+    merged = merge_properties(
+        {'Title': title('local'), 'Status': checkbox(True)}, {'Title': title('before'), 'Status': checkbox(False)},
+        remote_page('2026-01-01T10:05:00.000Z', Title=title('remote'), Status=checkbox(False)),
+        epoch('2026-01-01T10:03:30'),
+    )
+    assert merged == {'Status': checkbox(True)}
+
+
+def test_values_already_in_notion_are_not_written_again():
+    merged = merge_properties(
+        {'Status': checkbox(True)}, {'Status': checkbox(False)},
+        remote_page('2026-01-01T10:00:00.000Z', Status=checkbox(True)), epoch('2026-01-01T10:03:30'),
+    )
+    assert merged == {}
+
+
+def unavailable():
+    return httpx.ConnectError('connection refused')
+
+
+def test_breaker_opens_after_consecutive_failures():
+    connectivity = Connectivity(retry_seconds=60, failure_threshold=3)
+    connectivity.observe(None, 0.1, unavailable())
+    connectivity.observe(None, 0.1, unavailable())
+    assert not connectivity.is_offline()
+    connectivity.observe(None, 0.1, unavailable())
+    assert connectivity.is_offline()
+    assert connectivity.status()['consecutive_failures'] == 3
+
+
+def test_breaker_ignores_errors_that_mean_notion_answered():
+    connectivity = Connectivity(retry_seconds=60, failure_threshold=1)
+    error = APIResponseError(httpx.Response(400), 'bad', 'validation_error')
+    connectivity.observe(None, 0.1, error)
+    assert not connectivity.is_offline()
+
+
+def test_success_closes_the_breaker():
+    connectivity = Connectivity(retry_seconds=0, failure_threshold=1)
+    connectivity.observe(None, 0.1, unavailable())
+    assert connectivity.offline_since is not None
+    connectivity.observe(None, 0.1, None)
+    assert connectivity.status() == {
+        'offline': False, 'offline_since': None, 'last_error': None, 'consecutive_failures': 0,
+    }
@@ -0,0 +1,51 @@
+import httpx
+import pytest
+
+from write_queue import WriteQueue, is_local_id
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return WriteQueue(str(tmp_path / 'queue.sqlite3'), max_attempts=3, backoff=0, max_backoff=0)
+
+
+def outage(error):
+    return isinstance(error, httpx.ConnectError)
+
+
+def fail_with(error):
+    def apply(write):
+        raise error
+    return apply
+
+
+def test_an_outage_does_not_use_up_attempts(queue):
+    queue.enqueue('t', 'update', 'page-1', {'Title': 'x'})
+    for _ in range(10):
+        queue.process(fail_with(httpx.ConnectError('down')), transient=outage)
+    [write] = queue.pending('t')
+    assert (write.status, write.attempts, write.outage_retries) == ('pending', 0, 10)
+
+    # The first real error after the outage is attempt 1, not the last one
+    queue.process(fail_with(ValueError('bad')), transient=outage)
+    [write] = queue.pending('t')
+    assert (write.status, write.attempts, write.outage_retries) == ('pending', 1, 0)
+
+
+def test_writes_held_by_an_outage_are_due_once_notion_answers(tmp_path):
+    queue = WriteQueue(str(tmp_path / 'queue.sqlite3'), backoff=60, max_backoff=300)
+    queue.enqueue('t', 'update', 'page-1', {'Title': 'x'})
+    queue.process(fail_with(httpx.ConnectError('down')), transient=outage)
+    assert queue.process(lambda write: write.page_id) == 0  # backing off
+
+    queue.enqueue('t', 'update', 'page-2', {'Title': 'y'})
+    delivered = []
+    assert queue.process(lambda write: delivered.append(write.page_id) or write.page_id) == 2
+    assert delivered == ['page-2', 'page-1']
+
+
+def test_errors_are_dead_lettered_after_max_attempts(queue):
+    queue.enqueue('t', 'update', 'page-1', {'Title': 'x'})
+    for _ in range(3):
+        queue.process(fail_with(ValueError('bad')), transient=outage)
+    assert [write.status for write in queue.dead_letters('t')] == ['dead']
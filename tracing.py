@@ -0,0 +1,224 @@
+"""Per-request trace spans and a slow-request profiler.
+
+A trace is started for each request; code marks interesting sections with
+``span('name')`` and every Notion call is recorded as a child span. Finished
+traces go to the configured exporter:
+
+- ``TRACE_EXPORT=file`` appends one JSON object per trace to ``TRACE_FILE``
+  (default ``traces.ndjson``)
+- ``TRACE_EXPORT=otlp`` POSTs OTLP/JSON-shaped spans to ``TRACE_OTLP_URL``
+  (a collector, or any local stand-in that accepts JSON)
+
+``TRACE_SAMPLE_RATE`` (0..1, default ``1``) controls how many requests are traced
+when an exporter is configured. Without one, spans cost a context-variable lookup.
+
+The profiler runs cProfile around a sample of requests (``PROFILE_SAMPLE_RATE``,
+default ``0.1``) when ``PROFILE_SLOW_MS`` is set, or around a request that
+carries the ``X-Profile: 1`` header when ``PROFILE_HEADER_ENABLED`` is on, and
+dumps a ``.prof`` file to ``PROFILE_DIR`` for any request slower than the
+threshold. Only one profiler can be active in a process, so a request that
+arrives while another is being profiled is not. Inspect with
+``python -m pstats`` or snakeviz.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+TRACE_EXPORT = os.getenv('TRACE_EXPORT', '')  # '', 'file' or 'otlp'
+TRACE_FILE = os.getenv('TRACE_FILE', 'traces.ndjson')
+TRACE_OTLP_URL = os.getenv('TRACE_OTLP_URL', 'http://localhost:4318/v1/traces')
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '1'))
+SERVICE_NAME = os.getenv('TRACE_SERVICE_NAME', 'notion-todo-app')
+
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', '0'))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0.1'))
+PROFILE_HEADER_ENABLED = os.getenv('PROFILE_HEADER_ENABLED', '0').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+_current_trace = ContextVar('current_trace', default=None)
+_current_span = ContextVar('current_span', default=None)
+_export_lock = threading.Lock()
+_profile_lock = threading.Lock()  # held by the one request being profiled
+
+
+class Span:
+    __slots__ = ('name', 'span_id', 'parent_id', 'start', 'end', 'attributes', 'error')
+
+    def __init__(self, name, parent_id, attributes=None):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'duration_ms': round(((self.end or time.time()) - self.start) * 1000, 3),
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+
+class Trace:
+    def __init__(self, name, attributes=None):
+        self.trace_id = uuid.uuid4().hex
+        self.spans = []
+        self.root = self.start_span(name, None, attributes)
+
+    def start_span(self, name, parent_id, attributes=None):
+        span = Span(name, parent_id, attributes)
+        self.spans.append(span)
+        return span
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'name': self.root.name,
+            'duration_ms': self.root.to_dict()['duration_ms'],
+            'spans': [span.to_dict() for span in self.spans],
+        }
+
+
+def tracing_enabled():
+    return bool(TRACE_EXPORT)
+
+
+def start_trace(name, **attributes):
+    """Begin a trace for the current context; returns ``(trace, tokens)`` or ``(None, None)`` if not sampled."""
+    if not tracing_enabled() or random.random() >= TRACE_SAMPLE_RATE:
+        return None, None
+    trace = Trace(name, attributes)
+    return trace, (_current_trace.set(trace), _current_span.set(trace.root))
+
+
+def finish_trace(trace, tokens, error=None, **attributes):
+    if trace is None:
+        return
+    trace.root.attributes.update(attributes)
+    trace.root.error = str(error) if error else None
+    trace.root.end = time.time()
+    _current_trace.reset(tokens[0])
+    _current_span.reset(tokens[1])
+    export(trace)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a section of the current trace; a no-op when the request isn't traced."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = trace.start_span(name, parent.span_id if parent else None, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.error = str(e)
+        raise
+    finally:
+        current.end = time.time()
+        _current_span.reset(token)
+
+
+def record_span(name, duration, error=None, **attributes):
+    """Add an already finished span (e.g. a Notion call reported after the fact)."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    finished = trace.start_span(name, parent.span_id if parent else None, attributes)
+    finished.end = time.time()
+    finished.start = finished.end - duration
+    finished.error = str(error) if error else None
+
+
+def _to_otlp(trace):
+    spans = []
+    for item in trace.spans:
+        spans.append({
+            'traceId': trace.trace_id,
+            'spanId': item.span_id,
+            'parentSpanId': item.parent_id or '',
+            'name': item.name,
+            'startTimeUnixNano': int(item.start * 1e9),
+            'endTimeUnixNano': int((item.end or item.start) * 1e9),
+            'attributes': [{'key': key, 'value': {'stringValue': str(value)}} for key, value in item.attributes.items()],
+            'status': {'code': 2, 'message': item.error} if item.error else {'code': 1},
+        })
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+        'scopeSpans': [{'scope': {'name': 'todo-app'}, 'spans': spans}],
+    }]}
+
+
+def _post_otlp(payload):
+    try:
+        httpx.post(TRACE_OTLP_URL, json=payload, timeout=2.0)
+    except httpx.HTTPError as e:
+        logger.debug("Trace export failed: %s", e)
+
+
+def export(trace):
+    if TRACE_EXPORT == 'file':
+        line = json.dumps(trace.to_dict(), default=str) + '\n'
+        with _export_lock:
+            with open(TRACE_FILE, 'a') as f:
+                f.write(line)
+    elif TRACE_EXPORT == 'otlp':
+        # Off the request thread; losing a trace is fine, slowing a request isn't
+        threading.Thread(target=_post_otlp, args=(_to_otlp(trace),), daemon=True).start()
+
+
+def should_profile(headers):
+    if PROFILE_HEADER_ENABLED and headers.get('X-Profile') == '1':
+        return True
+    return PROFILE_SLOW_MS > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def start_profile():
+    """Start profiling the current request; ``None`` if another request is being profiled."""
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:  # another profiler (a debugger, coverage) is active
+        _profile_lock.release()
+        logger.debug("Not profiling: %s", e)
+        return None
+    return profiler
+
+
+def finish_profile(profiler, name, duration_ms, forced=False):
+    """Stop profiling; dump stats if the request was slow (or profiling was requested)."""
+    try:
+        profiler.disable()
+    finally:
+        _profile_lock.release()
+    if not forced and duration_ms < PROFILE_SLOW_MS:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_name = ''.join(char if char.isalnum() else '_' for char in name)
+    path = os.path.join(PROFILE_DIR, f'{int(time.time())}-{safe_name}-{int(duration_ms)}ms.prof')
+    profiler.dump_stats(path)
+    logger.warning("Slow request %s took %.0fms; profile written to %s", name, duration_ms, path)
+    return path
@@ -0,0 +1,345 @@
+"""Durable write-ahead queue for Notion page writes.
+
+Mutating routes record their change here and in the local task store, then
+respond without waiting for Notion; a background thread replays the queue.
+
+- Writes are kept in SQLite (``WRITE_QUEUE_PATH``; the app defaults it to
+  ``write-queue.sqlite3`` in its instance folder), so they survive restarts.
+- Writes to the same page are delivered in the order they were queued: a write
+  waits while an earlier write for its page is pending, in flight or dead.
+- Failed writes are retried with exponential backoff (``WRITE_QUEUE_BACKOFF_SECONDS``
+  doubling up to ``WRITE_QUEUE_MAX_BACKOFF_SECONDS``). After
+  ``WRITE_QUEUE_MAX_ATTEMPTS`` attempts, or on an error retrying can't fix (a
+  validation error, a missing page), the write is moved to the dead-letter list,
+  where it can be retried or discarded.
+- Failures caused by a Notion outage are counted apart from those attempts, so
+  an outage never dead-letters a write, and writes it held back are due again
+  as soon as Notion answers.
+- Pages created through the queue get a temporary ``local-...`` id. Once Notion
+  has created the page, queued writes for the temporary id are pointed at the
+  real one.
+
+Several processes may share one queue file; each write is claimed by exactly
+one of them before it is sent.
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+WRITE_QUEUE_ENABLED = os.getenv('WRITE_QUEUE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+WRITE_QUEUE_PATH = os.getenv('WRITE_QUEUE_PATH') or None
+MAX_ATTEMPTS = int(os.getenv('WRITE_QUEUE_MAX_ATTEMPTS', '8'))
+BACKOFF_SECONDS = float(os.getenv('WRITE_QUEUE_BACKOFF_SECONDS', '1'))
+MAX_BACKOFF_SECONDS = float(os.getenv('WRITE_QUEUE_MAX_BACKOFF_SECONDS', '300'))
+POLL_SECONDS = float(os.getenv('WRITE_QUEUE_POLL_SECONDS', '1'))
+# A claimed write not finished after this long is assumed lost with its process
+CLAIM_TIMEOUT_SECONDS = 120
+
+LOCAL_ID_PREFIX = 'local-'
+
+# Notion error codes that will fail the same way however often they're retried
+PERMANENT_ERRORS = {
+    'validation_error', 'object_not_found', 'unauthorized', 'restricted_resource',
+    'invalid_json', 'invalid_request_url', 'invalid_request',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS writes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tenant TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    op TEXT NOT NULL,
+    properties TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    claimed_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    base TEXT,
+    outage_retries INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS writes_by_page ON writes (tenant, page_id, id);
+CREATE INDEX IF NOT EXISTS writes_by_status ON writes (status, next_attempt);
+CREATE TABLE IF NOT EXISTS created_pages (
+    tenant TEXT NOT NULL,
+    local_id TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (tenant, local_id)
+);
+"""
+
+
+def is_local_id(page_id):
+    return bool(page_id) and page_id.startswith(LOCAL_ID_PREFIX)
+
+
+class QueuedWrite:
+    __slots__ = ('id', 'tenant', 'page_id', 'op', 'properties', 'status', 'attempts', 'last_error', 'created_at',
+                 'base', 'outage_retries')
+
+    def __init__(self, row):
+        self.id, self.tenant, self.page_id, self.op, properties, self.status, \
+            self.attempts, self.last_error, self.created_at, base, self.outage_retries = row
+        self.properties = json.loads(properties) if properties else None
+        # The written fields as they were before this write, for reconciliation
+        self.base = json.loads(base) if base else None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tenant': self.tenant,
+            'page_id': self.page_id,
+            'op': self.op,
+            'properties': self.properties,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at,
+        }
+
+
+_COLUMNS = 'id, tenant, page_id, op, properties, status, attempts, last_error, created_at, base, outage_retries'
+
+
+class WriteQueue:
+    def __init__(self, path, max_attempts=MAX_ATTEMPTS,
+                 backoff=BACKOFF_SECONDS, max_backoff=MAX_BACKOFF_SECONDS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        columns = {row[1] for row in self._db.execute('PRAGMA table_info(writes)')}
+        if 'base' not in columns:  # queue files created before reconciliation
+            self._db.execute('ALTER TABLE writes ADD COLUMN base TEXT')
+        if 'outage_retries' not in columns:
+            self._db.execute('ALTER TABLE writes ADD COLUMN outage_retries INTEGER NOT NULL DEFAULT 0')
+        self._lock = threading.RLock()  # re-entered by enqueue inside batch
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def _rows(self, sql, params=()):
+        with self._lock:
+            return [QueuedWrite(row) for row in self._db.execute(sql, params).fetchall()]
+
+    # -- producers -------------------------------------------------------------
+
+    def resolve(self, tenant, page_id):
+        """The Notion id for a temporary ``local-...`` id, once the page has been created."""
+        if not is_local_id(page_id):
+            return page_id
+        with self._lock:
+            row = self._db.execute(
+                'SELECT page_id FROM created_pages WHERE tenant = ? AND local_id = ?', (tenant, page_id)
+            ).fetchone()
+        return row[0] if row else page_id
+
+    def enqueue(self, tenant, op, page_id=None, properties=None, base=None):
+        """Queue ``op`` ('create', 'update' or 'archive'); returns the page id it applies to.
+
+        ``base`` holds the written properties' values before the write, if known.
+        """
+        if op == 'create':
+            page_id = LOCAL_ID_PREFIX + uuid.uuid4().hex
+        else:
+            page_id = self.resolve(tenant, page_id)
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO writes (tenant, page_id, op, properties, created_at, base) VALUES (?, ?, ?, ?, ?, ?)',
+                (tenant, page_id, op, json.dumps(properties) if properties is not None else None, time.time(),
+                 json.dumps(base) if base is not None else None)
+            )
+        self._wakeup.set()
+        return page_id
+
+    @contextmanager
+    def batch(self):
+        """Queue the writes made in this block in one transaction, instead of one commit each."""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def pending(self, tenant, page_id=None):
+        """Writes not yet applied (including dead ones), oldest first."""
+        sql = f"SELECT {_COLUMNS} FROM writes WHERE tenant = ?"
+        params = [tenant]
+        if page_id is not None:
+            sql += ' AND page_id = ?'
+            params.append(page_id)
+        return self._rows(sql + ' ORDER BY id', params)
+
+    def dead_letters(self, tenant=None):
+        if tenant is None:
+            return self._rows(f"SELECT {_COLUMNS} FROM writes WHERE status = 'dead' ORDER BY id")
+        return self._rows(f"SELECT {_COLUMNS} FROM writes WHERE status = 'dead' AND tenant = ? ORDER BY id", (tenant,))
+
+    def retry(self, write_id, tenant=None):
+        """Move a dead write back to the queue; returns False if there was no such dead write."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE writes SET status = 'pending', attempts = 0, outage_retries = 0, next_attempt = 0 "
+                "WHERE id = ? AND status = 'dead' AND (? IS NULL OR tenant = ?)",
+                (write_id, tenant, tenant)
+            )
+        self._wakeup.set()
+        return cursor.rowcount == 1
+
+    def discard(self, write_id, tenant=None):
+        """Drop a dead write for good, unblocking later writes to the same page."""
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM writes WHERE id = ? AND status = 'dead' AND (? IS NULL OR tenant = ?)",
+                (write_id, tenant, tenant)
+            )
+        self._wakeup.set()
+        return cursor.rowcount == 1
+
+    def counts(self):
+        with self._lock:
+            return dict(self._db.execute('SELECT status, COUNT(*) FROM writes GROUP BY status').fetchall())
+
+    # -- delivery --------------------------------------------------------------
+
+    def _claim_next(self):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE writes SET status = 'pending' WHERE status = 'in_progress' AND claimed_at < ?",
+                (now - CLAIM_TIMEOUT_SECONDS,)
+            )
+            # Oldest due write whose page has nothing older still undelivered
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM writes w WHERE status = 'pending' AND next_attempt <= ? "
+                "AND NOT EXISTS (SELECT 1 FROM writes e WHERE e.tenant = w.tenant AND e.page_id = w.page_id "
+                "AND e.id < w.id) ORDER BY id LIMIT 20",
+                (now,)
+            ).fetchall()
+            for row in rows:
+                cursor = self._db.execute(
+                    "UPDATE writes SET status = 'in_progress', claimed_at = ? WHERE id = ? AND status = 'pending'",
+                    (now, row[0])
+                )
+                if cursor.rowcount == 1:
+                    return QueuedWrite(row)
+        return None
+
+    def _complete(self, write, page_id):
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._db.execute('DELETE FROM writes WHERE id = ?', (write.id,))
+                if page_id and page_id != write.page_id:
+                    self._db.execute(
+                        'UPDATE writes SET page_id = ? WHERE tenant = ? AND page_id = ?',
+                        (page_id, write.tenant, write.page_id)
+                    )
+                    self._db.execute(
+                        'INSERT OR REPLACE INTO created_pages (tenant, local_id, page_id, created_at) '
+                        'VALUES (?, ?, ?, ?)',
+                        (write.tenant, write.page_id, page_id, time.time())
+                    )
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def _fail(self, write, error, transient):
+        attempts, outage_retries = write.attempts, write.outage_retries
+        outage = transient(error)
+        if outage:
+            # Notion is unreachable: the write itself didn't fail, so it keeps its attempts
+            outage_retries += 1
+            retries = outage_retries
+        else:
+            attempts += 1
+            outage_retries = 0
+            retries = attempts
+        permanent = getattr(error, 'code', None) in PERMANENT_ERRORS
+        if not outage and (permanent or attempts >= self.max_attempts):
+            status, next_attempt = 'dead', 0
+            logger.error("Giving up on queued %s of %s after %s attempts: %s", write.op, write.page_id, attempts, error)
+        else:
+            delay = min(self.backoff * 2 ** (retries - 1), self.max_backoff)
+            status, next_attempt = 'pending', time.time() + delay * random.uniform(0.8, 1.2)
+            logger.warning("Queued %s of %s failed (attempt %s, outage retry %s), retrying in %.0fs: %s",
+                           write.op, write.page_id, attempts, outage_retries, delay, error)
+        with self._lock:
+            self._db.execute(
+                'UPDATE writes SET status = ?, attempts = ?, outage_retries = ?, next_attempt = ?, last_error = ? '
+                'WHERE id = ?',
+                (status, attempts, outage_retries, next_attempt, str(error), write.id)
+            )
+
+    def resume(self):
+        """Make writes held back by an outage due now; call once Notion answers again."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE writes SET next_attempt = 0, outage_retries = 0 WHERE status = 'pending' AND outage_retries > 0"
+            )
+        if cursor.rowcount:
+            self._wakeup.set()
+        return cursor.rowcount
+
+    def process(self, apply, limit=None, transient=lambda error: False, paused=lambda: False):
+        """Deliver due writes with ``apply(write)``, which returns the Notion page id.
+
+        Stops early when ``paused()`` turns true. Returns the number of writes delivered.
+        """
+        delivered = 0
+        while (limit is None or delivered < limit) and not paused():
+            write = self._claim_next()
+            if write is None:
+                break
+            try:
+                page_id = apply(write)
+            except Exception as e:
+                self._fail(write, e, transient)
+                continue
+            self._complete(write, page_id)
+            if delivered == 0:
+                # Notion took a write, so any outage is over
+                self.resume()
+            delivered += 1
+        return delivered
+
+    def start(self, apply, transient=lambda error: False, paused=lambda: False):
+        """Replay the queue on a background thread until the process exits.
+
+        ``transient(error)`` tells outages from failed writes; ``paused()`` holds
+        delivery while Notion is known to be unavailable.
+        """
+        if self._worker is not None:
+            return
+
+        def run():
+            was_paused = False
+            while True:
+                self._wakeup.wait(POLL_SECONDS)
+                self._wakeup.clear()
+                try:
+                    if was_paused and not paused():
+                        self.resume()
+                    was_paused = paused()
+                    self.process(apply, transient=transient, paused=paused)
+                except Exception as e:
+                    logger.error("Write queue worker error: %s", e)
+
+        self._worker = threading.Thread(target=run, name='write-queue', daemon=True)
+        self._worker.start()